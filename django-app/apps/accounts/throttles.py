@@ -1,9 +1,30 @@
-from rest_framework.throttling import ScopedRateThrottle
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+from rest_framework.throttling import (
+    AnonRateThrottle,
+    ScopedRateThrottle,
+    UserRateThrottle,
+)
+
+# Отдельный алиас кэша (settings.CACHES): счётчики не вытесняются данными каталога
+# и общие для всех воркеров (Redis или файловый кэш; THROTTLE_CACHE_BACKEND=locmem
+# делает их отдельными для каждого воркера)
+throttling_cache = ConnectionProxy(caches, "throttling")
+
+
+class AnonThrottle(AnonRateThrottle):
+    cache = throttling_cache
+
+
+class UserThrottle(UserRateThrottle):
+    cache = throttling_cache
 
 
 class RegisterThrottle(ScopedRateThrottle):
+    cache = throttling_cache
     scope = "register_scope"
 
 
 class PasswordResetThrottle(ScopedRateThrottle):
+    cache = throttling_cache
     scope = "password_reset_scope"
@@ -12,6 +12,7 @@ from django.utils.encoding import force_str
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.conf import settings
+from orders.utils import GUEST_CART_COOKIE, delete_guest_cart_cookie, merge_guest_cart
 from .utils import (
     set_refresh_cookie,
     account_activation_token_generator,
@@ -34,9 +35,28 @@ logger = logging.getLogger(__name__)
 User = get_user_model()
 
 
+# Перенос гостевой корзины (кука) в корзину пользователя при входе и активации;
+# ошибка переноса не должна ломать вход
+def merge_guest_cart_on_login(request, response, user):
+    if GUEST_CART_COOKIE not in request.COOKIES:
+        return
+    try:
+        merge_guest_cart(request, user)
+    except Exception as e:
+        logger.error(
+            "Ошибка переноса гостевой корзины %s: %s", user.email, e, exc_info=True
+        )
+    delete_guest_cart_cookie(response)
+
+
 # Кастомная simplejwt-вьюха для логина
 # переопределяем так как нужно установить Refresh-токен в HttpOnly куку
 class CustomTokenObtainView(TokenObtainPairView):
+    def get_serializer(self, *args, **kwargs):
+        # Запоминаем сериализатор: после входа нужен пользователь (serializer.user)
+        self.token_serializer = super().get_serializer(*args, **kwargs)
+        return self.token_serializer
+
     def post(self, request, *args, **kwargs):
         response = super().post(request, *args, **kwargs)
         if response.status_code == 200:
@@ -45,6 +65,8 @@ class CustomTokenObtainView(TokenObtainPairView):
             set_refresh_cookie(response, refresh_token)
             # Удаляем refresh из JSON-ответа
             del response.data["refresh"]
+            # Переносим гостевую корзину в корзину пользователя
+            merge_guest_cart_on_login(request, response, self.token_serializer.user)
         return response
 
 
@@ -167,6 +189,7 @@ def activate_view(request):
             status=status.HTTP_200_OK,
         )
 
+        merge_guest_cart_on_login(request, response, user)
         return set_refresh_cookie(response, refresh)
 
     return Response(
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     name = "core"
     verbose_name = "Общие настройки и данные"
+
+    def ready(self):
+        # pylint: disable=unused-import, import-outside-toplevel
+        import core.signals
@@ -0,0 +1,28 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from xwear.cache import invalidate_groups
+from .models import City, Document, ContactSettings, CommercialConfig, AboutUs
+
+# Группы кэша ответов (xwear.cache.cache_response) для публичных эндпоинтов core
+CITIES_GROUP = "cities"
+DOCUMENTS_GROUP = "documents"
+CONTACTS_GROUP = "contacts"
+COMMERCIAL_GROUP = "commercial"
+ABOUT_GROUP = "about"
+
+MODEL_GROUPS = {
+    City: CITIES_GROUP,
+    Document: DOCUMENTS_GROUP,
+    ContactSettings: CONTACTS_GROUP,
+    CommercialConfig: COMMERCIAL_GROUP,
+    AboutUs: ABOUT_GROUP,
+}
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def signal_core_responses(sender, **kwargs):
+    """Изменение справочника или настроек -> сброс его закэшированного ответа"""
+    group = MODEL_GROUPS.get(sender)
+    if group:
+        invalidate_groups(group)
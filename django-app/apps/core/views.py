@@ -2,6 +2,7 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
+from xwear.cache import cache_response
 from .models import City, Document, ContactSettings, CommercialConfig, AboutUs
 from .serializers import (
     CitySerializer,
@@ -10,11 +11,19 @@ from .serializers import (
     CommercialConfigSerializer,
     AboutUsSerializer,
 )
+from .signals import (
+    CITIES_GROUP,
+    DOCUMENTS_GROUP,
+    CONTACTS_GROUP,
+    COMMERCIAL_GROUP,
+    ABOUT_GROUP,
+)
 
 
 # Получение списка городов для доставки
 @api_view(["GET"])
 @permission_classes([AllowAny])
+@cache_response(CITIES_GROUP)
 def city_list_view(request):
     cities = City.objects.filter(is_active=True)
     serializer = CitySerializer(cities, many=True)
@@ -24,6 +33,7 @@ def city_list_view(request):
 # Получение списка юр.документов
 @api_view(["GET"])
 @permission_classes([AllowAny])
+@cache_response(DOCUMENTS_GROUP)
 def document_list(request):
     documents = Document.objects.all().order_by("-created_at")
     serializer = DocumentSerializer(documents, many=True)
@@ -33,6 +43,7 @@ def document_list(request):
 # Получение списка контактов
 @api_view(["GET"])
 @permission_classes([AllowAny])
+@cache_response(CONTACTS_GROUP)
 def contact_detail(request):
     # Возвращаем первую запись или создаем пустую (с дефолтными значениями), если её нет
     config, _ = ContactSettings.objects.get_or_create(id=1)
@@ -43,6 +54,7 @@ def contact_detail(request):
 # Получение условий доставки и оплаты
 @api_view(["GET"])
 @permission_classes([AllowAny])
+@cache_response(COMMERCIAL_GROUP)
 def commercial_config_detail(request):
     # Возвращаем первую запись или создаем пустую (с дефолтными значениями), если её нет
     config, _ = CommercialConfig.objects.get_or_create(id=1)
@@ -53,6 +65,7 @@ def commercial_config_detail(request):
 # страница "О нас"
 @api_view(["GET"])
 @permission_classes([AllowAny])
+@cache_response(ABOUT_GROUP)
 def about_us_detail(request):
     """
     Возвращает актуальную информацию о компании.
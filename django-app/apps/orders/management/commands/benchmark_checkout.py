@@ -0,0 +1,161 @@
+import multiprocessing
+import statistics
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Sum
+from django.test.utils import override_settings
+from core.models import City
+from xwear.models import ProductSize
+from orders.models import Cart, CartItem, Order, OrderItem
+from orders.utils import CheckoutError, InsufficientStock, create_order
+
+BENCH_EMAIL_DOMAIN = "checkout-benchmark.local"
+
+
+def _checkout(cart_ids, city_id):
+    # Выполняется в отдельном процессе со своим подключением к БД
+    city = City.objects.get(pk=city_id)
+    results = []
+    for cart_id in cart_ids:
+        cart = Cart.objects.select_related("user").get(pk=cart_id)
+        started = time.perf_counter()
+        try:
+            create_order(cart, "pickup", city, "Бенчмарк")
+            outcome = "sold"
+        except (CheckoutError, InsufficientStock):
+            outcome = "rejected"
+        except Exception as e:
+            # Например, взаимная блокировка или "database is locked" (SQLite)
+            outcome = f"error: {type(e).__name__}"
+        results.append((outcome, time.perf_counter() - started))
+    connections.close_all()
+    return results
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест оформления заказа: много покупателей из нескольких процессов "
+        "одновременно покупают один размер (дроп). Проверяет, что нет перепродажи"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--size-id", type=int, required=True, help="ID размера (ProductSize)"
+        )
+        parser.add_argument(
+            "--stock", type=int, default=50, help="Остаток на время теста"
+        )
+        parser.add_argument("--buyers", type=int, default=500, help="Число покупателей")
+        parser.add_argument("--processes", type=int, default=8, help="Число процессов")
+        parser.add_argument(
+            "--quantity", type=int, default=1, help="Штук в каждой корзине"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            product_size = ProductSize.objects.get(pk=options["size_id"])
+        except ProductSize.DoesNotExist:
+            raise CommandError(f"Размер с ID {options['size_id']} не найден")
+        if product_size.final_price is None:
+            raise CommandError("У размера не задана цена")
+
+        original_stock = product_size.stock
+        buyers = options["buyers"]
+        processes = max(1, min(options["processes"], buyers))
+        User = get_user_model()
+
+        # Покупатели и корзины создаются пачками, без сигналов (писем активации)
+        User.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}").delete()
+        User.objects.bulk_create(
+            User(email=f"buyer{i}@{BENCH_EMAIL_DOMAIN}", is_active=True)
+            for i in range(buyers)
+        )
+        users = User.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}")
+        Cart.objects.bulk_create(Cart(user=user) for user in users)
+        carts = list(Cart.objects.filter(user__in=users).values_list("pk", flat=True))
+        CartItem.objects.bulk_create(
+            CartItem(
+                cart_id=cart_id, product_size=product_size, quantity=options["quantity"]
+            )
+            for cart_id in carts
+        )
+        city, city_created = City.objects.get_or_create(name="Бенчмарк оформления")
+        ProductSize.objects.filter(pk=product_size.pk).update(stock=options["stock"])
+
+        chunks = [carts[i::processes] for i in range(processes)]
+        self.stdout.write(
+            f"Покупателей: {buyers}, процессов: {processes}, остаток: {options['stock']}, "
+            f"в корзине: {options['quantity']} шт."
+        )
+
+        try:
+            # Дочерние процессы наследуют настройки: письма о заказах не отправляются
+            with override_settings(
+                EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend"
+            ):
+                connections.close_all()
+                context = multiprocessing.get_context("fork")
+                started = time.perf_counter()
+                with context.Pool(processes) as pool:
+                    chunk_results = pool.starmap(
+                        _checkout, [(chunk, city.pk) for chunk in chunks]
+                    )
+                elapsed = time.perf_counter() - started
+
+            results = [result for chunk in chunk_results for result in chunk]
+            latencies = sorted(latency for _, latency in results)
+            outcomes = {}
+            for outcome, _ in results:
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+            # Проданное считается по позициям заказов, а не по ответам воркеров
+            sold = (
+                OrderItem.objects.filter(order__user__in=users).aggregate(
+                    total=Sum("quantity")
+                )["total"]
+                or 0
+            )
+            stock_left = ProductSize.objects.values_list("stock", flat=True).get(
+                pk=product_size.pk
+            )
+            orders = Order.objects.filter(user__in=users).count()
+
+            self.stdout.write(
+                f"Время: {elapsed:.2f} сек., {len(results) / elapsed:.0f} оформлений/сек."
+            )
+            self.stdout.write(
+                f"Задержка: p50 {statistics.median(latencies) * 1000:.1f} мс, "
+                f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} мс, "
+                f"макс. {latencies[-1] * 1000:.1f} мс"
+            )
+            for outcome, count in sorted(outcomes.items()):
+                self.stdout.write(f"  {outcome}: {count}")
+
+            self.stdout.write(
+                f"Продано: {sold} шт. из {options['stock']}, заказов: {orders}, "
+                f"остаток после теста: {stock_left}"
+            )
+            if (
+                sold > options["stock"]
+                or stock_left < 0
+                or sold + stock_left != options["stock"]
+            ):
+                self.stdout.write(self.style.ERROR("ПЕРЕПРОДАЖА: остаток не сходится"))
+            else:
+                self.stdout.write(self.style.SUCCESS("Перепродажи нет"))
+        finally:
+            # Заказы, корзины и резервы удаляются вместе с пользователями
+            users.delete()
+            if city_created:
+                city.delete()
+            ProductSize.objects.filter(pk=product_size.pk).update(stock=original_stock)
+
+
+# Как использовать
+# --------------------------
+# Только на тестовой/локальной БД: создаёт временных покупателей и заказы, затем удаляет их.
+# Остаток размера восстанавливается после теста.
+# На SQLite записи выполняются по очереди — реальная картина только на PostgreSQL.
+# python manage.py benchmark_checkout --size-id 123 --stock 50 --buyers 1000 --processes 16
@@ -0,0 +1,22 @@
+import logging
+from django.core.management.base import BaseCommand
+from orders.utils import clear_expired_idempotency_keys
+
+logger = logging.getLogger("apps")
+
+
+class Command(BaseCommand):
+    help = "Удаляет истёкшие ключи идемпотентности (снимки ответов оформления заказа)"
+
+    def handle(self, *args, **options):
+        deleted = clear_expired_idempotency_keys()
+        self.stdout.write(self.style.SUCCESS(f"Удалено истёкших ключей: {deleted}"))
+        if deleted:
+            logger.info("Удалено истёкших ключей идемпотентности: %s", deleted)
+
+
+# Как использовать
+# --------------------------
+# Истёкшие ключи уже не используются (повтор выполнится заново) — команда только чистит таблицу.
+# Cron, например раз в сутки:
+# python manage.py clear_idempotency_keys
@@ -0,0 +1,22 @@
+import logging
+from django.core.management.base import BaseCommand
+from orders.utils import release_expired_reservations
+
+logger = logging.getLogger("apps")
+
+
+class Command(BaseCommand):
+    help = "Удаляет истёкшие резервы товаров в корзинах"
+
+    def handle(self, *args, **options):
+        deleted = release_expired_reservations()
+        self.stdout.write(self.style.SUCCESS(f"Удалено истёкших резервов: {deleted}"))
+        if deleted:
+            logger.info("Удалено истёкших резервов: %s", deleted)
+
+
+# Как использовать
+# --------------------------
+# Истёкшие резервы уже не уменьшают доступный остаток — команда только чистит таблицу.
+# Cron, например раз в час:
+# python manage.py release_expired_reservations
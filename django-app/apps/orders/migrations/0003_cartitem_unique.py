@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:27
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_cart_items(apps, schema_editor):
+    # Дубли (корзина, размер) из-за гонки get_or_create сливаются в одну позицию
+    CartItem = apps.get_model('orders', 'CartItem')
+
+    duplicates = (
+        CartItem.objects.values('cart_id', 'product_size_id')
+        .annotate(count=Count('id'), first_id=Min('id'), total=Sum('quantity'))
+        .filter(count__gt=1)
+    )
+    for row in duplicates.iterator():
+        CartItem.objects.filter(pk=row['first_id']).update(quantity=row['total'])
+        CartItem.objects.filter(
+            cart_id=row['cart_id'], product_size_id=row['product_size_id']
+        ).exclude(pk=row['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_stockreservation'),
+        ('xwear', '0024_productsize_stock'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_cart_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'product_size'), name='orders_cartitem_cart_size_uniq'),
+        ),
+    ]
@@ -1,8 +1,10 @@
+from decimal import Decimal
 from django.db import models
+from django.db.models import Sum
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from xwear.models import Product, ProductSize
 
-
 # --- Корзина ---
 
 
@@ -24,7 +26,13 @@ class Cart(models.Model):
 
     @property
     def total_price(self):
-        return sum(item.total_item_price for item in self.items.all())
+        # Аннотация из get_cart_with_items (orders/utils/cart.py), иначе — агрегат в БД
+        if hasattr(self, "items_total"):
+            return self.items_total
+        from .utils import line_total_expression
+
+        total = self.items.aggregate(total=Sum(line_total_expression()))["total"]
+        return total or Decimal("0.00")
 
 
 class CartItem(models.Model):
@@ -39,15 +47,64 @@ class CartItem(models.Model):
     class Meta:
         verbose_name = "Товар в корзине"
         verbose_name_plural = "Товары в корзине"
+        constraints = [
+            # Цель ON CONFLICT при добавлении в корзину (orders/utils/cart.py)
+            models.UniqueConstraint(
+                fields=["cart", "product_size"], name="orders_cartitem_cart_size_uniq"
+            )
+        ]
 
     def __str__(self):
-        return f"{self.product_size.product.full_name} ({self.product_size.size.name}) x {self.quantity}"
+        return f"{self.product_size.variant.full_name} ({self.product_size.size.name}) x {self.quantity}"
 
     @property
     def total_item_price(self):
+        # Аннотация line_total из get_cart_items_queryset, иначе — расчёт по цене размера
+        if hasattr(self, "line_total"):
+            return self.line_total
         return self.product_size.final_price * self.quantity
 
 
+class StockReservation(models.Model):
+    """
+    Резерв остатка размера за корзиной до expires_at (utils/stock.py).
+    Истёкшие резервы не учитываются и удаляются командой release_expired_reservations.
+    """
+
+    cart = models.ForeignKey(
+        Cart,
+        on_delete=models.CASCADE,
+        related_name="reservations",
+        verbose_name="Корзина",
+    )
+    product_size = models.ForeignKey(
+        ProductSize,
+        on_delete=models.CASCADE,
+        related_name="reservations",
+        verbose_name="Товар и размер",
+    )
+    quantity = models.PositiveIntegerField(verbose_name="Количество")
+    expires_at = models.DateTimeField(verbose_name="Действует до")
+
+    class Meta:
+        verbose_name = "Резерв товара"
+        verbose_name_plural = "Резервы товаров"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["cart", "product_size"], name="orders_reservation_cart_size_uniq"
+            )
+        ]
+        # Сумма действующих резервов размера
+        indexes = [
+            models.Index(
+                fields=["product_size", "expires_at"], name="orders_reservation_size_idx"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.product_size_id} x {self.quantity} до {self.expires_at:%H:%M}"
+
+
 # --- Адреса ПВЗ ---
 
 
@@ -201,3 +258,47 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.product_name} (x{self.quantity}) для заказа #{self.order.id}"
+
+
+# --- Повторы запросов ---
+
+
+class IdempotencyKey(models.Model):
+    """
+    Ключ идемпотентности запроса (заголовок Idempotency-Key, utils/idempotency.py):
+    отпечаток запроса и снимок ответа. Повтор с тем же ключом получает сохранённый ответ,
+    а не выполняет оформление заказа ещё раз.
+    Строка вставляется до выполнения view (незакоммиченная вставка и держит ключ)
+    и коммитится вместе с кодом и снимком ответа: в зафиксированной записи ответ есть всегда.
+    Поля ответа nullable, потому что до конца view в строке их ещё нет;
+    response пуст и у ответа без тела (data=None).
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="idempotency_keys",
+        verbose_name="Пользователь",
+    )
+    key = models.CharField(max_length=64, verbose_name="Ключ")
+    fingerprint = models.CharField(max_length=64, verbose_name="Отпечаток запроса")
+    status_code = models.PositiveSmallIntegerField(
+        null=True, blank=True, verbose_name="Код ответа"
+    )
+    response = models.JSONField(
+        null=True, blank=True, encoder=DjangoJSONEncoder, verbose_name="Снимок ответа"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    expires_at = models.DateTimeField(db_index=True, verbose_name="Действует до")
+
+    class Meta:
+        verbose_name = "Ключ идемпотентности"
+        verbose_name_plural = "Ключи идемпотентности"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="orders_idempotency_user_key_uniq"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.user_id})"
@@ -1,9 +1,9 @@
 from rest_framework import serializers
 from xwear.utils import get_thumbnail_data
-from xwear.models import Product, ProductSize
+from xwear.models import Product, ProductSize, ProductVariant
 from core.serializers import CitySerializer
 from .models import Cart, CartItem, Order, OrderItem, PickupPoint
-
+from .utils import MAX_CART_QUANTITY
 
 # --- КОРЗИНА ---
 
@@ -31,13 +31,31 @@ class ProductCartSerializer(serializers.ModelSerializer):
         return None
 
 
+class VariantCartSerializer(ProductCartSerializer):
+    # Вариант товара (цвет) в корзине: фото берутся из prefetch варианта
+    name = serializers.CharField(source="full_name", read_only=True)
+
+    class Meta(ProductCartSerializer.Meta):
+        model = ProductVariant
+
+
+def check_product_size_available(product_size):
+    # Общая проверка для добавления в корзину (по одной позиции и пачкой)
+    if not product_size.variant.product.is_active:
+        raise serializers.ValidationError("Этот товар временно недоступен для заказа.")
+
+    # Пустой остаток — учёт не ведётся; резерв проверяется при добавлении (reserve_stock)
+    if product_size.stock == 0:
+        raise serializers.ValidationError("Данного размера нет в наличии.")
+
+
 class CartItemSerializer(serializers.ModelSerializer):
     # Для проверки входящих ID (поле используется только для POST и PATCH запросов - write_only=True)
     product_size = serializers.PrimaryKeyRelatedField(
-        queryset=ProductSize.objects.all(), write_only=True
+        queryset=ProductSize.objects.select_related("variant__product"), write_only=True
     )
     # Данные о товаре (имя, фото)
-    product_info = ProductCartSerializer(source="product_size.product", read_only=True)
+    product_info = VariantCartSerializer(source="product_size.variant", read_only=True)
     # Данные о размере
     size_name = serializers.CharField(source="product_size.size.name", read_only=True)
     # Цена за одну единицу (уже со скидкой)
@@ -57,21 +75,12 @@ class CartItemSerializer(serializers.ModelSerializer):
             "unit_price",
             "total_item_price",
         ]
+        extra_kwargs = {"quantity": {"min_value": 1, "max_value": MAX_CART_QUANTITY}}
 
     # Проверяем, активен ли товар и есть ли он в наличии
     def validate_product_size(self, value):
         # value — это объект ProductSize, так как PrimaryKeyRelatedField его уже нашел
-        product = value.product
-
-        if not product.is_active:
-            raise serializers.ValidationError(
-                "Этот товар временно недоступен для заказа."
-            )
-
-        # Для поля остатка в ProductSize
-        # if value.stock <= 0:
-        #     raise serializers.ValidationError("Данного размера нет в наличии.")
-
+        check_product_size_available(value)
         return value
 
     # Валидация количества товаров в корзине и их остатков
@@ -91,7 +100,53 @@ class CartItemSerializer(serializers.ModelSerializer):
     #     return data
 
 
+class GuestCartItemSerializer(CartItemSerializer):
+    # Позиция гостевой корзины не хранится в БД — её ключ — ID размера
+    id = serializers.IntegerField(source="product_size_id", read_only=True)
+
+
+class CartBatchLineSerializer(serializers.Serializer):
+    product_size = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, max_value=MAX_CART_QUANTITY)
+
+
+class CartBatchSerializer(serializers.Serializer):
+    """
+    Пачка позиций для корзины: [{"product_size": id, "quantity": шт.}, ...].
+    replace=false — прибавить к имеющемуся количеству, true — заменить.
+    Размеры загружаются одним запросом; повторы одного размера суммируются
+    (не больше MAX_CART_QUANTITY).
+    """
+
+    items = CartBatchLineSerializer(many=True, allow_empty=False, max_length=50)
+    replace = serializers.BooleanField(default=False)
+
+    def validate_items(self, value):
+        quantities = {}
+        for line in value:
+            pk = line["product_size"]
+            quantities[pk] = min(
+                quantities.get(pk, 0) + line["quantity"], MAX_CART_QUANTITY
+            )
+
+        sizes = ProductSize.objects.select_related("variant__product").in_bulk(quantities)
+        errors = {}
+        for pk in quantities:
+            try:
+                if pk not in sizes:
+                    raise serializers.ValidationError(f"Размер с ID {pk} не найден.")
+                check_product_size_available(sizes[pk])
+            except serializers.ValidationError as e:
+                errors[pk] = e.detail
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        # {ProductSize: шт.} — формат upsert_cart_items
+        return {sizes[pk]: quantity for pk, quantity in quantities.items()}
+
+
 class CartSerializer(serializers.ModelSerializer):
+    # Корзину для ответа загружает get_cart_with_items (orders/utils/cart.py)
     items = CartItemSerializer(many=True, read_only=True)
     total_price = serializers.ReadOnlyField()
 
@@ -1,3 +1,646 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import caches
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from xwear.models import (
+    Brand,
+    Category,
+    Color,
+    Product,
+    ProductImage,
+    ProductSize,
+    ProductVariant,
+    Size,
+)
+from core.models import City
+from .models import CartItem, IdempotencyKey, Order, PickupPoint, StockReservation
+from .utils import (
+    GUEST_CART_COOKIE,
+    IDEMPOTENCY_HEADER,
+    MAX_CART_QUANTITY,
+    InsufficientStock,
+    create_order,
+    get_reserved_by_others,
+    release_expired_reservations,
+    reserve_stock,
+    upsert_cart_items,
+)
 
-# Create your tests here.
+
+def create_sizes(count, stock=None):
+    """Активный товар с одним вариантом и count размерами по 100.00"""
+    root = Category.objects.create(name="Обувь")
+    category = Category.objects.create(name="Кроссовки", parent=root)
+    product = Product.objects.create(
+        category=category,
+        brand=Brand.objects.create(name="Nike", slug="nike"),
+        model_name="Dunk",
+        gender="M",
+        season="SUMMER",
+        is_active=True,
+    )
+    product.available_sizes.set(
+        [Size.objects.create(name=str(40 + n), order=n) for n in range(count)]
+    )
+    variant = ProductVariant.objects.create(
+        product=product, color=Color.objects.create(name="Черный", slug="black")
+    )
+    variant.sizes.update(
+        price=Decimal("100.00"),
+        final_price=Decimal("100.00"),
+        stock=stock,
+        is_active=True,
+    )
+    variant.is_active = True
+    variant.save()
+    return list(variant.sizes.order_by("pk"))
+
+
+def create_buyer(email="buyer@example.com"):
+    # Корзина создаётся сигналом для активного пользователя
+    return get_user_model().objects.create_user(
+        email=email, password="pass", is_active=True
+    )
+
+
+class CartUpsertTests(TestCase):
+    """Добавление в корзину одним INSERT ... ON CONFLICT (orders/utils/cart.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sizes = create_sizes(3, stock=10)
+        cls.user = create_buyer()
+
+    def setUp(self):
+        self.cart = self.user.cart
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def quantities(self):
+        return dict(self.cart.items.values_list("product_size_id", "quantity"))
+
+    def test_repeated_add_increments_single_line(self):
+        url = reverse("cart-add")
+        for _ in range(3):
+            response = self.client.post(
+                url, {"product_size": self.sizes[0].pk, "quantity": 2}, format="json"
+            )
+            self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(self.quantities(), {self.sizes[0].pk: 6})
+        self.assertEqual(response.data["total_price"], Decimal("600.00"))
+        reservation = StockReservation.objects.get(cart=self.cart)
+        self.assertEqual(reservation.quantity, 6)
+
+    def test_batch_add_and_replace(self):
+        url = reverse("cart-batch")
+        upsert_cart_items(self.cart, {self.sizes[0]: 1})
+
+        response = self.client.post(
+            url,
+            {
+                "items": [
+                    {"product_size": self.sizes[0].pk, "quantity": 2},
+                    {"product_size": self.sizes[1].pk, "quantity": 1},
+                    # Повтор размера в пачке суммируется
+                    {"product_size": self.sizes[1].pk, "quantity": 1},
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.quantities(), {self.sizes[0].pk: 3, self.sizes[1].pk: 2})
+
+        response = self.client.post(
+            url,
+            {
+                "items": [{"product_size": self.sizes[0].pk, "quantity": 1}],
+                "replace": True,
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.quantities(), {self.sizes[0].pk: 1, self.sizes[1].pk: 2})
+
+    def test_quantity_is_capped(self):
+        # Без учёта остатка количество ограничено только MAX_CART_QUANTITY
+        size = self.sizes[2]
+        ProductSize.objects.filter(pk=size.pk).update(stock=None)
+        size.refresh_from_db()
+
+        response = self.client.post(
+            reverse("cart-batch"),
+            {"items": [{"product_size": size.pk, "quantity": 2**31}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+        upsert_cart_items(self.cart, {size: MAX_CART_QUANTITY - 1})
+        response = self.client.post(
+            reverse("cart-batch"),
+            {
+                "items": [
+                    {"product_size": size.pk, "quantity": MAX_CART_QUANTITY},
+                    {"product_size": size.pk, "quantity": MAX_CART_QUANTITY},
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.quantities(), {size.pk: MAX_CART_QUANTITY})
+
+    def test_batch_rolls_back_on_insufficient_stock(self):
+        upsert_cart_items(self.cart, {self.sizes[0]: 1})
+
+        response = self.client.post(
+            reverse("cart-batch"),
+            {
+                "items": [
+                    {"product_size": self.sizes[0].pk, "quantity": 2},
+                    {"product_size": self.sizes[1].pk, "quantity": 11},
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.quantities(), {self.sizes[0].pk: 1})
+        self.assertEqual(
+            dict(StockReservation.objects.values_list("product_size_id", "quantity")),
+            {self.sizes[0].pk: 1},
+        )
+
+    def test_batch_rejects_unknown_size(self):
+        response = self.client.post(
+            reverse("cart-batch"),
+            {"items": [{"product_size": 0, "quantity": 1}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.cart.items.exists())
+
+
+class CartQueryCountTests(TestCase):
+    """
+    Ответ корзины (get_cart_with_items) — фиксированное число запросов:
+    GET и изменения одной позиции не зависят от числа позиций, вариантов и фото.
+    """
+
+    variants_count = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_buyer()
+        product = create_sizes(1, stock=10)[0].variant.product
+        cls.sizes = []
+        for n, variant in enumerate(product.variants.all()):
+            cls.sizes += cls.add_images(variant, n)
+        for n in range(1, cls.variants_count):
+            variant = ProductVariant.objects.create(
+                product=product,
+                color=Color.objects.create(name=f"Цвет {n}", slug=f"color-{n}"),
+            )
+            variant.sizes.update(
+                price=Decimal("100.00"),
+                final_price=Decimal("100.00"),
+                stock=10,
+                is_active=True,
+            )
+            variant.is_active = True
+            variant.save()
+            cls.sizes += cls.add_images(variant, n)
+
+    @staticmethod
+    def add_images(variant, n):
+        # Манифест миниатюр уже построен: ответ не обращается к хранилищу
+        ProductImage.objects.bulk_create(
+            ProductImage(
+                variant=variant,
+                image=name,
+                is_main=position == 0,
+                position=position,
+                thumbnails={
+                    "source": name,
+                    "aliases": {"product_small": [f"/media/{name}", 100, 120]},
+                },
+            )
+            for position, name in enumerate(
+                [f"products/{n}-main.jpg", f"products/{n}-extra.jpg"]
+            )
+        )
+        return list(variant.sizes.all())
+
+    def setUp(self):
+        caches["throttling"].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def fill_cart(self, count):
+        cart = self.user.cart
+        cart.items.all().delete()
+        upsert_cart_items(cart, {size: 1 for size in self.sizes[:count]})
+        return cart.items.get(product_size=self.sizes[0]).pk
+
+    def count_queries(self, items_count, send):
+        item_id = self.fill_cart(items_count)
+        with CaptureQueriesContext(connection) as queries:
+            response = send(item_id)
+        self.assertLess(response.status_code, 300, response.data)
+        return len(queries)
+
+    def get(self, item_id):
+        return self.client.get(reverse("cart-detail"))
+
+    def add(self, item_id):
+        return self.client.post(
+            reverse("cart-add"), {"product_size": self.sizes[0].pk}, format="json"
+        )
+
+    def batch(self, item_id):
+        return self.client.post(
+            reverse("cart-batch"),
+            {"items": [{"product_size": self.sizes[0].pk, "quantity": 2}]},
+            format="json",
+        )
+
+    def update(self, item_id):
+        return self.client.patch(
+            reverse("cart-update", args=[item_id]), {"quantity": 3}, format="json"
+        )
+
+    def delete(self, item_id):
+        return self.client.delete(reverse("cart-delete", args=[item_id]))
+
+    def test_cart_queries_do_not_depend_on_items(self):
+        self.assertGreater(len(self.sizes), 1)
+        for send, small in (
+            (self.get, 1),
+            (self.add, 1),
+            (self.batch, 1),
+            (self.update, 1),
+            # Пустая после удаления корзина не делает запрос фото
+            (self.delete, 2),
+        ):
+            with self.subTest(endpoint=send.__name__):
+                self.assertEqual(
+                    self.count_queries(small, send),
+                    self.count_queries(len(self.sizes), send),
+                )
+
+    def test_cart_detail_query_count(self):
+        self.fill_cart(len(self.sizes))
+        # Корзина с суммой, позиции с размерами и вариантами, фото вариантов
+        with self.assertNumQueries(3):
+            self.client.get(reverse("cart-detail"))
+
+
+class GuestCartTests(TestCase):
+    """Гостевая корзина в подписанной куке и перенос в корзину при входе"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sizes = create_sizes(2, stock=5)
+        cls.user = create_buyer()
+
+    def setUp(self):
+        # Кука гостевой корзины переносится между запросами клиентом
+        caches["throttling"].clear()
+        self.client = APIClient()
+
+    def add(self, items, **extra):
+        return self.client.post(
+            reverse("guest-cart-batch"), {"items": items, **extra}, format="json"
+        )
+
+    def test_guest_cart_without_db_writes(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.add([{"product_size": self.sizes[0].pk, "quantity": 2}])
+            self.add([{"product_size": self.sizes[0].pk, "quantity": 1}])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(
+            [q["sql"] for q in queries if not q["sql"].lstrip().startswith("SELECT")]
+        )
+
+        # Цена берётся из БД при чтении, а не из куки
+        ProductSize.objects.filter(pk=self.sizes[0].pk).update(
+            final_price=Decimal("80.00")
+        )
+        response = self.client.get(reverse("guest-cart-detail"))
+        self.assertEqual(response.data["items"][0]["id"], self.sizes[0].pk)
+        self.assertEqual(response.data["items"][0]["quantity"], 3)
+        self.assertEqual(response.data["total_price"], Decimal("240.00"))
+
+    def test_guest_cart_rejects_quantity_over_stock(self):
+        response = self.add([{"product_size": self.sizes[0].pk, "quantity": 6}])
+        self.assertEqual(response.status_code, 400)
+
+    def test_tampered_cookie_is_ignored(self):
+        self.client.cookies[GUEST_CART_COOKIE] = f"{self.sizes[0].pk}:3"
+        response = self.client.get(reverse("guest-cart-detail"))
+        self.assertEqual(response.data["items"], [])
+
+    def test_merge_on_login(self):
+        upsert_cart_items(self.user.cart, {self.sizes[0]: 4})
+        self.add(
+            [
+                {"product_size": self.sizes[0].pk, "quantity": 3},
+                {"product_size": self.sizes[1].pk, "quantity": 2},
+            ]
+        )
+
+        response = self.client.post(
+            reverse("token_obtain_pair"),
+            {"email": self.user.email, "password": "pass"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        # Кука удалена, размер с нехваткой перенесён в доступном количестве
+        self.assertEqual(response.cookies[GUEST_CART_COOKIE].value, "")
+        self.assertEqual(
+            dict(self.user.cart.items.values_list("product_size_id", "quantity")),
+            {self.sizes[0].pk: 5, self.sizes[1].pk: 2},
+        )
+
+
+def create_pickup_point():
+    return PickupPoint.objects.create(
+        city=City.objects.create(name="Москва"), address="ул. Тестовая, 1"
+    )
+
+
+class StockReservationTests(TestCase):
+    """Резервы и списание остатков (orders/utils/stock.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sizes = create_sizes(2, stock=5)
+        cls.user = create_buyer()
+        cls.other = create_buyer("other@example.com")
+        cls.pickup_point = create_pickup_point()
+
+    def setUp(self):
+        self.cart = self.user.cart
+
+    def checkout(self):
+        return create_order(
+            self.cart,
+            delivery_method="pickup",
+            city=self.pickup_point.city,
+            address_text=self.pickup_point.address,
+            pickup_point=self.pickup_point,
+        )
+
+    def stocks(self):
+        return list(
+            ProductSize.objects.filter(pk__in=[s.pk for s in self.sizes])
+            .order_by("pk")
+            .values_list("stock", flat=True)
+        )
+
+    def test_checkout_rolls_back_when_others_reserved_stock(self):
+        first, second = self.sizes
+        upsert_cart_items(self.cart, {first: 1, second: 3})
+        reserve_stock(self.other.cart, second, 2)
+        # Остаток уменьшили после резервов: на заказ свободно 4 - 2 = 2 шт.
+        ProductSize.objects.filter(pk=second.pk).update(stock=4)
+
+        with self.assertRaises(InsufficientStock) as error:
+            self.checkout()
+
+        self.assertEqual(error.exception.available, 2)
+        # Списание первого размера откатилось вместе с заказом
+        self.assertEqual(self.stocks(), [5, 4])
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.cart.items.count(), 2)
+        self.assertEqual(self.cart.reservations.count(), 2)
+
+    def test_expired_reservations_do_not_count(self):
+        size = self.sizes[0]
+        reserve_stock(self.other.cart, size, 5)
+        with self.assertRaises(InsufficientStock):
+            reserve_stock(self.cart, size, 1)
+
+        self.other.cart.reservations.update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        reserve_stock(self.cart, size, 5)
+
+        self.assertEqual(release_expired_reservations(), 1)
+        self.assertEqual(
+            list(StockReservation.objects.values_list("cart_id", "quantity")),
+            [(self.cart.pk, 5)],
+        )
+
+    def test_order_releases_own_reservation(self):
+        size = self.sizes[0]
+        upsert_cart_items(self.cart, {size: 2})
+        reserve_stock(self.other.cart, size, 3)
+
+        order = self.checkout()
+
+        self.assertEqual(order.items.get().quantity, 2)
+        self.assertEqual(self.stocks(), [3, 5])
+        self.assertFalse(self.cart.items.exists())
+        self.assertFalse(self.cart.reservations.exists())
+        # Чужой резерв остаётся и по-прежнему занимает остаток
+        self.assertEqual(get_reserved_by_others(self.cart, size.pk), 3)
+        with self.assertRaises(InsufficientStock):
+            reserve_stock(self.cart, size, 1)
+
+    def test_untracked_stock_is_not_reserved(self):
+        size = self.sizes[0]
+        reserve_stock(self.cart, size, 2)
+        ProductSize.objects.filter(pk=size.pk).update(stock=None)
+
+        upsert_cart_items(self.cart, {size: MAX_CART_QUANTITY})
+        self.assertFalse(self.cart.reservations.exists())
+
+        self.checkout()
+        self.assertEqual(self.stocks(), [None, 5])
+
+
+class IdempotentCheckoutTests(TestCase):
+    """Повтор оформления заказа с тем же Idempotency-Key (orders/utils/idempotency.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sizes = create_sizes(1, stock=5)
+        cls.user = create_buyer()
+        cls.pickup_point = create_pickup_point()
+
+    def setUp(self):
+        caches["throttling"].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        upsert_cart_items(self.user.cart, {self.sizes[0]: 2})
+
+    def checkout(self, key, **data):
+        return self.client.post(
+            reverse("order-checkout"),
+            {
+                "delivery_method": "pickup",
+                "pickup_point_id": self.pickup_point.pk,
+                **data,
+            },
+            format="json",
+            headers={IDEMPOTENCY_HEADER: key},
+        )
+
+    def test_retry_returns_first_order(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.checkout("retry-key")
+        with self.captureOnCommitCallbacks(execute=True):
+            retry = self.checkout("retry-key")
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.data["id"], first.data["id"])
+        self.assertEqual(retry.headers["Idempotent-Replayed"], "true")
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(ProductSize.objects.get(pk=self.sizes[0].pk).stock, 3)
+        # Письмо «заказ принят» отправлено один раз
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_key_reuse_with_other_payload(self):
+        self.checkout("reused-key")
+        response = self.checkout("reused-key", comment="другое тело")
+        self.assertEqual(response.status_code, 422)
+
+    def test_server_error_releases_key(self):
+        with mock.patch("orders.views.create_order", side_effect=RuntimeError("сбой")):
+            failed = self.checkout("failed-key")
+        self.assertEqual(failed.status_code, 500)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        retry = self.checkout("failed-key")
+        self.assertEqual(retry.status_code, 201)
+        self.assertNotIn("Idempotent-Replayed", retry.headers)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_without_key_checkout_is_not_recorded(self):
+        response = self.client.post(
+            reverse("order-checkout"),
+            {"delivery_method": "pickup", "pickup_point_id": self.pickup_point.pk},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class ConcurrentCartAddTests(TransactionTestCase):
+    """
+    Параллельные добавления одного размера (двойной клик, несколько вкладок):
+    ни одна прибавка не теряется, дублей позиции нет.
+    Нужна БД с блокировками строк (PostgreSQL); на SQLite тест пропускается.
+    """
+
+    workers = 8
+    adds_per_worker = 5
+
+    def run_concurrently(self, target):
+        barrier = threading.Barrier(self.workers)
+        errors = []
+
+        def worker():
+            try:
+                barrier.wait()
+                target()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors
+
+    def test_concurrent_adds_are_not_lost(self):
+        product_size = create_sizes(1)[0]
+        cart = create_buyer().cart
+
+        def add():
+            for _ in range(self.adds_per_worker):
+                upsert_cart_items(cart, {product_size: 1})
+
+        self.assertEqual(self.run_concurrently(add), [])
+        item = CartItem.objects.get(cart=cart)
+        self.assertEqual(item.quantity, self.workers * self.adds_per_worker)
+
+    def test_concurrent_adds_respect_stock(self):
+        stock = self.workers * self.adds_per_worker // 2
+        product_size = create_sizes(1, stock=stock)[0]
+        carts = [create_buyer(f"buyer{n}@example.com").cart for n in range(self.workers)]
+        carts_iter = iter(carts)
+        lock = threading.Lock()
+
+        def add():
+            with lock:
+                cart = next(carts_iter)
+            for _ in range(self.adds_per_worker):
+                try:
+                    upsert_cart_items(cart, {product_size: 1})
+                except InsufficientStock:
+                    pass
+
+        self.assertEqual(self.run_concurrently(add), [])
+        reserved = sum(
+            StockReservation.objects.filter(product_size=product_size).values_list(
+                "quantity", flat=True
+            )
+        )
+        self.assertEqual(reserved, stock)
+        self.assertEqual(ProductSize.objects.get(pk=product_size.pk).stock, stock)
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """Одновременные дубли оформления с одним ключом создают один заказ"""
+
+    workers = 4
+
+    def test_concurrent_duplicates_create_one_order(self):
+        product_size = create_sizes(1, stock=5)[0]
+        user = create_buyer()
+        pickup_point = create_pickup_point()
+        upsert_cart_items(user.cart, {product_size: 1})
+
+        barrier = threading.Barrier(self.workers)
+        responses = []
+
+        def worker():
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                barrier.wait()
+                responses.append(
+                    client.post(
+                        reverse("order-checkout"),
+                        {"delivery_method": "pickup", "pickup_point_id": pickup_point.pk},
+                        format="json",
+                        headers={IDEMPOTENCY_HEADER: "same-key"},
+                    )
+                )
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([response.status_code for response in responses], [201] * 4)
+        self.assertEqual(len({response.data["id"] for response in responses}), 1)
+        self.assertEqual(Order.objects.count(), 1)
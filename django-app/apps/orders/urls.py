@@ -5,8 +5,17 @@ urlpatterns = [
     # Корзина
     path("cart/", views.cart_view, name="cart-detail"),
     path("cart/add/", views.cart_add_item, name="cart-add"),
+    path("cart/items/", views.cart_batch_items, name="cart-batch"),
     path("cart/item/<int:pk>/", views.cart_update_item, name="cart-update"),
     path("cart/item/<int:pk>/delete/", views.cart_remove_item, name="cart-delete"),
+    # Гостевая корзина (без авторизации, переносится в корзину при входе)
+    path("cart/guest/", views.guest_cart_view, name="guest-cart-detail"),
+    path("cart/guest/items/", views.guest_cart_batch_items, name="guest-cart-batch"),
+    path(
+        "cart/guest/item/<int:pk>/delete/",
+        views.guest_cart_remove_item,
+        name="guest-cart-delete",
+    ),
     # Заказы
     path("orders/checkout/", views.order_create, name="order-checkout"),
     path("orders/", views.order_list, name="order-list"),
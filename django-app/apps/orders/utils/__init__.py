@@ -0,0 +1,39 @@
+from .stock import (
+    RESERVATION_TTL,
+    InsufficientStock,
+    get_reserved_by_others,
+    reserve_stock,
+    release_stock,
+    commit_stock,
+    release_expired_reservations,
+)
+from .orders import (
+    CheckoutError,
+    create_order,
+    calculate_order_totals,
+    get_order_email_context,
+)
+from .cart import (
+    MAX_CART_QUANTITY,
+    line_total_expression,
+    get_cart_items_queryset,
+    get_cart_with_items,
+    upsert_cart_items,
+)
+from .guest_cart import (
+    GUEST_CART_COOKIE,
+    GUEST_CART_MAX_ITEMS,
+    read_guest_cart,
+    set_guest_cart_cookie,
+    delete_guest_cart_cookie,
+    get_guest_cart_items,
+    merge_guest_cart,
+)
+from .idempotency import (
+    IDEMPOTENCY_HEADER,
+    IDEMPOTENCY_KEY_TTL,
+    get_request_fingerprint,
+    claim_idempotency_key,
+    idempotent,
+    clear_expired_idempotency_keys,
+)
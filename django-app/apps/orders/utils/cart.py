@@ -0,0 +1,127 @@
+# КОРЗИНА: ДОБАВЛЕНИЕ ПОЗИЦИЙ (UPSERT) И ВЫБОРКА ДЛЯ ОТВЕТОВ API (CartSerializer)
+
+from django.db import connection, transaction
+from django.db.models import DecimalField, F, Prefetch, Sum, Value
+from django.db.models.functions import Coalesce
+from .stock import reserve_stock
+
+# Стоимость позиции считается в БД: количество × итоговая цена размера
+LINE_TOTAL_FIELD = DecimalField(max_digits=12, decimal_places=2)
+
+# Наибольшее количество одного размера в корзине (и в гостевой)
+MAX_CART_QUANTITY = 99
+
+
+def line_total_expression(prefix=""):
+    return F(f"{prefix}quantity") * F(f"{prefix}product_size__final_price")
+
+
+def get_cart_items_queryset():
+    """
+    Позиции корзины со всем, что нужно CartItemSerializer: размер, вариант,
+    базовый товар (для названия), цвет и фото варианта (одним prefetch-запросом)
+    """
+    from xwear.models import ProductImage
+    from ..models import CartItem
+
+    return (
+        CartItem.objects.select_related(
+            "product_size__size",
+            "product_size__variant__color",
+            "product_size__variant__product__brand",
+            "product_size__variant__product__category",
+        )
+        .prefetch_related(
+            Prefetch(
+                "product_size__variant__images",
+                queryset=ProductImage.objects.order_by("-is_main", "position"),
+            )
+        )
+        .annotate(line_total=line_total_expression())
+        .order_by("id")
+    )
+
+
+def get_cart_with_items(**filters):
+    """
+    Корзина для ответа API за фиксированное число запросов (3 при любом числе позиций):
+    корзина с суммой (аннотация Sum), позиции с размерами/вариантами, фото вариантов.
+    filters — условие поиска корзины (user=..., pk=...); нет корзины — None.
+    """
+    from ..models import Cart
+
+    return (
+        Cart.objects.filter(**filters)
+        .annotate(
+            items_total=Coalesce(
+                Sum(line_total_expression("items__"), output_field=LINE_TOTAL_FIELD),
+                Value(0),
+                output_field=LINE_TOTAL_FIELD,
+            )
+        )
+        .prefetch_related(Prefetch("items", queryset=get_cart_items_queryset()))
+        .first()
+    )
+
+
+def upsert_cart_items(cart, quantities, replace=False):
+    """
+    Добавляет позиции в корзину одним запросом
+    INSERT ... ON CONFLICT (cart_id, product_size_id) DO UPDATE SET quantity = ...:
+    к имеющемуся количеству прибавляется новое (replace=True — заменяется),
+    сумма ограничивается MAX_CART_QUANTITY.
+    Двойные клики и параллельные вкладки не теряют прибавки и не создают дублей.
+    quantities — {ProductSize: шт.}. Резервы пересчитываются на итоговое количество,
+    при нехватке — InsufficientStock и откат всей пачки.
+    Возвращает {product_size_id: итоговое количество}.
+    """
+    from xwear.models import ProductSize
+    from ..models import CartItem
+
+    sizes = {product_size.pk: product_size for product_size in quantities}
+    ids = sorted(sizes)
+
+    opts = CartItem._meta
+    qn = connection.ops.quote_name
+    table = qn(opts.db_table)
+    cart_column = qn(opts.get_field("cart").column)
+    size_column = qn(opts.get_field("product_size").column)
+    quantity_column = qn(opts.get_field("quantity").column)
+    new_quantity = f"EXCLUDED.{quantity_column}"
+    if not replace:
+        total = f"{table}.{quantity_column} + {new_quantity}"
+        # LEAST() нет в SQLite
+        new_quantity = (
+            f"CASE WHEN {total} > {MAX_CART_QUANTITY} "
+            f"THEN {MAX_CART_QUANTITY} ELSE {total} END"
+        )
+
+    sql = (
+        f"INSERT INTO {table} ({cart_column}, {size_column}, {quantity_column}) "
+        f"VALUES {', '.join(['(%s, %s, %s)'] * len(ids))} "
+        f"ON CONFLICT ({cart_column}, {size_column}) "
+        f"DO UPDATE SET {quantity_column} = {new_quantity} "
+        f"RETURNING {size_column}, {quantity_column}"
+    )
+    params = []
+    for pk in ids:
+        params.extend([cart.pk, pk, min(quantities[sizes[pk]], MAX_CART_QUANTITY)])
+
+    with transaction.atomic():
+        # Размеры с учётом остатка блокируются до позиций корзины и в порядке id —
+        # как при оформлении заказа (commit_stock), поэтому добавление и оформление
+        # не блокируют друг друга. Размеры без учёта остатка резервов не требуют
+        list(
+            ProductSize.objects.select_for_update()
+            .filter(pk__in=ids, stock__isnull=False)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            result = dict(cursor.fetchall())
+
+        for pk in ids:
+            reserve_stock(cart, sizes[pk], result[pk])
+
+    return result
@@ -0,0 +1,147 @@
+# ГОСТЕВАЯ КОРЗИНА (подписанная кука, без записей в БД) И ПЕРЕНОС ПРИ ВХОДЕ
+
+import logging
+from decimal import Decimal
+from django.conf import settings
+from .cart import MAX_CART_QUANTITY, upsert_cart_items
+from .stock import InsufficientStock
+
+logger = logging.getLogger("apps")
+
+GUEST_CART_COOKIE = "guest_cart"
+GUEST_CART_SALT = "orders.guest_cart"
+GUEST_CART_MAX_AGE = 30 * 24 * 60 * 60  # 30 дней
+# Кука ограничена ~4 Кб: "id:шт." через запятую
+GUEST_CART_MAX_ITEMS = 50
+
+
+def read_guest_cart(request):
+    """
+    Содержимое гостевой корзины из подписанной куки: {product_size_id: шт.}.
+    Подделанная, просроченная или повреждённая кука — пустая корзина.
+    """
+    value = request.get_signed_cookie(
+        GUEST_CART_COOKIE, default="", salt=GUEST_CART_SALT, max_age=GUEST_CART_MAX_AGE
+    )
+    quantities = {}
+    for line in value.split(",")[:GUEST_CART_MAX_ITEMS]:
+        try:
+            pk, quantity = (int(part) for part in line.split(":"))
+        except ValueError:
+            continue
+        if pk > 0 and quantity > 0:
+            quantities[pk] = min(quantity, MAX_CART_QUANTITY)
+    return quantities
+
+
+def set_guest_cart_cookie(response, quantities):
+    if not quantities:
+        return delete_guest_cart_cookie(response)
+    value = ",".join(f"{pk}:{quantity}" for pk, quantity in quantities.items())
+    response.set_signed_cookie(
+        GUEST_CART_COOKIE,
+        value,
+        salt=GUEST_CART_SALT,
+        max_age=GUEST_CART_MAX_AGE,
+        httponly=settings.COOKIE_HTTP_ONLY,
+        secure=settings.COOKIE_SECURE,
+        samesite=settings.COOKIE_SAMESITE,
+    )
+    return response
+
+
+def delete_guest_cart_cookie(response):
+    response.delete_cookie(GUEST_CART_COOKIE, samesite=settings.COOKIE_SAMESITE)
+    return response
+
+
+def get_available_sizes(ids):
+    """
+    Размеры, доступные для корзины, одним запросом (+ фото вариантов одним prefetch):
+    {id: ProductSize}. Неактивные, без цены и без остатка не попадают.
+    """
+    from django.db.models import Prefetch
+    from xwear.models import ProductImage, ProductSize
+
+    sizes = (
+        ProductSize.objects.filter(
+            pk__in=ids,
+            is_active=True,
+            final_price__isnull=False,
+            variant__is_active=True,
+            variant__product__is_active=True,
+        )
+        .exclude(stock=0)
+        .select_related(
+            "size",
+            "variant__color",
+            "variant__product__brand",
+            "variant__product__category",
+        )
+        .prefetch_related(
+            Prefetch(
+                "variant__images",
+                queryset=ProductImage.objects.order_by("-is_main", "position"),
+            )
+        )
+    )
+    return {product_size.pk: product_size for product_size in sizes}
+
+
+def get_guest_cart_items(quantities):
+    """
+    Позиции гостевой корзины для CartItemSerializer (несохранённые CartItem)
+    и сумма. Цены берутся из БД в момент чтения, а не из куки;
+    недоступные размеры отбрасываются. Возвращает (позиции, сумма).
+    """
+    from ..models import CartItem
+
+    sizes = get_available_sizes(quantities)
+    items = []
+    total = Decimal("0.00")
+    for pk, quantity in quantities.items():
+        product_size = sizes.get(pk)
+        if product_size is None:
+            continue
+        item = CartItem(product_size=product_size, quantity=quantity)
+        item.line_total = product_size.final_price * quantity
+        total += item.line_total
+        items.append(item)
+    return items, total
+
+
+def merge_guest_cart(request, user):
+    """
+    Переносит гостевую корзину в корзину пользователя (вход, активация аккаунта)
+    одним upsert: количества прибавляются к уже лежащим в корзине.
+    Размер, которого не хватает, добавляется в доступном количестве или пропускается —
+    вход не должен падать из-за корзины. Возвращает число перенесённых позиций.
+    """
+    from ..models import Cart
+
+    quantities = read_guest_cart(request)
+    if not quantities:
+        return 0
+
+    cart, _ = Cart.objects.get_or_create(user=user)
+    sizes = get_available_sizes(quantities)
+    lines = {sizes[pk]: quantity for pk, quantity in quantities.items() if pk in sizes}
+
+    while lines:
+        try:
+            upsert_cart_items(cart, lines)
+            break
+        except InsufficientStock as e:
+            # Доступное количество уже учитывает то, что лежит в корзине пользователя
+            current = cart.items.filter(product_size=e.product_size).values_list(
+                "quantity", flat=True
+            )
+            extra = e.available - (current.first() or 0)
+            if extra > 0:
+                lines[e.product_size] = extra
+            else:
+                del lines[e.product_size]
+
+    if lines:
+        logger.info("Гостевая корзина перенесена: %s (%s поз.)", user.email, len(lines))
+    return len(lines)
@@ -0,0 +1,104 @@
+# ИДЕМПОТЕНТНОСТЬ ЗАПРОСОВ (заголовок Idempotency-Key, модель IdempotencyKey)
+
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+# Сколько хранится снимок ответа (повтор после этого выполнится заново)
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+
+
+def get_request_fingerprint(request):
+    """Отпечаток запроса (метод, путь, тело): тот же ключ с другим телом — ошибка клиента"""
+    payload = json.dumps(
+        [request.method, request.path, request.data],
+        sort_keys=True,
+        cls=DjangoJSONEncoder,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def claim_idempotency_key(user, key, fingerprint):
+    """
+    Занимает ключ в текущей транзакции: (запись, True), если запрос выполняется впервые,
+    иначе (запись с сохранённым ответом, False).
+    Запись фиксируется только вместе с результатом первого запроса: одновременный дубль
+    упирается в уникальный индекс (user, key) и ждёт конца его транзакции —
+    после коммита получает сохранённый ответ, после отката занимает ключ сам.
+    Упавший процесс откатывает транзакцию и тем освобождает ключ, поэтому
+    по возрасту ключ не отбирается: медленный запрос не выполнится дважды.
+    """
+    from ..models import IdempotencyKey
+
+    now = timezone.now()
+    # Истёкший снимок освобождает ключ
+    IdempotencyKey.objects.filter(user=user, key=key, expires_at__lte=now).delete()
+
+    return IdempotencyKey.objects.get_or_create(
+        user=user,
+        key=key,
+        defaults={"fingerprint": fingerprint, "expires_at": now + IDEMPOTENCY_KEY_TTL},
+    )
+
+
+def idempotent(view):
+    """
+    Декоратор view (под @api_view): при заголовке Idempotency-Key
+    повтор запроса возвращает сохранённый ответ первого, не выполняя view ещё раз.
+    Ключ, изменения view и снимок ответа фиксируются одной транзакцией (заказ
+    и снимок сохраняются вместе). Ответ 5xx или исключение откатывают транзакцию
+    вместе с ключом — такой запрос можно повторить. Без заголовка view работает как обычно.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view(request, *args, **kwargs)
+        if len(key) > 64:
+            return Response(
+                {"error": f"{IDEMPOTENCY_HEADER}: не длиннее 64 символов"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        fingerprint = get_request_fingerprint(request)
+        with transaction.atomic():
+            record, created = claim_idempotency_key(request.user, key, fingerprint)
+            if created:
+                response = view(request, *args, **kwargs)
+                if response.status_code < 500:
+                    record.status_code = response.status_code
+                    record.response = response.data
+                    record.save(update_fields=["status_code", "response"])
+                else:
+                    # 5xx: откатываем вместе с ключом, повтор выполнится заново
+                    transaction.set_rollback(True)
+                return response
+
+        if record.fingerprint != fingerprint:
+            return Response(
+                {"error": f"{IDEMPOTENCY_HEADER} уже использован для другого запроса"},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        return Response(
+            record.response,
+            status=record.status_code,
+            headers={"Idempotent-Replayed": "true"},
+        )
+
+    return wrapper
+
+
+def clear_expired_idempotency_keys():
+    """Удаляет истёкшие ключи; возвращает число"""
+    from ..models import IdempotencyKey
+
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
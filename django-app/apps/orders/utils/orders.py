@@ -0,0 +1,187 @@
+# ОФОРМЛЕНИЕ, РАСЧЁТ И ПИСЬМА ЗАКАЗА
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from xwear.utils import get_thumbnail_data
+from core.models import CommercialConfig, ContactSettings
+from .stock import commit_stock
+
+
+# Формируем расширенный контекст для писем заказа
+def get_order_email_context(order):
+    # Возвращаем первую запись или создаем пустую (с дефолтными значениями), если её нет
+    config, _ = CommercialConfig.objects.get_or_create(id=1)
+    contacts, _ = ContactSettings.objects.get_or_create(id=1)
+
+    # Итоговая сумма товаров
+    items_total = Decimal("0.00")
+
+    # Собираем данные по товарам
+    items_data = []
+
+    # Определяем алиас минииатюры товара для писем
+    aliases = {"url": "product_small"}
+
+    # Определяем абсолютный путь к изображению
+    for item in order.items.all():
+        image_url = None
+
+        if item.product:
+            main_image_obj = item.product.get_main_image_obj
+
+            if main_image_obj:
+                # Передаем None вместо request,
+                # так как в сигналах request обычно недоступен.
+                thumb_data = get_thumbnail_data(
+                    main_image_obj.image, aliases, request=None
+                )
+
+                if thumb_data and "url" in thumb_data:
+                    # Так как request=None, функция вернет относительный путь /media/...
+                    # Добавляем SITE_URL вручную
+                    image_url = f"{settings.SITE_URL}{thumb_data['url']}"
+
+        # Считаем сумму для конкретной позиции и итоговую сумму
+        line_total = item.price_at_purchase * item.quantity
+        items_total += line_total
+
+        items_data.append(
+            {
+                "name": item.product_name,
+                "size": item.size_name,
+                "quantity": item.quantity,
+                "price": item.price_at_purchase,
+                "total": line_total,
+                "image_url": image_url,
+            }
+        )
+
+    # Имя хранится в профиле (у пользователя его может не быть)
+    profile = getattr(order.user, "profile", None)
+
+    return {
+        "order": order,
+        "items": items_data,
+        "items_total": items_total,  # Сумма товаров без доставки
+        # "site_url": settings.SITE_URL,
+        "user_name": getattr(profile, "first_name", "") or "клиент",
+        "contacts": contacts,
+        "payment_info": config.payment_info,
+    }
+
+
+# расчёт стоимости доставки и итоговой суммы
+def calculate_order_totals(order, items_sum):
+    """
+    items_sum — сумма товаров без учета доставки.
+    """
+    # Возвращаем первую запись или создаем пустую (с дефолтными значениями), если её нет
+    config, _ = CommercialConfig.objects.get_or_create(id=1)
+
+    # 1. Если самовывоз — доставка всегда бесплатна
+    if order.delivery_method == "pickup":
+        delivery_cost = Decimal("0.00")
+
+    else:
+        # 2. Базовая цена из модели City
+        delivery_cost = order.city.delivery_cost
+
+        # 3. Проверяем условие бесплатной доставки
+        if config.is_free_delivery_active:
+            if items_sum >= config.free_delivery_threshold:
+                delivery_cost = Decimal("0.00")
+
+    order.delivery_cost = delivery_cost
+    order.total_price = items_sum + delivery_cost
+    return order
+
+
+class CheckoutError(Exception):
+    """Заказ нельзя оформить: пустая корзина или недоступный товар"""
+
+
+# Оформление заказа из корзины
+def create_order(cart, delivery_method, city, address_text, pickup_point=None):
+    """
+    В одной транзакции: проверка доступности, списание остатков (commit_stock),
+    снимки позиций, расчёт суммы, очистка корзины и резервов.
+    Исключения: CheckoutError, InsufficientStock — заказ не создаётся.
+    """
+    from ..models import Order, OrderItem
+
+    with transaction.atomic():
+        cart_items = list(
+            cart.items.select_related(
+                "product_size__variant__product__category",
+                "product_size__variant__product__brand",
+                "product_size__variant__color",
+                "product_size__size",
+            ).order_by("product_size_id")
+        )
+
+        # 1. Проверяем, не пуста ли корзина
+        if not cart_items:
+            raise CheckoutError("Ваша корзина пуста")
+
+        # 2. Валидация доступности товара перед созданием заказа
+        for item in cart_items:
+            product_size = item.product_size
+            variant = product_size.variant
+            if (
+                not product_size.is_active
+                or product_size.final_price is None
+                or not variant.is_active
+                or not variant.product.is_active
+            ):
+                raise CheckoutError(
+                    f"К сожалению, товар '{variant.full_name}' больше недоступен."
+                )
+
+        # 3. Списываем остатки (строки размеров блокируются до конца транзакции)
+        commit_stock(cart, {item.product_size_id: item.quantity for item in cart_items})
+
+        # 4. Создаем объект заказа
+        order = Order.objects.create(
+            user=cart.user,
+            delivery_method=delivery_method,
+            pickup_point=pickup_point,
+            city=city,
+            address_text=address_text,
+            total_price=0,  # рассчитывается ниже
+            delivery_cost=0,  # рассчитывается ниже
+            status="processing",
+        )
+
+        # 5. Переносим товары из корзины в OrderItem (делаем снимки) и считаем промежуточную сумму
+        items_sum = Decimal("0.00")
+        order_items = []
+        name_length = OrderItem._meta.get_field("product_name").max_length
+
+        for item in cart_items:
+            product = item.product_size.variant.product
+            price = item.product_size.final_price
+            items_sum += price * item.quantity
+
+            order_items.append(
+                OrderItem(
+                    order=order,
+                    product=product,
+                    product_name=product.full_name[:name_length],  # Снимок названия
+                    size_name=item.product_size.size.name,  # Снимок размера
+                    price_at_purchase=price,  # Снимок цены
+                    quantity=item.quantity,  # Снимок кол-ва
+                )
+            )
+
+        # Массовое создание для экономии запросов к БД
+        OrderItem.objects.bulk_create(order_items)
+
+        # 6. ФИНАЛЬНЫЙ РАСЧЕТ
+        order = calculate_order_totals(order, items_sum)
+        order.save()
+
+        # 7. Очищаем корзину
+        cart.items.all().delete()
+
+    return order
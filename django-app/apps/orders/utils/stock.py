@@ -0,0 +1,137 @@
+# ОСТАТКИ И РЕЗЕРВЫ (ProductSize.stock, StockReservation)
+
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+# Сколько держится резерв после добавления в корзину / изменения количества
+RESERVATION_TTL = timedelta(minutes=15)
+
+
+class InsufficientStock(Exception):
+    """Запрошено больше, чем свободно (остаток минус чужие действующие резервы)"""
+
+    def __init__(self, product_size, available):
+        self.product_size = product_size
+        self.available = max(available, 0)
+        super().__init__(
+            f"Товар {product_size.variant.full_name} (размер {product_size.size.name}): "
+            f"доступно {self.available} шт."
+        )
+
+
+def _active_reservations(now=None):
+    from ..models import StockReservation
+
+    return StockReservation.objects.filter(expires_at__gt=now or timezone.now())
+
+
+def get_reserved_by_others(cart, product_size_id):
+    """Сумма действующих резервов размера, кроме резерва этой корзины"""
+    return (
+        _active_reservations()
+        .filter(product_size_id=product_size_id)
+        .exclude(cart=cart)
+        .aggregate(total=Sum("quantity"))["total"]
+        or 0
+    )
+
+
+def reserve_stock(cart, product_size, quantity):
+    """
+    Резервирует quantity шт. размера за корзиной (итоговое количество позиции,
+    а не прибавку) и продлевает резерв на RESERVATION_TTL.
+    Строка размера блокируется на время проверки: параллельные резервы
+    одного размера выполняются по очереди. Исключение — InsufficientStock.
+    """
+    from xwear.models import ProductSize
+    from ..models import StockReservation
+
+    with transaction.atomic():
+        stock = (
+            ProductSize.objects.select_for_update()
+            .values_list("stock", flat=True)
+            .get(pk=product_size.pk)
+        )
+        if stock is None:
+            # Остаток не учитывается — резерв не нужен
+            StockReservation.objects.filter(cart=cart, product_size=product_size).delete()
+            return
+
+        available = stock - get_reserved_by_others(cart, product_size.pk)
+        if quantity > available:
+            raise InsufficientStock(product_size, available)
+
+        StockReservation.objects.update_or_create(
+            cart=cart,
+            product_size=product_size,
+            defaults={
+                "quantity": quantity,
+                "expires_at": timezone.now() + RESERVATION_TTL,
+            },
+        )
+
+
+def release_stock(cart, product_size_ids=None):
+    """Снимает резервы корзины (всех или указанных размеров)"""
+    reservations = cart.reservations.all()
+    if product_size_ids is not None:
+        reservations = reservations.filter(product_size_id__in=product_size_ids)
+    reservations.delete()
+
+
+def commit_stock(cart, quantities):
+    """
+    Списание остатков при оформлении заказа; quantities — {product_size_id: шт.}.
+    Вызывается внутри транзакции заказа:
+    1. строки размеров блокируются в порядке id — два заказа с общими размерами
+       не захватят их крест-накрест (без взаимных блокировок);
+    2. каждое списание — условный UPDATE ... SET stock = stock - n
+       WHERE stock - (чужие резервы) >= n, без чтения-изменения-записи в Python.
+    Резерв этой корзины входит в доступное количество. Исключение — InsufficientStock
+    (транзакция заказа откатывается целиком).
+    """
+    from xwear.models import ProductSize
+
+    ids = sorted(quantities)
+    tracked = list(
+        ProductSize.objects.select_for_update()
+        .filter(pk__in=ids, stock__isnull=False)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+
+    reserved_by_others = Coalesce(
+        Subquery(
+            _active_reservations()
+            .filter(product_size=OuterRef("pk"))
+            .exclude(cart=cart)
+            .values("product_size")
+            .annotate(total=Sum("quantity"))
+            .values("total")
+        ),
+        0,
+    )
+    for pk in tracked:
+        quantity = quantities[pk]
+        updated = ProductSize.objects.filter(
+            pk=pk, stock__gte=reserved_by_others + quantity
+        ).update(stock=F("stock") - quantity)
+        if not updated:
+            product_size = ProductSize.objects.select_related(
+                "variant__product", "variant__color", "size"
+            ).get(pk=pk)
+            available = product_size.stock - get_reserved_by_others(cart, pk)
+            raise InsufficientStock(product_size, available)
+
+    release_stock(cart, ids)
+
+
+def release_expired_reservations():
+    """Удаляет истёкшие резервы (на доступность они уже не влияют); возвращает число"""
+    from ..models import StockReservation
+
+    deleted, _ = StockReservation.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
@@ -1,5 +1,4 @@
 import logging
-from decimal import Decimal
 from django.shortcuts import get_object_or_404
 from django.db import transaction
 from rest_framework import status
@@ -7,32 +6,47 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from accounts.models import Address
-from .models import Cart, CartItem, Order, OrderItem, PickupPoint
+from .models import CartItem, PickupPoint
 from .serializers import (
+    CartBatchSerializer,
     CartSerializer,
     CartItemSerializer,
+    GuestCartItemSerializer,
     OrderSerializer,
     PickupPointSerializer,
 )
-from .utils import calculate_order_totals
+from .utils import (
+    GUEST_CART_MAX_ITEMS,
+    MAX_CART_QUANTITY,
+    CheckoutError,
+    InsufficientStock,
+    create_order,
+    get_cart_with_items,
+    get_guest_cart_items,
+    idempotent,
+    read_guest_cart,
+    set_guest_cart_cookie,
+    release_stock,
+    reserve_stock,
+    upsert_cart_items,
+)
 
 logger = logging.getLogger(__name__)
 
 
+# Корзина целиком (позиции и сумма) — общий ответ всех эндпоинтов корзины,
+# чтобы фронтенд сразу перерисовал итоговую сумму
+def cart_response(request, status_code=status.HTTP_200_OK):
+    cart = get_cart_with_items(user=request.user)
+    serializer = CartSerializer(cart, context={"request": request})
+    return Response(serializer.data, status=status_code)
+
+
 # Получение корзины текущего пользователя
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def cart_view(request):
-    cart = (
-        Cart.objects.filter(user=request.user)
-        .prefetch_related(
-            "items__product_size__product__images", "items__product_size__size"
-        )
-        .first()
-    )
-
-    serializer = CartSerializer(cart, context={"request": request})
-    return Response(serializer.data)
+    return cart_response(request)
 
 
 # Добавление товара в корзину или увеличение количества
@@ -46,19 +60,42 @@ def cart_add_item(request):
         product_size = serializer.validated_data["product_size"]
         quantity = serializer.validated_data.get("quantity", 1)
 
-        # Если такой товар с таким размером уже есть — просто увеличиваем количество
-        item, created = CartItem.objects.get_or_create(
-            cart=cart, product_size=product_size, defaults={"quantity": quantity}
-        )
-        if not created:
-            item.quantity += quantity
-            item.save()
+        try:
+            # Если такой товар с таким размером уже есть — просто увеличиваем количество
+            # (один INSERT ... ON CONFLICT, параллельные клики не теряют прибавки)
+            upsert_cart_items(cart, {product_size: quantity})
+        except InsufficientStock as e:
+            return Response(
+                {"quantity": [f"Доступно всего {e.available} шт."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return cart_response(request, status.HTTP_201_CREATED)
+
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(
-            # Возвращаем обновленную корзину целиком, чтобы фронтенд сразу перерисовал итоговую сумму
-            CartSerializer(cart, context={"request": request}).data,
-            status=status.HTTP_201_CREATED,
-        )
+
+# Добавление или изменение нескольких позиций одним запросом
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def cart_batch_items(request):
+    cart = request.user.cart
+    serializer = CartBatchSerializer(data=request.data)
+
+    if serializer.is_valid():
+        try:
+            upsert_cart_items(
+                cart,
+                serializer.validated_data["items"],
+                replace=serializer.validated_data["replace"],
+            )
+        except InsufficientStock as e:
+            return Response(
+                {"items": {e.product_size.pk: [f"Доступно всего {e.available} шт."]}},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return cart_response(request)
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -68,19 +105,24 @@ def cart_add_item(request):
 @permission_classes([IsAuthenticated])
 def cart_update_item(request, pk):
     # Ищем товар именно в корзине текущего юзера (безопасность!)
-    item = get_object_or_404(CartItem, pk=pk, cart__user=request.user)
+    item = get_object_or_404(
+        CartItem.objects.select_related("cart"), pk=pk, cart__user=request.user
+    )
 
     # Мы разрешаем менять только поле quantity
     serializer = CartItemSerializer(item, data=request.data, partial=True)
 
     if serializer.is_valid():
-        serializer.save()
-        # Возвращаем обновленную корзину целиком, чтобы фронтенд сразу перерисовал итоговую сумму
-        cart = request.user.cart
-        return Response(
-            CartSerializer(cart, context={"request": request}).data,
-            status=status.HTTP_200_OK,
-        )
+        try:
+            with transaction.atomic():
+                item = serializer.save()
+                reserve_stock(item.cart, item.product_size, item.quantity)
+        except InsufficientStock as e:
+            return Response(
+                {"quantity": [f"Доступно всего {e.available} шт."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return cart_response(request)
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -89,42 +131,92 @@ def cart_update_item(request, pk):
 @api_view(["DELETE"])
 @permission_classes([IsAuthenticated])
 def cart_remove_item(request, pk):
-    item = get_object_or_404(CartItem, pk=pk, cart__user=request.user)
-    item.delete()
-    return Response(status=status.HTTP_204_NO_CONTENT)
+    item = get_object_or_404(
+        CartItem.objects.select_related("cart"), pk=pk, cart__user=request.user
+    )
+    with transaction.atomic():
+        release_stock(item.cart, [item.product_size_id])
+        item.delete()
+    return cart_response(request)
+
+
+# --- Гостевая корзина (подписанная кука, без записей в БД) ---
+
+
+def guest_cart_response(request, quantities):
+    # Цены и доступность проверяются при каждом чтении; в куку пишутся только доступные позиции
+    items, total = get_guest_cart_items(quantities)
+    data = {
+        "id": None,
+        "items": GuestCartItemSerializer(
+            items, many=True, context={"request": request}
+        ).data,
+        "total_price": total,
+    }
+    response = Response(data, status=status.HTTP_200_OK)
+    return set_guest_cart_cookie(
+        response, {item.product_size_id: item.quantity for item in items}
+    )
+
+
+# Получение гостевой корзины
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def guest_cart_view(request):
+    return guest_cart_response(request, read_guest_cart(request))
+
+
+# Добавление или изменение позиций гостевой корзины (формат как у cart-batch)
+@api_view(["POST"])
+@permission_classes([AllowAny])
+def guest_cart_batch_items(request):
+    serializer = CartBatchSerializer(data=request.data)
+
+    if serializer.is_valid():
+        quantities = read_guest_cart(request)
+        errors = {}
+        for product_size, quantity in serializer.validated_data["items"].items():
+            if not serializer.validated_data["replace"]:
+                quantity = min(
+                    quantity + quantities.get(product_size.pk, 0), MAX_CART_QUANTITY
+                )
+            # Резервов у гостя нет: сверяемся только с остатком
+            if product_size.stock is not None and quantity > product_size.stock:
+                errors[product_size.pk] = [f"Доступно всего {product_size.stock} шт."]
+            quantities[product_size.pk] = quantity
+
+        if len(quantities) > GUEST_CART_MAX_ITEMS:
+            errors["non_field_errors"] = [
+                f"В корзине может быть не больше {GUEST_CART_MAX_ITEMS} позиций."
+            ]
+        if errors:
+            return Response({"items": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        return guest_cart_response(request, quantities)
+
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+# Удаление позиции из гостевой корзины (pk — ID размера)
+@api_view(["DELETE"])
+@permission_classes([AllowAny])
+def guest_cart_remove_item(request, pk):
+    quantities = read_guest_cart(request)
+    quantities.pop(pk, None)
+    return guest_cart_response(request, quantities)
 
 
 # Оформление заказа из корзины
+# (повтор с тем же Idempotency-Key возвращает уже созданный заказ)
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@idempotent
 def order_create(request):
     user = request.user
     cart = user.cart
     delivery_method = request.data.get("delivery_method")
 
-    # Если применяем остатки, используем не этот код, а код в транзакции
-    # -------------------------------------------------
-    cart_items = cart.items.select_related("product_size__product", "product_size__size")
-
-    # 1. Проверяем, не пуста ли корзина
-    if not cart_items.exists():
-        return Response(
-            {"error": "Ваша корзина пуста"}, status=status.HTTP_400_BAD_REQUEST
-        )
-
-    # 2. Валидация доступности товара перед созданием заказа
-    for item in cart_items:
-        if not item.product_size.product.is_active:
-            return Response(
-                {
-                    "error": f"К сожалению, товар '{item.product_size.product.full_name}' больше недоступен."
-                },
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-    # ------------------------------------------------------------
-
-    # 3. Получаем данные адреса (доставки или ПВЗ) и стоимости из запроса
+    # 1. Получаем данные адреса (доставки или ПВЗ) и стоимости из запроса
     if delivery_method == "delivery":
         address_id = request.data.get("address_id")
 
@@ -162,96 +254,16 @@ def order_create(request):
         address_text = f"ПВЗ: {pickup_point.address} ({pickup_point.work_schedule})"
 
     try:
-        # Атомарная транзакция: либо выполняется всё, либо ничего
-        with transaction.atomic():
-            # Если будем использовать остатки товара (stock в ProductSize)
-            # ------------------------------------------------------------
-            # Блокируем строки ProductSize в базе данных для этого заказа
-            # .select_for_update() гарантирует, что никто другой не изменит остатки, пока транзакция не завершиться
-            # cart_items = cart.items.select_related(
-            #     "product_size__product",
-            #     "product_size__size"
-            # ).select_for_update()
-
-            # if not cart_items.exists():
-            #     return Response(
-            #         {"error": "Ваша корзина пуста"}, status=status.HTTP_400_BAD_REQUEST
-            #     )
-
-            # for item in cart_items:
-            #     ps = item.product_size
-
-            #     # Проверка активности и остатков
-            #     if not ps.product.is_active or ps.stock < item.quantity:
-            #         return Response(
-            #             {
-            #                 "error": f"Товар {ps.product.full_name} (размер {ps.size.name}) недоступен."
-            #             },
-            #             status=status.HTTP_400_BAD_REQUEST,
-            #         )
-
-            #     # Списываем остатки
-            #     ps.stock -= item.quantity
-            #     ps.save()
-
-            # -----------------------------------------------------------
-
-            # 4. Создаем объект заказа
-            order = Order.objects.create(
-                user=user,
-                delivery_method=delivery_method,
-                pickup_point=pickup_point,
-                city=city,
-                address_text=address_text,
-                total_price=0,  # рассчитывается ниже
-                delivery_cost=0,  # рассчитывается ниже
-                status="processing",
-            )
-
-            # 5. Переносим товары из корзины в OrderItem (делаем снимки) и считаем промежуточную сумму
-            items_sum = Decimal("0.00")
-            order_items = []
-
-            for item in cart_items:
-                price = item.product_size.final_price
-                items_sum += price * item.quantity
-
-                order_items.append(
-                    OrderItem(
-                        order=order,
-                        product=item.product_size.product,
-                        product_name=item.product_size.product.full_name,  # Снимок названия
-                        size_name=item.product_size.size.name,  # Снимок размера
-                        price_at_purchase=price,  # Снимок цены
-                        quantity=item.quantity,  # Снимок кол-ва
-                    )
-                )
-            # order_items = [
-            #     OrderItem(
-            #         order=order,
-            #         product=item.product_size.product,
-            #         product_name=item.product_size.product.full_name,  # Снимок имени
-            #         size_name=item.product_size.size.name,  # Снимок размера
-            #         price_at_purchase=item.product_size.final_price,  # Снимок цены
-            #         quantity=item.quantity,
-            #     )
-            #     for item in cart_items
-            # ]
-
-            # Массовое создание для экономии запросов к БД
-            OrderItem.objects.bulk_create(order_items)
-
-            # 6. ФИНАЛЬНЫЙ РАСЧЕТ
-            order = calculate_order_totals(order, items_sum)
-            order.save()
-
-            # 7. Очищаем корзину
-            cart_items.delete()
-
-            # 8. Возвращаем созданный заказ
-            serializer = OrderSerializer(order, context={"request": request})
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-
+        # 2. Проверка корзины, списание остатков и создание заказа — одна транзакция
+        order = create_order(
+            cart,
+            delivery_method=delivery_method,
+            city=city,
+            address_text=address_text,
+            pickup_point=pickup_point,
+        )
+    except (CheckoutError, InsufficientStock) as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(
             "Ошибка при оформлении заказа: %s",
@@ -263,6 +275,10 @@ def order_create(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR,
         )
 
+    # 3. Возвращаем созданный заказ
+    serializer = OrderSerializer(order, context={"request": request})
+    return Response(serializer.data, status=status.HTTP_201_CREATED)
+
 
 # Список всех заказов текущего пользователя
 @api_view(["GET"])
@@ -4,7 +4,7 @@ from django.contrib import admin
 from adminsortable2.admin import SortableAdminMixin
 from django_jsonform.widgets import JSONFormWidget
 from core.admin import ReadOnlyAdminMixin
-from ..models import SliderBanner, Favorite
+from ..models import SliderBanner, Favorite, PriceCampaign
 from ..utils import add_validator_attrs_to_widget
 from .base import BannerPreviewMixin
 
@@ -64,3 +64,39 @@ class SliderBannerAdmin(BannerPreviewMixin, SortableAdminMixin, admin.ModelAdmin
 
     class Media:
         js = ("admin/js/image_preview.js",)
+
+
+@admin.register(PriceCampaign)
+class PriceCampaignAdmin(admin.ModelAdmin):
+    list_display = (
+        "name",
+        "discount_percent",
+        "starts_at",
+        "ends_at",
+        "status",
+        "sizes_count",
+    )
+    list_filter = ("status",)
+    search_fields = ("name",)
+    autocomplete_fields = ("category", "brand", "variants")
+    readonly_fields = ("status", "sizes_count")
+    fieldsets = (
+        (None, {"fields": ("name", "discount_percent", ("starts_at", "ends_at"))}),
+        ("Условия", {"fields": ("category", "brand", "variants")}),
+        ("Состояние", {"fields": ("status", "sizes_count")}),
+    )
+
+    def get_readonly_fields(self, request, obj=None):
+        # Скидка и условия применяются при запуске: у идущей/завершённой кампании
+        # можно менять только окончание (продлить или завершить раньше)
+        if obj and obj.status != PriceCampaign.Status.SCHEDULED:
+            return (
+                "name",
+                "discount_percent",
+                "starts_at",
+                "category",
+                "brand",
+                "variants",
+                *self.readonly_fields,
+            )
+        return self.readonly_fields
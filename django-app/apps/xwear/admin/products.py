@@ -1,7 +1,6 @@
 # БАЗОВЫЕ ТОВАРЫ, ВАРИАНТЫ
 
 from django.contrib import admin, messages
-from django.db import transaction
 from django.db.models import (
     Count,
     F,
@@ -22,6 +21,7 @@ from ..forms import (
     ProductSizeForm,
     ProductSizeFormSet,
     ProductImageFormSet,
+    RepriceActionForm,
 )
 from ..models import (
     Category,
@@ -32,10 +32,14 @@ from ..models import (
     ProductSize,
     ProductMaterial,
 )
-from ..utils import add_validator_attrs_to_widget
+from ..utils import (
+    PriceOverflow,
+    add_validator_attrs_to_widget,
+    preview_repricing,
+    reprice_sizes,
+)
 from .base import ImagePreviewMixin, MainPreviewMixin
 
-
 # ==========================================
 # 1. ФИЛЬТРЫ
 # ==========================================
@@ -254,7 +258,14 @@ class ProductSizeInline(admin.TabularInline):
     form = ProductSizeForm
     formset = ProductSizeFormSet
     extra = 0
-    fields = ["size", "price", "discount_percent", "display_final_price", "is_active"]
+    fields = [
+        "size",
+        "price",
+        "discount_percent",
+        "display_final_price",
+        "stock",
+        "is_active",
+    ]
     # Это делает выбор размера быстрым поиском (требует search_fields в SizeAdmin)
     autocomplete_fields = ["size"]
     readonly_fields = ["display_final_price"]
@@ -263,6 +274,13 @@ class ProductSizeInline(admin.TabularInline):
     @admin.display(description="Итоговая цена")
     def display_final_price(self, obj):
         if obj and obj.pk and obj.final_price:
+            if obj.campaign_id:
+                # В поле скидки — собственная скидка размера, действует скидка кампании
+                return format_html(
+                    '<strong style="color: #28a745;">{} </strong> (кампания -{}%)',
+                    obj.final_price,
+                    obj.discount_percent,
+                )
             return format_html(
                 '<strong style="color: #28a745;">{} </strong>', obj.final_price
             )
@@ -528,6 +546,9 @@ class ProductVariantAdmin(
 
     form = ProductVariantAdminForm
     inlines = [ProductImageInline, ProductMaterialInline, ProductSizeInline]
+    # Поля "Скидка %" и "Цена ±%" рядом с выбором действия
+    action_form = RepriceActionForm
+    actions = ["preview_reprice", "apply_reprice"]
 
     list_display = [
         "article",
@@ -714,6 +735,65 @@ class ProductVariantAdmin(
             )
         )
 
+    # --- МАССОВАЯ ПЕРЕОЦЕНКА ---
+
+    def _get_reprice_params(self, request):
+        form = self.action_form(request.POST)
+        # Как в changelist_view: без списка действий форма не валидна
+        form.fields["action"].choices = self.get_action_choices(request)
+        if not form.is_valid():
+            for errors in form.errors.values():
+                messages.error(request, errors[0])
+            return None
+        params = {
+            "discount": form.cleaned_data["discount_percent"],
+            "price_change": form.cleaned_data["price_change"],
+        }
+        if params["discount"] is None and not params["price_change"]:
+            messages.error(request, "Укажите скидку или изменение цены в процентах.")
+            return None
+        return params
+
+    def _get_reprice_sizes(self, queryset):
+        # Активные размеры выбранных вариантов (как при скидке из карточки)
+        return ProductSize.objects.filter(
+            variant_id__in=queryset.values("pk"), is_active=True
+        )
+
+    @admin.action(description="Переоценка: предпросмотр изменений")
+    def preview_reprice(self, request, queryset):
+        params = self._get_reprice_params(request)
+        if params is None:
+            return
+        try:
+            changed, sample = preview_repricing(
+                self._get_reprice_sizes(queryset), limit=5, **params
+            )
+        except PriceOverflow as e:
+            messages.error(request, str(e))
+            return
+        lines = [
+            f"{article} / {size}: {price} → {new_price}, итог {final} → {new_final}"
+            for article, size, price, new_price, final, new_final in sample
+        ]
+        self.message_user(
+            request,
+            f"Будет изменено размеров: {changed}. " + "; ".join(lines),
+            messages.INFO,
+        )
+
+    @admin.action(description="Переоценка: применить к активным размерам")
+    def apply_reprice(self, request, queryset):
+        params = self._get_reprice_params(request)
+        if params is None:
+            return
+        try:
+            updated = reprice_sizes(self._get_reprice_sizes(queryset), **params)
+        except PriceOverflow as e:
+            messages.error(request, str(e))
+            return
+        self.message_user(request, f"Переоценено размеров: {updated}.")
+
     def save_model(self, request, obj, form, change):
         # 1. Сброс артикула/слага при необходимости
         # Если в карточке варианта товара чекбокс перегенерации нажат — очищаем поле прямо перед сохранением
@@ -746,16 +826,8 @@ class ProductVariantAdmin(
         discount_value = form.cleaned_data.get("set_discount_all_sizes")
 
         if discount_value is not None:
-            # Получаем все активные размеры варианта
-            sizes = variant.sizes.filter(is_active=True)
-
-            # Используем транзакцию для надежности
-            with transaction.atomic():
-                for size in sizes:
-                    # Устанавливаем скидку
-                    size.discount_percent = discount_value
-                    # Вызываем .save(), чтобы сработал расчет final_price
-                    size.save()
+            # Все активные размеры варианта одним UPDATE (final_price считается в БД)
+            reprice_sizes(variant.sizes.filter(is_active=True), discount=discount_value)
 
             self.message_user(
                 request,
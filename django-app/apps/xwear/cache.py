@@ -0,0 +1,222 @@
+# КЭШ КАТАЛОГА: ВЕРСИОНИРОВАННЫЕ КЛЮЧИ И ИНВАЛИДАЦИЯ ГРУППАМИ
+
+import functools
+import hashlib
+import json
+import time
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.connection import ConnectionProxy
+from django.utils.http import parse_etags, quote_etag
+from rest_framework.renderers import JSONRenderer
+
+# Алиас "catalog" из settings.CACHES
+catalog_cache = ConnectionProxy(caches, "catalog")
+
+GROUP_VERSION_PREFIX = "group-version"
+
+# Отличает закэшированный None от промаха
+_MISSING = object()
+
+
+def _version_key(group):
+    return f"{GROUP_VERSION_PREFIX}:{group}"
+
+
+def get_group_versions(groups):
+    """
+    Текущие версии групп одним обращением к кэшу.
+    Версия — метка времени: если ключ версии вытеснен, новая версия
+    не совпадёт ни с одной старой, и устаревшие данные не всплывут.
+    """
+    keys = {group: _version_key(group) for group in groups}
+    found = catalog_cache.get_many(keys.values())
+
+    versions = {}
+    for group, key in keys.items():
+        if key not in found:
+            # add не перезапишет версию, которую параллельно создал другой процесс
+            catalog_cache.add(key, time.time_ns(), timeout=None)
+            found[key] = catalog_cache.get(key)
+        versions[group] = found[key]
+    return versions
+
+
+def make_key(name, *parts, groups=()):
+    """
+    Ключ вида "name:<версии групп>:<хэш частей>".
+    Смена версии любой из групп делает все старые ключи недостижимыми.
+    """
+    versions = get_group_versions(groups)
+    version = ".".join(str(versions[group]) for group in groups)
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f"{name}:{version}:{digest}"
+
+
+def get_or_build(name, *parts, groups=(), factory, timeout=None):
+    """Значение из кэша или результат factory(), сохранённый под версионированным ключом"""
+    key = make_key(name, *parts, groups=groups)
+    value = catalog_cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = factory()
+        if timeout is None:
+            catalog_cache.set(key, value)
+        else:
+            catalog_cache.set(key, value, timeout)
+    return value
+
+
+def invalidate_groups(*groups):
+    """
+    Новая версия для групп после коммита транзакции
+    (иначе параллельный запрос успеет закэшировать ещё не закоммиченные данные).
+    """
+
+    def bump():
+        version = time.time_ns()
+        catalog_cache.set_many(
+            {_version_key(group): version for group in groups}, timeout=None
+        )
+
+    transaction.on_commit(bump)
+
+
+# ==========================================
+# КЭШ ОТВЕТОВ ДЛЯ АНОНИМНЫХ ПОСЕТИТЕЛЕЙ
+# ==========================================
+
+
+def _normalized_params(request):
+    # ?b=2&a=1 и ?a=1&b=2 — один и тот же ответ
+    params = request.query_params
+    return sorted((name, sorted(params.getlist(name))) for name in params)
+
+
+def cache_response(*groups, timeout=None):
+    """
+    Кэширует JSON-ответ GET-вьюхи для анонимных пользователей.
+    Ключ: абсолютный путь (с хостом — в ответах абсолютные URL),
+    нормализованные параметры запроса и версии групп.
+    groups — имена групп или функции (request, *args, **kwargs) -> имя группы.
+    Поддерживает ETag/If-None-Match (304 без тела).
+
+    Ставится под @api_view/@permission_classes:
+        @api_view(["GET"])
+        @cache_response("categories")
+        def category_tree_view(request): ...
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != "GET" or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+
+            view_groups = [
+                group(request, *args, **kwargs) if callable(group) else group
+                for group in groups
+            ]
+            key = make_key(
+                "response",
+                request.build_absolute_uri(request.path),
+                _normalized_params(request),
+                groups=view_groups,
+            )
+
+            cached = catalog_cache.get(key)
+            if cached is None:
+                response = view(request, *args, **kwargs)
+                # Ошибки и редиректы не кэшируем
+                if response.status_code != 200:
+                    return response
+                content = JSONRenderer().render(response.data)
+                cached = {
+                    "content": content,
+                    "etag": quote_etag(hashlib.md5(content).hexdigest()),
+                }
+                if timeout is None:
+                    catalog_cache.set(key, cached)
+                else:
+                    catalog_cache.set(key, cached, timeout)
+
+            if cached["etag"] in parse_etags(request.headers.get("If-None-Match", "")):
+                response = HttpResponseNotModified()
+            else:
+                response = HttpResponse(
+                    cached["content"], content_type="application/json"
+                )
+            response["ETag"] = cached["etag"]
+            # Авторизованным отдаётся некэшированный ответ
+            patch_vary_headers(response, ["Authorization"])
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+# ==========================================
+# ГРУППЫ КАТАЛОГА
+# ==========================================
+
+# Дерево категорий (пути, хлебные крошки, меню)
+CATEGORIES_GROUP = "categories"
+# Справочники (бренды, цвета, размеры, материалы): и листинги, и карточки
+REFERENCES_GROUP = "references"
+# Слайдер на главной
+BANNERS_GROUP = "banners"
+
+
+def variant_group(variant_id):
+    """Карточка конкретного варианта"""
+    return f"variant:{variant_id}"
+
+
+def category_group(category_id):
+    """Листинг категории (вместе с товарами подкатегорий)"""
+    return f"category:{category_id}"
+
+
+def category_chain_groups(category_ids):
+    """Листинги категорий и всех их предков: товар виден в листинге каждого предка"""
+    from .utils import get_category_breadcrumbs
+
+    groups = set()
+    for category_id in category_ids:
+        crumbs = get_category_breadcrumbs(category_id) or [{"id": category_id}]
+        groups.update(category_group(crumb["id"]) for crumb in crumbs)
+    return groups
+
+
+def variant_family_groups(variant_ids):
+    """
+    Карточки вариантов, их соседей по товару (карточка показывает соседние цвета)
+    и листинги категорий этих товаров.
+    """
+    from .models import ProductVariant
+
+    rows = ProductVariant.objects.filter(product__variants__in=variant_ids).values_list(
+        "pk", "product__category_id"
+    )
+    groups = {variant_group(pk) for pk, _ in rows}
+    # Удалённые варианты уже не найти запросом
+    groups.update(variant_group(pk) for pk in variant_ids)
+    groups.update(category_chain_groups({category_id for _, category_id in rows}))
+    return groups
+
+
+def _invalidate_variant_families(variant_ids):
+    invalidate_groups(*variant_family_groups(variant_ids))
+
+
+def invalidate_variant_responses(variant_ids):
+    """
+    Сбрасывает закэшированные листинги и карточки вариантов (и их соседей по товару).
+    Изменения в одной транзакции (инлайны админки) дают один сброс после коммита.
+    """
+    from .utils import on_commit_batched
+
+    on_commit_batched("variant_responses", variant_ids, _invalidate_variant_families)
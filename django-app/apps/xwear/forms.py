@@ -1,4 +1,5 @@
 from django import forms
+from django.contrib.admin.helpers import ActionForm
 from django.core.exceptions import ValidationError
 from adminsortable2.admin import CustomInlineFormSet
 from .models import Product, ProductVariant, Color
@@ -36,6 +37,17 @@ class ProductAdminForm(forms.ModelForm):
         fields = "__all__"
 
 
+class RepriceActionForm(ActionForm):
+    """Параметры действий переоценки в списке вариантов"""
+
+    discount_percent = forms.IntegerField(
+        label="Скидка %", required=False, min_value=0, max_value=100
+    )
+    price_change = forms.IntegerField(
+        label="Цена ±%", required=False, min_value=-99, max_value=100
+    )
+
+
 class ProductVariantAdminForm(forms.ModelForm):
     set_discount_all_sizes = forms.IntegerField(
         label="Установить скидку (%) на все размеры",
@@ -86,6 +98,13 @@ class ProductSizeForm(forms.ModelForm):
             # Если это новая строка, поле будет доступно для выбора
             self.fields["size"].disabled = False
 
+        # Идёт ценовая кампания: в поле — собственная скидка размера
+        # (вернётся после кампании), скидка кампании здесь не меняется
+        self.campaign_discount = None
+        if self.instance.campaign_id:
+            self.campaign_discount = self.instance.discount_percent
+            self.initial["discount_percent"] = self.instance.regular_discount_percent or 0
+
     def clean(self):
         cleaned_data = super().clean()
         is_active = cleaned_data.get("is_active")
@@ -111,6 +130,12 @@ class ProductSizeForm(forms.ModelForm):
 
         return cleaned_data
 
+    def save(self, commit=True):
+        if self.campaign_discount is not None:
+            self.instance.regular_discount_percent = self.instance.discount_percent
+            self.instance.discount_percent = self.campaign_discount
+        return super().save(commit)
+
 
 class ProductSizeFormSet(forms.BaseInlineFormSet):
     def clean(self):
@@ -0,0 +1,77 @@
+import multiprocessing
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+from django.core.management.base import BaseCommand, CommandError
+from django.apps import apps
+from xwear.utils import convert_to_webp, get_webp_options
+
+
+def _current_rss_kb():
+    # Текущий RSS процесса (Linux), КБ
+    with open("/proc/self/statm") as statm:
+        pages = int(statm.read().split()[1])
+    return pages * resource.getpagesize() // 1024
+
+
+def _measure(path, quality, options):
+    # Выполняется в отдельном процессе: пик RSS относится только к этой конвертации
+    rss_before = _current_rss_kb()
+    started = time.perf_counter()
+    with convert_to_webp(path, quality=quality, **options) as webp_content:
+        elapsed = time.perf_counter() - started
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return elapsed, max(peak_kb - rss_before, 0), webp_content.size
+
+
+class Command(BaseCommand):
+    help = "Замер конвертации в WebP: время на мегапиксель и пик памяти (RSS)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("files", nargs="+", help="Файлы изображений")
+        parser.add_argument(
+            "--field",
+            default="xwear.ProductImage.image",
+            help="Поле, чьи IMAGE_WEBP_OPTIONS проверяются (по умолчанию xwear.ProductImage.image)",
+        )
+        parser.add_argument("--quality", type=int, default=85, help="Качество WebP")
+
+    def handle(self, *args, **options):
+        try:
+            app_label, model_name, field_name = options["field"].split(".")
+            model = apps.get_model(app_label, model_name)
+        except (ValueError, LookupError):
+            raise CommandError(f"Неизвестное поле: {options['field']}")
+
+        modes = {
+            # Прежнее поведение: полный растр и максимальное усилие кодировщика
+            "method=6, без уменьшения": {"method": 6},
+            "IMAGE_WEBP_OPTIONS": get_webp_options(model, field_name),
+        }
+
+        for path in options["files"]:
+            with Image.open(path) as img:
+                width, height = img.size
+            megapixels = width * height / 1_000_000
+            self.stdout.write(f"{path}: {width}x{height} ({megapixels:.1f} Мп)")
+
+            for label, mode_options in modes.items():
+                # Каждый замер — в свежем процессе, иначе пик RSS не сбрасывается
+                with ProcessPoolExecutor(
+                    max_workers=1, mp_context=multiprocessing.get_context("fork")
+                ) as executor:
+                    elapsed, peak_kb, size = executor.submit(
+                        _measure, path, options["quality"], mode_options
+                    ).result()
+                self.stdout.write(
+                    f"  {label}: {elapsed:.2f} сек. ({elapsed / megapixels:.3f} сек./Мп), "
+                    f"пик RSS +{peak_kb / 1024:.1f} Мб, WebP {size / 1024:.0f} Кб"
+                )
+
+
+# Как использовать
+# --------------------------
+# Сравнить прежнюю конвертацию с настройками IMAGE_WEBP_OPTIONS (только Linux):
+# python manage.py benchmark_webp /data/banner-6000px.jpg --field xwear.SliderBanner.image --quality 100
+# python manage.py benchmark_webp /data/photos/*.jpg
@@ -0,0 +1,51 @@
+import logging
+import time
+from django.core.management.base import BaseCommand
+from xwear.models import ProductImage, SliderBanner
+from xwear.utils import generate_thumbnail_manifest, get_thumbnail_manifest
+
+logger = logging.getLogger("apps")
+
+
+class Command(BaseCommand):
+    help = "Генерирует миниатюры и заполняет манифесты (ProductImage, SliderBanner)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Перестроить все манифесты (после изменения THUMBNAIL_ALIASES/DENSITIES/AVIF)",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        built = 0
+        failed = 0
+
+        for model in (ProductImage, SliderBanner):
+            queryset = model.objects.exclude(image="").only("id", "image", "thumbnails")
+            for obj in queryset.iterator(chunk_size=500):
+                # Манифест актуален, если построен для текущего файла
+                if not options["force"] and get_thumbnail_manifest(obj.image):
+                    continue
+                try:
+                    generate_thumbnail_manifest(obj, "image")
+                    built += 1
+                except Exception as e:
+                    failed += 1
+                    logger.error("Манифест %s #%s: %s", model.__name__, obj.pk, e)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Манифестов построено: {built}, ошибок: {failed} ({elapsed:.2f} сек.)"
+            )
+        )
+
+
+# Как использовать
+# --------------------------
+# Новые фото получают манифест автоматически. Заполнить старые:
+# python manage.py build_thumbnail_manifests
+# Перестроить все после изменения THUMBNAIL_ALIASES, THUMBNAIL_DENSITIES или THUMBNAIL_AVIF:
+# python manage.py build_thumbnail_manifests --force
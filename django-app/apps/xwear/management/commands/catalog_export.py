@@ -0,0 +1,48 @@
+import sys
+import time
+from django.core.management.base import BaseCommand
+from xwear.utils import (
+    CATALOG_FORMATS,
+    detect_catalog_format,
+    export_catalog_rows,
+    write_catalog_rows,
+)
+
+
+class Command(BaseCommand):
+    help = "Выгрузка всех размеров каталога в CSV/JSONL (формат catalog_import)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Файл для записи ('-' — stdout)")
+        parser.add_argument(
+            "--format",
+            choices=CATALOG_FORMATS,
+            help="Формат файла (по умолчанию — по расширению)",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or detect_catalog_format(path)
+
+        started = time.monotonic()
+        if path == "-":
+            # В stdout — только данные, без итоговой строки
+            write_catalog_rows(export_catalog_rows(), sys.stdout, fmt)
+            return
+        with open(path, "w", newline="", encoding="utf-8") as stream:
+            count = write_catalog_rows(export_catalog_rows(), stream, fmt)
+        elapsed = time.monotonic() - started
+
+        rate = count / elapsed if elapsed else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Выгружено строк: {count} за {elapsed:.2f} сек. ({rate:.0f} строк/сек.)"
+            )
+        )
+
+
+# Как использовать
+# --------------------------
+# python manage.py catalog_export /data/export/catalog.csv
+# python manage.py catalog_export /data/export/catalog.jsonl
+# python manage.py catalog_export - --format jsonl | gzip > catalog.jsonl.gz
@@ -0,0 +1,83 @@
+import logging
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from xwear.utils import (
+    CATALOG_FORMATS,
+    CatalogImporter,
+    detect_catalog_format,
+    read_catalog_rows,
+)
+
+logger = logging.getLogger("apps")
+
+
+class Command(BaseCommand):
+    help = (
+        "Массовая загрузка товаров, вариантов и размеров из CSV/JSONL (потоково, пачками)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Файл CSV или JSONL (колонки — CATALOG_FIELDS)")
+        parser.add_argument(
+            "--format",
+            choices=CATALOG_FORMATS,
+            help="Формат файла (по умолчанию — по расширению)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Строк в одной транзакции (по умолчанию 1000)",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not os.path.isfile(path):
+            raise CommandError(f"Не найден файл: {path}")
+        fmt = options["format"] or detect_catalog_format(path)
+
+        started = time.monotonic()
+        importer = CatalogImporter()
+        with open(path, newline="", encoding="utf-8") as stream:
+            stats = importer.import_rows(
+                read_catalog_rows(stream, fmt), chunk_size=options["batch_size"]
+            )
+        elapsed = time.monotonic() - started
+
+        for line, error in importer.errors[:50]:
+            self.stdout.write(self.style.ERROR(f"Строка {line}: {error}"))
+        if len(importer.errors) > 50:
+            self.stdout.write(
+                self.style.ERROR(f"...и ещё ошибок: {len(importer.errors) - 50}")
+            )
+
+        rate = stats["rows"] / elapsed if elapsed else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Строк: {stats['rows']} за {elapsed:.2f} сек. ({rate:.0f} строк/сек.), "
+                f"ошибок: {len(importer.errors)}\n"
+                f"Товаров создано: {stats['products_created']}, "
+                f"вариантов: {stats['variants_created']}, "
+                f"размеров создано: {stats['sizes_created']}, "
+                f"обновлено: {stats['sizes_updated']}"
+            )
+        )
+        logger.info(
+            "Импорт каталога %s: %s строк (%.0f строк/сек.), %s ошибок",
+            path,
+            stats["rows"],
+            rate,
+            len(importer.errors),
+        )
+
+
+# Как использовать
+# --------------------------
+# Строка файла — один размер. Колонки (как в выгрузке catalog_export):
+# category,brand,name,model_name,gender,season,color,article,size,price,discount_percent,is_active
+# category — путь из слагов (obuv/krossovki), brand/color — слаги, size — название размера.
+# Новые товары и варианты создаются (варианты — неактивными, артикул генерируется,
+# если колонка пуста), у существующих размеров обновляются цена, скидка и наличие.
+# python manage.py catalog_import /data/feeds/supplier.csv
+# python manage.py catalog_import /data/feeds/supplier.jsonl --batch-size 2000
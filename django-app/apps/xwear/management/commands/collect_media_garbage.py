@@ -0,0 +1,37 @@
+import time
+from django.core.management.base import BaseCommand
+from xwear.models import OrphanedFile
+from xwear.utils import collect_media_garbage
+
+
+class Command(BaseCommand):
+    help = "Удаляет оригиналы и миниатюры удалённых/заменённых изображений (OrphanedFile)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать, сколько места освободится",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        queued = OrphanedFile.objects.count()
+        files, total_bytes = collect_media_garbage(dry_run=options["dry_run"])
+        elapsed = time.monotonic() - started
+
+        size = f"{total_bytes / (1024 * 1024):.2f} Мб"
+        if options["dry_run"]:
+            message = f"В очереди {queued}: можно удалить файлов {files} ({size})"
+        else:
+            message = f"Удалено файлов: {files} ({size}) за {elapsed:.2f} сек."
+        self.stdout.write(self.style.SUCCESS(message))
+
+
+# Как использовать
+# --------------------------
+# Удалённые и заменённые фото (ProductImage, SliderBanner) ставятся в очередь сигналами.
+# Отчёт без удаления:
+# python manage.py collect_media_garbage --dry-run
+# Удаление (cron, например раз в час):
+# python manage.py collect_media_garbage
@@ -0,0 +1,67 @@
+import logging
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from xwear.utils import collect_import_files, import_product_images
+
+logger = logging.getLogger("apps")
+
+
+class Command(BaseCommand):
+    help = "Массовый импорт фото вариантов товаров из папки или CSV-манифеста"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "source",
+            help="Папка (ARTICLE/*.jpg или ARTICLE_N.jpg) или CSV с колонками article,file",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Число процессов (по умолчанию — по числу ядер)",
+        )
+        parser.add_argument(
+            "--quality",
+            type=int,
+            default=85,
+            help="Качество WebP для оригиналов (по умолчанию 85, как в админке)",
+        )
+
+    def handle(self, *args, **options):
+        source = options["source"]
+        if not os.path.exists(source):
+            raise CommandError(f"Не найден источник: {source}")
+
+        started = time.monotonic()
+        files = collect_import_files(source)
+        total = sum(len(paths) for paths in files.values())
+        self.stdout.write(f"Найдено фото: {total}, артикулов: {len(files)}")
+
+        imported, errors, unknown = import_product_images(
+            files, workers=options["workers"], quality=options["quality"]
+        )
+
+        for article in unknown:
+            self.stdout.write(self.style.WARNING(f"Нет варианта с артикулом {article}"))
+        for path, error in errors:
+            self.stdout.write(self.style.ERROR(f"{path}: {error}"))
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Импортировано фото: {imported}, ошибок: {len(errors)}, "
+                f"неизвестных артикулов: {len(unknown)} ({elapsed:.2f} сек.)"
+            )
+        )
+        logger.info(
+            "Импорт фото из %s: %s загружено, %s ошибок", source, imported, len(errors)
+        )
+
+
+# Как использовать
+# --------------------------
+# Папка с подпапками по артикулам (порядок фото — по имени файла, первое — главное):
+# python manage.py import_product_images /data/season/ --workers 8
+# CSV-манифест (article,file; пути относительно файла манифеста):
+# python manage.py import_product_images /data/season/photos.csv
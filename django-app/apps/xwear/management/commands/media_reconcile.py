@@ -0,0 +1,94 @@
+import logging
+import time
+from collections import defaultdict
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from xwear.utils import delete_orphaned_media, find_orphaned_media, get_media_roots
+
+logger = logging.getLogger("apps")
+
+
+def _format_size(size):
+    return f"{size / (1024 * 1024):.2f} Мб"
+
+
+class Command(BaseCommand):
+    help = "Ищет в MEDIA_ROOT файлы и миниатюры, на которые не ссылается БД"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--delete",
+            action="store_true",
+            help="Удалить найденные файлы (без флага — только отчёт)",
+        )
+        parser.add_argument(
+            "--min-age",
+            type=float,
+            default=24,
+            help="Не трогать файлы моложе N часов (по умолчанию 24)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Потоков обхода хранилища (по умолчанию 8)",
+        )
+        parser.add_argument(
+            "--root",
+            action="append",
+            dest="roots",
+            help="Папка внутри MEDIA_ROOT (можно несколько; по умолчанию — все папки моделей)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            default_storage.path("")
+        except NotImplementedError:
+            raise CommandError("Сверка работает только с файловым хранилищем")
+
+        started = time.monotonic()
+        roots = options["roots"] or sorted(get_media_roots())
+        self.stdout.write(f"Папки: {', '.join(roots)}")
+
+        orphans = find_orphaned_media(
+            min_age=options["min_age"] * 3600, workers=options["workers"], roots=roots
+        )
+
+        by_root = defaultdict(lambda: [0, 0])
+        for name, size in orphans:
+            stats = by_root[name.split("/")[0]]
+            stats[0] += 1
+            stats[1] += size
+            if options["verbosity"] > 1:
+                self.stdout.write(f"  {name} ({size} байт)")
+
+        for root, (count, size) in sorted(by_root.items()):
+            self.stdout.write(f"{root}: {count} файлов, {_format_size(size)}")
+
+        total = sum(size for _, size in orphans)
+        if options["delete"] and orphans:
+            delete_orphaned_media(name for name, _ in orphans)
+            logger.info(
+                "media_reconcile: удалено %s файлов (%s байт)", len(orphans), total
+            )
+            action = "Удалено"
+        else:
+            action = "Найдено"
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{action} лишних файлов: {len(orphans)} ({_format_size(total)}) "
+                f"за {elapsed:.2f} сек."
+            )
+        )
+
+
+# Как использовать
+# --------------------------
+# Отчёт (список файлов: -v 2):
+# python manage.py media_reconcile
+# Удалить всё, что старше суток и не упомянуто в БД:
+# python manage.py media_reconcile --delete
+# Только миниатюры, включая свежие:
+# python manage.py media_reconcile --root thumbnails --min-age 0 --delete
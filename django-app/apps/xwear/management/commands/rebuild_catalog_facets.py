@@ -0,0 +1,29 @@
+import logging
+import time
+from django.core.management.base import BaseCommand
+from xwear.utils import rebuild_catalog_facets
+
+logger = logging.getLogger("apps")
+
+
+class Command(BaseCommand):
+    help = "Полностью пересобирает индекс фильтров каталога (CatalogFacet)"
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = rebuild_catalog_facets()
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Индекс фильтров пересобран: {total} строк за {elapsed:.2f} сек."
+            )
+        )
+        logger.info("Индекс фильтров каталога пересобран: %s строк", total)
+
+
+# Как использовать
+# --------------------------
+# Индекс поддерживается сигналами автоматически. Полная пересборка нужна после
+# массовых правок в обход ORM (SQL-скрипты, восстановление из бэкапа):
+# python manage.py rebuild_catalog_facets
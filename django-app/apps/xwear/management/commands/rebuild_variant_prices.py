@@ -0,0 +1,29 @@
+import logging
+import time
+from django.core.management.base import BaseCommand
+from xwear.utils import rebuild_variant_prices
+
+logger = logging.getLogger("apps")
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает денормализованные цены вариантов (min_final_price и др.)"
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = rebuild_variant_prices()
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Цены пересчитаны: {total} вариантов за {elapsed:.2f} сек."
+            )
+        )
+        logger.info("Денормализованные цены вариантов пересчитаны: %s", total)
+
+
+# Как использовать
+# --------------------------
+# Колонки поддерживаются сигналами ProductSize автоматически. Полный пересчёт нужен
+# после правок цен в обход ORM (SQL-скрипты, восстановление из бэкапа):
+# python manage.py rebuild_variant_prices
@@ -0,0 +1,130 @@
+import logging
+import time
+from django.core.management.base import BaseCommand, CommandError
+from xwear.models import Brand
+from xwear.utils import (
+    PriceOverflow,
+    get_category_index,
+    get_sizes_for_repricing,
+    preview_repricing,
+    reprice_sizes,
+)
+
+logger = logging.getLogger("apps")
+
+
+class Command(BaseCommand):
+    help = "Массовая переоценка размеров (скидка и/или изменение цены) одним UPDATE"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--discount", type=int, help="Новая скидка %% (0 — снять скидку)"
+        )
+        parser.add_argument(
+            "--price-change",
+            type=int,
+            default=0,
+            help="Изменение цены в %% (+10 — наценка, -5 — снижение)",
+        )
+        parser.add_argument(
+            "--category", help="Путь категории (obuv/krossovki) с подкатегориями"
+        )
+        parser.add_argument("--brand", help="Слаг бренда")
+        parser.add_argument(
+            "--articles",
+            help="Артикулы вариантов через запятую или @файл (по одному в строке)",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Весь каталог (если не задан ни один фильтр)",
+        )
+        parser.add_argument(
+            "--only-active", action="store_true", help="Только размеры в наличии"
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Показать изменения, ничего не записывая",
+        )
+
+    def _get_category(self, path):
+        from xwear.models import Category
+
+        for pk, data in get_category_index().items():
+            if "/".join(crumb["slug"] for crumb in data["breadcrumbs"]) == path.strip(
+                "/"
+            ):
+                return Category.objects.get(pk=pk)
+        raise CommandError(f"Категория не найдена: {path}")
+
+    def _get_articles(self, value):
+        if value.startswith("@"):
+            with open(value[1:], encoding="utf-8") as f:
+                return [line.strip() for line in f if line.strip()]
+        return [article.strip() for article in value.split(",") if article.strip()]
+
+    def handle(self, *args, **options):
+        discount = options["discount"]
+        price_change = options["price_change"]
+        if discount is None and not price_change:
+            raise CommandError("Укажите --discount и/или --price-change")
+        if discount is not None and not 0 <= discount <= 100:
+            raise CommandError("--discount должен быть от 0 до 100")
+        if price_change <= -100:
+            raise CommandError("--price-change должен быть больше -100")
+
+        filters = {
+            "category": options["category"] and self._get_category(options["category"]),
+            "brand": None,
+            "articles": options["articles"] and self._get_articles(options["articles"]),
+        }
+        if options["brand"]:
+            try:
+                filters["brand"] = Brand.objects.get(slug=options["brand"])
+            except Brand.DoesNotExist:
+                raise CommandError(f"Бренд не найден: {options['brand']}")
+        if not any(filters.values()) and not options["all"]:
+            raise CommandError("Задайте --category, --brand, --articles или --all")
+
+        sizes = get_sizes_for_repricing(only_active=options["only_active"], **filters)
+
+        if options["dry_run"]:
+            try:
+                changed, sample = preview_repricing(sizes, discount, price_change)
+            except PriceOverflow as e:
+                raise CommandError(str(e))
+            for article, size, price, new_price, final, new_final in sample:
+                self.stdout.write(
+                    f"{article} / {size}: цена {price} → {new_price}, "
+                    f"итоговая {final} → {new_final}"
+                )
+            self.stdout.write(self.style.SUCCESS(f"Будет изменено размеров: {changed}"))
+            return
+
+        started = time.monotonic()
+        try:
+            updated = reprice_sizes(sizes, discount, price_change)
+        except PriceOverflow as e:
+            raise CommandError(str(e))
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Переоценено размеров: {updated} за {elapsed:.2f} сек.")
+        )
+        logger.info(
+            "Переоценка: скидка %s, цена %+d%%, размеров %s",
+            discount,
+            price_change,
+            updated,
+        )
+
+
+# Как использовать
+# --------------------------
+# Сначала посмотреть изменения (первые 20 строк и общее число):
+# python manage.py reprice_sizes --category obuv/krossovki --discount 20 --dry-run
+# Применить (одним UPDATE, final_price округляется как в ProductSize.save — ROUND_HALF_UP):
+# python manage.py reprice_sizes --category obuv/krossovki --discount 20
+# python manage.py reprice_sizes --brand nike --price-change 7 --only-active
+# python manage.py reprice_sizes --articles @sale.txt --discount 0
@@ -0,0 +1,73 @@
+import logging
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from xwear.utils import claim_image_job, process_image_job, retry_failed_image_jobs
+
+logger = logging.getLogger("apps")
+
+
+class Command(BaseCommand):
+    help = "Воркер фоновой обработки изображений: миниатюры и манифесты (ImageJob)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Обработать текущую очередь и завершиться",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=2.0,
+            help="Пауза при пустой очереди, сек. (по умолчанию 2)",
+        )
+        parser.add_argument(
+            "--retry-failed",
+            action="store_true",
+            help="Вернуть в очередь задачи со статусом 'Ошибка' перед запуском",
+        )
+
+    def handle(self, *args, **options):
+        if options["retry_failed"]:
+            count = retry_failed_image_jobs()
+            self.stdout.write(f"Возвращено в очередь: {count}")
+
+        done = 0
+        failed = 0
+        logger.info("Воркер изображений запущен")
+
+        try:
+            while True:
+                # Долгоживущий процесс: не держим оборванные соединения
+                close_old_connections()
+                job = claim_image_job()
+
+                if job is None:
+                    if options["once"]:
+                        break
+                    time.sleep(options["sleep"])
+                    continue
+
+                if process_image_job(job):
+                    done += 1
+                else:
+                    failed += 1
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Обработано изображений: {done}, ошибок: {failed}")
+        )
+        logger.info("Воркер изображений остановлен: %s готово, %s ошибок", done, failed)
+
+
+# Как использовать
+# --------------------------
+# Постоянный воркер (systemd/supervisor, рядом с gunicorn); несколько экземпляров
+# не мешают друг другу:
+# python manage.py run_image_worker
+# Разово разобрать очередь (cron, деплой):
+# python manage.py run_image_worker --once
+# Повторить задачи, исчерпавшие попытки:
+# python manage.py run_image_worker --once --retry-failed
@@ -0,0 +1,57 @@
+import logging
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from xwear.utils import run_price_campaigns
+
+logger = logging.getLogger("apps")
+
+
+class Command(BaseCommand):
+    help = "Планировщик ценовых кампаний: запуск и завершение по расписанию"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Одна проверка расписания и выход (для cron)",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=5.0,
+            help="Интервал проверки расписания, сек. (по умолчанию 5)",
+        )
+
+    def handle(self, *args, **options):
+        logger.info("Планировщик ценовых кампаний запущен")
+
+        try:
+            while True:
+                # Долгоживущий процесс: не держим оборванные соединения
+                close_old_connections()
+                started, finished = run_price_campaigns()
+
+                for campaign in finished:
+                    self.stdout.write(f"Завершена: {campaign}")
+                for campaign in started:
+                    self.stdout.write(
+                        f"Запущена: {campaign}, размеров: {campaign.sizes_count}"
+                    )
+
+                if options["once"]:
+                    break
+                time.sleep(options["sleep"])
+        except KeyboardInterrupt:
+            pass
+
+        logger.info("Планировщик ценовых кампаний остановлен")
+
+
+# Как использовать
+# --------------------------
+# Кампании создаются в админке (Ценовые кампании): скидка, начало/окончание, условия.
+# Постоянный процесс (systemd/supervisor) — переключение в пределах --sleep секунд:
+# python manage.py run_price_campaigns
+# Либо cron раз в минуту:
+# python manage.py run_price_campaigns --once
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_catalog_facets(apps, schema_editor):
+    # Первичное заполнение индекса фильтров из текущего каталога
+    ProductSize = apps.get_model('xwear', 'ProductSize')
+    CatalogFacet = apps.get_model('xwear', 'CatalogFacet')
+
+    rows = ProductSize.objects.filter(
+        is_active=True, variant__is_active=True, variant__product__is_active=True
+    ).values_list(
+        'id', 'variant_id', 'variant__product__category_id', 'variant__product__brand_id',
+        'variant__color_id', 'size_id', 'final_price',
+    )
+    CatalogFacet.objects.bulk_create(
+        [
+            CatalogFacet(
+                product_size_id=row[0], variant_id=row[1], category_id=row[2],
+                brand_id=row[3], color_id=row[4], size_id=row[5], final_price=row[6],
+            )
+            for row in rows.iterator()
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('xwear', '0016_alter_sliderbanner_font_size_link_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogFacet',
+            fields=[
+                ('product_size', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='facet', serialize=False, to='xwear.productsize', verbose_name='Размер варианта')),
+                ('final_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Итоговая цена')),
+                ('brand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facets', to='xwear.brand', verbose_name='Бренд')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facets', to='xwear.category', verbose_name='Категория')),
+                ('color', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facets', to='xwear.color', verbose_name='Цвет')),
+                ('size', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facets', to='xwear.size', verbose_name='Размер')),
+                ('variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facets', to='xwear.productvariant', verbose_name='Вариант товара')),
+            ],
+            options={
+                'verbose_name': 'Индекс фильтров',
+                'verbose_name_plural': 'Индекс фильтров',
+                'indexes': [models.Index(fields=['category', 'brand', 'color', 'size'], name='xwear_facet_category_idx')],
+            },
+        ),
+        migrations.RunPython(fill_catalog_facets, migrations.RunPython.noop),
+    ]
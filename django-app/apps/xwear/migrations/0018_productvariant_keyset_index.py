@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('xwear', '0017_catalogfacet'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=models.Index(fields=['-created_at', '-id'], name='xwear_variant_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:47
+
+from django.db import migrations, models
+
+
+def fill_variant_prices(apps, schema_editor):
+    # Первичное заполнение колонок цен по активным размерам
+    ProductSize = apps.get_model('xwear', 'ProductSize')
+    ProductVariant = apps.get_model('xwear', 'ProductVariant')
+
+    prices = {}
+    rows = ProductSize.objects.filter(is_active=True).values_list(
+        'variant_id', 'price', 'discount_percent', 'final_price'
+    )
+    for variant_id, price, discount, final_price in rows.iterator():
+        data = prices.setdefault(variant_id, {
+            'min_final_price': None, 'min_old_price': None, 'min_discount_percent': 0,
+            'max_discount_percent': 0, 'active_sizes_count': 0,
+        })
+        data['active_sizes_count'] += 1
+        data['max_discount_percent'] = max(data['max_discount_percent'], discount)
+        if final_price is not None and (
+            data['min_final_price'] is None or final_price < data['min_final_price']
+        ):
+            data['min_final_price'] = final_price
+            data['min_old_price'] = price if discount > 0 else None
+            data['min_discount_percent'] = discount
+
+    if prices:
+        ProductVariant.objects.bulk_update(
+            [ProductVariant(pk=pk, **data) for pk, data in prices.items()],
+            ['min_final_price', 'min_old_price', 'min_discount_percent',
+             'max_discount_percent', 'active_sizes_count'],
+            batch_size=2000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('xwear', '0018_productvariant_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productvariant',
+            name='active_sizes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Активных размеров'),
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='max_discount_percent',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Макс. скидка %'),
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='min_discount_percent',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Скидка мин. цены %'),
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='min_final_price',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=2, editable=False, max_digits=10, null=True, verbose_name='Мин. цена'),
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='min_old_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=6, null=True, verbose_name='Старая цена (мин.)'),
+        ),
+        migrations.RunPython(fill_variant_prices, migrations.RunPython.noop),
+    ]
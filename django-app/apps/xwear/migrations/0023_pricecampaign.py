@@ -0,0 +1,55 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:15
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('xwear', '0022_orphanedfile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productsize',
+            name='regular_discount_percent',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Скидка вне кампании %'),
+        ),
+        migrations.CreateModel(
+            name='PriceCampaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Создан')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлен')),
+                ('name', models.CharField(max_length=100, verbose_name='Название')),
+                ('discount_percent', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(100)], verbose_name='Скидка %')),
+                ('starts_at', models.DateTimeField(verbose_name='Начало')),
+                ('ends_at', models.DateTimeField(verbose_name='Окончание')),
+                ('status', models.CharField(choices=[('scheduled', 'Запланирована'), ('active', 'Идёт'), ('finished', 'Завершена')], default='scheduled', editable=False, max_length=20, verbose_name='Статус')),
+                ('sizes_count', models.PositiveIntegerField(default=0, editable=False, verbose_name='Размеров в кампании')),
+                ('brand', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='price_campaigns', to='xwear.brand', verbose_name='Бренд')),
+                ('category', models.ForeignKey(blank=True, help_text='Вместе с подкатегориями', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='price_campaigns', to='xwear.category', verbose_name='Категория')),
+                ('variants', models.ManyToManyField(blank=True, help_text='Условия складываются; без условий кампания действует на весь каталог', related_name='price_campaigns', to='xwear.productvariant', verbose_name='Варианты')),
+            ],
+            options={
+                'verbose_name': 'Ценовая кампания',
+                'verbose_name_plural': 'Ценовые кампании',
+                'ordering': ['-starts_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='productsize',
+            name='campaign',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sizes', to='xwear.pricecampaign', verbose_name='Ценовая кампания'),
+        ),
+        migrations.AddIndex(
+            model_name='pricecampaign',
+            index=models.Index(fields=['status', 'starts_at'], name='xwear_campaign_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pricecampaign',
+            index=models.Index(fields=['status', 'ends_at'], name='xwear_campaign_end_idx'),
+        ),
+    ]
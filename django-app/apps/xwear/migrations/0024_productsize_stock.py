@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('xwear', '0023_pricecampaign'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productsize',
+            name='stock',
+            field=models.PositiveIntegerField(blank=True, help_text='Пусто — без учёта остатков', null=True, verbose_name='Остаток'),
+        ),
+    ]
@@ -2,17 +2,20 @@ from decimal import Decimal, ROUND_HALF_UP
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
 from django.conf import settings
-from django.db import models, transaction
+from django.db import models
 from mptt.models import MPTTModel, TreeForeignKey
+from django_cleanup import cleanup
 
 # from easy_thumbnails.fields import ThumbnailerImageField
-from easy_thumbnails.files import generate_all_aliases
 from django_quill.fields import QuillField
 from core.models import TimeStampedModel
 from .utils import (
     UploadToPath,
     generate_unique_slug,
     prepare_image_for_save,
+    release_prepared_image,
+    save_with_unique_retry,
+    schedule_thumbnails,
 )
 from .validators import ImageValidator
 
@@ -43,14 +46,33 @@ class Category(MPTTModel):
         if self.is_root_node():
             return ""
 
-        # Только для вложенных категорий лезем в дерево за предками
+        # Путь из общего кэша дерева (utils/categories.py) без запроса к БД
+        from .utils import get_category_path
+
+        path = get_category_path(self.pk)
+        if path is not None:
+            return path
+
+        # Категория ещё не попала в кэш (например, создана в текущей транзакции)
         ancestors = self.get_ancestors(include_self=True)
         return "/".join([ancestor.slug for ancestor in ancestors])
 
     def save(self, *args, **kwargs):
+        regenerate = None
         if not self.slug:
-            self.slug = generate_unique_slug(self, scope_field="parent")
-        super().save(*args, **kwargs)
+
+            def regenerate():
+                self.slug = generate_unique_slug(self, scope_field="parent")
+
+            regenerate()
+
+        def is_taken():
+            siblings = Category.objects.filter(parent_id=self.parent_id, slug=self.slug)
+            return siblings.exclude(pk=self.pk).exists()
+
+        # Сдвиг дерева MPTT и вставка откатываются вместе при конфликте слага
+        save = super().save
+        save_with_unique_retry(lambda: save(*args, **kwargs), regenerate, is_taken)
 
     def __str__(self):
         # корневая категория
@@ -120,7 +142,14 @@ class ProductSize(models.Model):
         verbose_name="Вариант товара",
     )
     size = models.ForeignKey(Size, on_delete=models.CASCADE, verbose_name="Размер")
-    # stock = models.PositiveIntegerField(default=0, verbose_name="Остаток")
+    # Пусто — остаток не учитывается (размер продаётся без ограничений).
+    # Списывается условным UPDATE при оформлении заказа (orders/utils/stock.py)
+    stock = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Остаток",
+        help_text="Пусто — без учёта остатков",
+    )
     price = models.DecimalField(
         max_digits=6,
         decimal_places=2,
@@ -145,17 +174,34 @@ class ProductSize(models.Model):
 
     is_active = models.BooleanField(default=True, verbose_name="В наличии")
 
-    def save(self, *args, **kwargs):
-        # 1. Рассчитываем итоговую цену перед сохранением
+    # Идущая ценовая кампания (utils/campaigns.py): на её время discount_percent
+    # заменён скидкой кампании, собственная скидка размера хранится отдельно
+    campaign = models.ForeignKey(
+        "PriceCampaign",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="sizes",
+        verbose_name="Ценовая кампания",
+    )
+    regular_discount_percent = models.PositiveIntegerField(
+        null=True, blank=True, editable=False, verbose_name="Скидка вне кампании %"
+    )
+
+    def calculate_final_price(self):
         if self.discount_percent > 0:
             # Формула: Цена * (1 - Скидка / 100)
             discount_multiplier = Decimal("1") - (
                 Decimal(self.discount_percent) / Decimal("100")
             )
             new_price = self.price * discount_multiplier
-            self.final_price = new_price.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-        else:
-            self.final_price = self.price
+            return new_price.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        return self.price
+
+    def save(self, *args, **kwargs):
+        # 1. Рассчитываем итоговую цену перед сохранением
+        self.final_price = self.calculate_final_price()
 
         # 2. Вызываем оригинальный метод save() для записи в БД
         super().save(*args, **kwargs)
@@ -175,6 +221,8 @@ class ProductSize(models.Model):
         indexes = [models.Index(fields=["variant", "is_active"])]
 
 
+# Оригинал и миниатюры удаляет сборщик мусора (OrphanedFile), а не django_cleanup
+@cleanup.ignore
 class ProductImage(models.Model):
     variant = models.ForeignKey(
         "ProductVariant",
@@ -197,6 +245,10 @@ class ProductImage(models.Model):
     position = models.PositiveIntegerField(
         default=0, db_index=True, verbose_name="Порядок"
     )
+    # Манифест миниатюр {алиас: [url, ширина, высота]} (utils/images.py)
+    thumbnails = models.JSONField(
+        default=dict, blank=True, editable=False, verbose_name="Миниатюры"
+    )
 
     def save(self, *args, **kwargs):
         # Базовая сортировка
@@ -224,13 +276,15 @@ class ProductImage(models.Model):
             self, "image", folder="products/", use_category_subdir=True
         )
 
-        super().save(*args, **kwargs)
+        try:
+            super().save(*args, **kwargs)
+        finally:
+            if is_new:
+                release_prepared_image(self, "image")
 
-        # 3. Генерируем миниатюры ТОЛЬКО после успешного коммита в базу
+        # 3. Миниатюры и манифест — фоновой задачей (или после успешного коммита в базу)
         if is_new:
-            transaction.on_commit(
-                lambda: generate_all_aliases(self.image, include_global=True)
-            )
+            schedule_thumbnails(self, "image")
 
     def __str__(self):
         if self.is_main:
@@ -338,13 +392,34 @@ class Product(TimeStampedModel):
     def full_name(self):
         return f"{self.type_name} {self.brand.name} {self.model_name}".strip()
 
+    @property
+    def get_main_image_obj(self):
+        # Фото хранятся у вариантов: главное фото или первое по порядку (заказы, письма)
+        return (
+            ProductImage.objects.filter(variant__product=self)
+            .order_by("-is_main", "variant_id", "position")
+            .first()
+        )
+
     def save(self, *args, **kwargs):
         # 1. Генерация слага, если он пуст
+        regenerate = None
         if not self.slug:
-            self.slug = generate_unique_slug(
-                self, base_field="full_name", scope_field="category"
-            )
-        super().save(*args, **kwargs)
+
+            def regenerate():
+                self.slug = generate_unique_slug(
+                    self, base_field="full_name", scope_field="category"
+                )
+
+            regenerate()
+
+        def is_taken():
+            same_slug = Product.objects.filter(category_id=self.category_id, slug=self.slug)
+            return same_slug.exclude(pk=self.pk).exists()
+
+        # Параллельное создание с тем же слагом — повтор со следующим номером
+        save = super().save
+        save_with_unique_retry(lambda: save(*args, **kwargs), regenerate, is_taken)
 
         # 2. Проверяем статус: если товар деактивирован
         if not self.is_active:
@@ -391,6 +466,36 @@ class ProductVariant(TimeStampedModel):
         help_text="Генерируется автоматически на основе вида, бренда, модели и цвета",
     )
     is_active = models.BooleanField(default=False, verbose_name="Активен")
+
+    # Денормализованные цены по активным размерам (utils/pricing.py).
+    # Поддерживаются сигналами ProductSize, вручную не редактируются
+    min_final_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name="Мин. цена",
+    )
+    min_old_price = models.DecimalField(
+        max_digits=6,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Старая цена (мин.)",
+    )
+    min_discount_percent = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Скидка мин. цены %"
+    )
+    max_discount_percent = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Макс. скидка %"
+    )
+    active_sizes_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Активных размеров"
+    )
+
     # through='ProductSize' говорит Django использовать существующую модель
     actual_sizes = models.ManyToManyField(
         "Size", through="ProductSize", related_name="variants", verbose_name="Размеры"
@@ -451,20 +556,26 @@ class ProductVariant(TimeStampedModel):
         # Проверяем, создается ли объект впервые
         is_new = self.pk is None
 
-        # 2. ОСНОВНОЕ СОХРАНЕНИЕ
-        # Здесь Django создаст запись (если новый) или обновит (если существующий)
-        # После этого шага у нас 100% есть self.pk (даже у новых товаров)
-        super().save(*args, **kwargs)
-
-        # 3. Генерация (если пуст)/обновление артикула
+        # 2. Генерация артикула (если пуст) до вставки — без отдельного UPDATE
+        regenerate = None
         if not self.article:
             from .utils import generate_unique_article
 
-            self.article = generate_unique_article(self)
-            # Используем update_fields, чтобы обновить только артикул.
-            # Используем .update() вместо super().save(update_fields=...)
-            # Это быстрее и НЕ вызывает повторные сигналы или методы save().
-            self.__class__.objects.filter(pk=self.pk).update(article=self.article)
+            def regenerate():
+                self.article = generate_unique_article(self)
+
+            regenerate()
+
+        # 3. ОСНОВНОЕ СОХРАНЕНИЕ
+        # Здесь Django создаст запись (если новый) или обновит (если существующий)
+        # При конфликте артикула с параллельной вставкой — повтор с новым артикулом
+        # (дубль цвета или слага в товаре пробрасывается без повторов)
+        def is_taken():
+            same_article = ProductVariant.objects.filter(article=self.article)
+            return same_article.exclude(pk=self.pk).exists()
+
+        save = super().save
+        save_with_unique_retry(lambda: save(*args, **kwargs), regenerate, is_taken)
 
         # 4. Автогенерация перечня размеров
         # Если это новый вариант и у родителя задана размерная сетка
@@ -481,7 +592,11 @@ class ProductVariant(TimeStampedModel):
         return self.full_name
 
     class Meta:
-        indexes = [models.Index(fields=["product", "is_active"])]
+        indexes = [
+            models.Index(fields=["product", "is_active"]),
+            # Порядок листинга каталога и ключ курсорной пагинации
+            models.Index(fields=["-created_at", "-id"], name="xwear_variant_keyset_idx"),
+        ]
         constraints = [
             # Теперь слаг варианта должен быть уникальным только для конкретного базового товара
             models.UniqueConstraint(
@@ -496,6 +611,64 @@ class ProductVariant(TimeStampedModel):
         verbose_name_plural = "Ассортимент"
 
 
+class CatalogFacet(models.Model):
+    """
+    Денормализованный индекс фильтров каталога (бренд/цвет/размер/цена).
+    Одна строка — один активный размер активного варианта активного товара.
+    Поддерживается инкрементально (см. utils/facets.py), вручную не редактируется.
+    """
+
+    product_size = models.OneToOneField(
+        ProductSize,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="facet",
+        verbose_name="Размер варианта",
+    )
+    variant = models.ForeignKey(
+        "ProductVariant",
+        on_delete=models.CASCADE,
+        related_name="facets",
+        verbose_name="Вариант товара",
+    )
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name="facets",
+        verbose_name="Категория",
+    )
+    brand = models.ForeignKey(
+        Brand, on_delete=models.CASCADE, related_name="facets", verbose_name="Бренд"
+    )
+    color = models.ForeignKey(
+        "Color", on_delete=models.CASCADE, related_name="facets", verbose_name="Цвет"
+    )
+    size = models.ForeignKey(
+        Size, on_delete=models.CASCADE, related_name="facets", verbose_name="Размер"
+    )
+    final_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name="Итоговая цена",
+    )
+
+    class Meta:
+        verbose_name = "Индекс фильтров"
+        verbose_name_plural = "Индекс фильтров"
+        # Сайдбар категории читается одним проходом по этому индексу
+        indexes = [
+            models.Index(
+                fields=["category", "brand", "color", "size"],
+                name="xwear_facet_category_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.variant_id} / {self.size_id}"
+
+
 class Material(models.Model):
     class MaterialType(models.TextChoices):
         OUTER = "OUTER", "Верх"
@@ -587,6 +760,7 @@ class Favorite(models.Model):
         return f"{self.user} -> {self.variant.full_name}"
 
 
+@cleanup.ignore
 class SliderBanner(models.Model):
     # Настройка сетки 3х3 для расположения контента
     GRID_LAYOUT_CHOICES = [
@@ -658,6 +832,10 @@ class SliderBanner(models.Model):
     )
     order = models.PositiveIntegerField(default=0, verbose_name="Порядок")
     is_active = models.BooleanField(default=False, verbose_name="Активен")
+    # Манифест миниатюр {алиас: [url, ширина, высота]} (utils/images.py)
+    thumbnails = models.JSONField(
+        default=dict, blank=True, editable=False, verbose_name="Миниатюры"
+    )
 
     # Описываем структуру JSON
     LINKS_SCHEMA = {
@@ -705,11 +883,15 @@ class SliderBanner(models.Model):
             self, "image", folder="banner", prefix="slide", quality=100
         )
 
-        super().save(*args, **kwargs)
+        try:
+            super().save(*args, **kwargs)
+        finally:
+            if is_new:
+                release_prepared_image(self, "image")
 
-        # 2. Генерируем миниатюры
+        # 2. Миниатюры и манифест — фоновой задачей (или после успешного коммита в базу)
         if is_new:
-            generate_all_aliases(self.image, include_global=True)
+            schedule_thumbnails(self, "image")
 
     def __str__(self):
         return self.title
@@ -718,3 +900,139 @@ class SliderBanner(models.Model):
         verbose_name = "Баннер"
         verbose_name_plural = "Баннеры"
         ordering = ["order", "-id"]
+
+
+class ImageJob(TimeStampedModel):
+    """
+    Очередь фоновой обработки изображений (миниатюры + манифест).
+    Одна строка на поле изображения объекта; обрабатывается командой run_image_worker
+    (см. utils/image_jobs.py). Успешные задачи удаляются, упавшие остаются для разбора.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "В очереди"
+        PROCESSING = "processing", "Обрабатывается"
+        FAILED = "failed", "Ошибка"
+
+    model_label = models.CharField(max_length=100, verbose_name="Модель")
+    object_id = models.PositiveBigIntegerField(verbose_name="ID объекта")
+    field_name = models.CharField(max_length=50, default="image", verbose_name="Поле")
+    # Имя файла на момент постановки: задача для старого файла не выполняется
+    source = models.CharField(max_length=255, verbose_name="Файл")
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name="Статус",
+    )
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Попыток")
+    run_after = models.DateTimeField(verbose_name="Не раньше")
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name="Взята в работу")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+
+    class Meta:
+        verbose_name = "Обработка изображения"
+        verbose_name_plural = "Обработка изображений"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["model_label", "object_id", "field_name"],
+                name="xwear_imagejob_target_uniq",
+            )
+        ]
+        # Воркер выбирает очередные задачи по статусу и времени запуска
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="xwear_imagejob_queue_idx")
+        ]
+
+    def __str__(self):
+        return f"{self.model_label} #{self.object_id} ({self.get_status_display()})"
+
+
+class OrphanedFile(models.Model):
+    """
+    Файл удалённого или заменённого изображения, ожидающий удаления вместе
+    с миниатюрами (см. utils/media.py, команда collect_media_garbage).
+    Записывается после коммита транзакции, удаляется пачками.
+    """
+
+    path = models.CharField(max_length=255, unique=True, verbose_name="Файл")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Добавлен")
+
+    class Meta:
+        verbose_name = "Файл к удалению"
+        verbose_name_plural = "Файлы к удалению"
+
+    def __str__(self):
+        return self.path
+
+
+class PriceCampaign(TimeStampedModel):
+    """
+    Скидка по расписанию: с starts_at до ends_at на размеры категории
+    (с подкатегориями), бренда и/или выбранных вариантов. Включается и выключается
+    командой run_price_campaigns одним UPDATE на кампанию (см. utils/campaigns.py).
+    """
+
+    class Status(models.TextChoices):
+        SCHEDULED = "scheduled", "Запланирована"
+        ACTIVE = "active", "Идёт"
+        FINISHED = "finished", "Завершена"
+
+    name = models.CharField(max_length=100, verbose_name="Название")
+    discount_percent = models.PositiveIntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(100)],
+        verbose_name="Скидка %",
+    )
+    starts_at = models.DateTimeField(verbose_name="Начало")
+    ends_at = models.DateTimeField(verbose_name="Окончание")
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="price_campaigns",
+        verbose_name="Категория",
+        help_text="Вместе с подкатегориями",
+    )
+    brand = models.ForeignKey(
+        Brand,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="price_campaigns",
+        verbose_name="Бренд",
+    )
+    variants = models.ManyToManyField(
+        ProductVariant,
+        blank=True,
+        related_name="price_campaigns",
+        verbose_name="Варианты",
+        help_text="Условия складываются; без условий кампания действует на весь каталог",
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.SCHEDULED,
+        editable=False,
+        verbose_name="Статус",
+    )
+    sizes_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Размеров в кампании"
+    )
+
+    def clean(self):
+        if self.starts_at and self.ends_at and self.ends_at <= self.starts_at:
+            raise ValidationError({"ends_at": "Окончание должно быть позже начала."})
+
+    class Meta:
+        verbose_name = "Ценовая кампания"
+        verbose_name_plural = "Ценовые кампании"
+        ordering = ["-starts_at"]
+        # Планировщик выбирает кампании по статусу и времени
+        indexes = [
+            models.Index(fields=["status", "starts_at"], name="xwear_campaign_start_idx"),
+            models.Index(fields=["status", "ends_at"], name="xwear_campaign_end_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} (-{self.discount_percent}%)"
@@ -0,0 +1,97 @@
+import base64
+import json
+from datetime import datetime
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная (keyset) пагинация по (created_at, id) для бесконечной прокрутки.
+    Вместо OFFSET следующая страница выбирается условием "строго после последней
+    показанной записи", поэтому 50-я страница стоит столько же, сколько первая.
+    Листает только вперёд, count передаётся снаружи (приблизительный, без COUNT(*)).
+    Порядок всегда по новизне: ?ordering=price и т.п. работают в режиме limit/offset.
+    """
+
+    cursor_query_param = "cursor"
+    limit_query_param = "limit"
+    mode_query_param = "pagination"
+    max_limit = 100
+    invalid_cursor_message = "Неверный курсор пагинации."
+
+    def __init__(self, count=None):
+        self.count = count
+        self.page = []
+        self.has_next = False
+
+    @classmethod
+    def is_requested(cls, request):
+        # Режим включается явно (?pagination=cursor) или наличием курсора в URL
+        return (
+            request.query_params.get(cls.mode_query_param) == "cursor"
+            or cls.cursor_query_param in request.query_params
+        )
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+        return max(1, min(limit, self.max_limit))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            created_at, pk = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            return datetime.fromisoformat(created_at), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj):
+        position = json.dumps([obj.created_at.isoformat(), obj.pk])
+        return base64.urlsafe_b64encode(position.encode()).decode()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        limit = self.get_limit(request)
+        position = self.decode_cursor(request)
+
+        queryset = queryset.order_by("-created_at", "-id")
+        if position:
+            created_at, pk = position
+            # created_at__lte даёт БД диапазон по индексу, OR уточняет порядок внутри
+            # одинаковых дат
+            queryset = queryset.filter(created_at__lte=created_at).filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+            )
+
+        # Берём на одну запись больше, чтобы узнать, есть ли следующая страница
+        results = list(queryset[: limit + 1])
+        self.has_next = len(results) > limit
+        self.page = results[:limit]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "count": self.count,
+                "next": self.get_next_link(),
+                "previous": None,  # только вперёд (бесконечная прокрутка)
+                "results": data,
+            }
+        )
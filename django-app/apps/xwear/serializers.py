@@ -12,7 +12,7 @@ from .models import (
     Favorite,
     SliderBanner,
 )
-from .utils import get_thumbnail_data
+from .utils import get_thumbnail_data, get_category_breadcrumbs
 
 # ==========================================
 # БАЗОВЫЕ СЕРИАЛИЗАТОРЫ
@@ -137,7 +137,48 @@ class ProductMaterialSerializer(serializers.ModelSerializer):
 # ===================================
 
 
-class ProductListSerializer(serializers.ModelSerializer):
+class VariantSiblingsMixin:
+    """
+    Соседние цвета и ссылки вариантов из предзагруженных данных.
+    Активные варианты базового товара берутся из prefetch (to_attr="active_variants",
+    см. active_variants_prefetch), а сериализованные цвета и пути категорий
+    кэшируются в контексте на время одного ответа — страница из 20 товаров
+    не делает запросов на каждую строку.
+    """
+
+    def _context_cached(self, bucket, key, factory):
+        # context общий для корневого и вложенных сериализаторов
+        cache = self.context.setdefault(bucket, {})
+        if key not in cache:
+            cache[key] = factory()
+        return cache[key]
+
+    def get_frontend_url(self, obj):
+        # Собираем путь: /catalog/полный-путь-категории/слаг-товара-ID
+        category = obj.product.category
+        category_path = self._context_cached(
+            "_category_paths", category.pk, category.get_full_path
+        )
+        return f"/catalog/{category_path}/{obj.slug}-{obj.id}/"
+
+    def get_sibling_variants(self, obj):
+        product = obj.product
+        variants = getattr(product, "active_variants", None)
+        if variants is None:
+            # Без prefetch (одиночный объект) — один запрос
+            variants = product.variants.filter(is_active=True).select_related("color")
+        return variants
+
+    def serialize_color(self, color):
+        return self._context_cached(
+            "_colors",
+            color.pk,
+            lambda: ColorSerializer(color, context=self.context).data,
+        )
+
+
+class ProductListSerializer(VariantSiblingsMixin, serializers.ModelSerializer):
+    gender = serializers.CharField(source="product.gender", read_only=True)
     gender_display = serializers.CharField(
         source="product.get_gender_display", read_only=True
     )
@@ -166,26 +207,18 @@ class ProductListSerializer(serializers.ModelSerializer):
         }
 
     def get_pricing(self, obj):
-        # Используем аннотацию, если она есть (для скорости)
-        annotated_price = getattr(obj, "annotated_min_final_price", None)
-
-        if annotated_price is not None:
-            return {
-                "min_price": annotated_price,
-                "old_price": getattr(obj, "annotated_old_price", None),
-                "discount": getattr(obj, "annotated_discount", 0),
-            }
+        # Используем аннотацию, если она есть (листинг),
+        # иначе денормализованные колонки варианта (избранное и др.)
+        min_price = getattr(obj, "annotated_min_final_price", obj.min_final_price)
 
-        # если аннотации нет
-        active_sizes = [s for s in obj.sizes.all() if s.is_active]
-        if not active_sizes:
+        # Нет активных размеров
+        if min_price is None:
             return {"min_price": 0, "old_price": None, "discount": 0}
 
-        cheapest = min(active_sizes, key=lambda s: s.final_price)
         return {
-            "min_price": cheapest.final_price,
-            "old_price": cheapest.price if cheapest.has_discount else None,
-            "discount": cheapest.discount_percent if cheapest.has_discount else 0,
+            "min_price": min_price,
+            "old_price": getattr(obj, "annotated_old_price", obj.min_old_price),
+            "discount": getattr(obj, "annotated_discount", obj.min_discount_percent),
         }
 
     def get_main_image(self, obj):
@@ -199,25 +232,18 @@ class ProductListSerializer(serializers.ModelSerializer):
             }
         return None
 
-    def get_frontend_url(self, obj):
-        # Собираем путь: /catalog/полный-путь-категории/слаг-товара-ID
-        category_path = obj.product.category.get_full_path()
-        return f"/catalog/{category_path}/{obj.slug}-{obj.id}/"
-
     def get_available_colors(self, obj):
         """
         Собирает все варианты текущего базового товара.
         """
         # Берем все активные варианты базового товара
         #!!! Нужно ли проверять активность базового товара? Проверяется во вьюхе
-        variants = obj.product.variants.filter(is_active=True).select_related("color")
-
         results = []
-        for v in variants:
+        for v in self.get_sibling_variants(obj):
             if v.color:
                 results.append(
                     {
-                        "color": ColorSerializer(v.color, context=self.context).data,
+                        "color": self.serialize_color(v.color),
                         "frontend_url": self.get_frontend_url(v),
                     }
                 )
@@ -240,7 +266,7 @@ class ProductListSerializer(serializers.ModelSerializer):
         ]
 
 
-class ProductDetailSerializer(serializers.ModelSerializer):
+class ProductDetailSerializer(VariantSiblingsMixin, serializers.ModelSerializer):
     # Общие данные из базового товара
     gender_display = serializers.CharField(
         source="product.get_gender_display", read_only=True
@@ -263,13 +289,12 @@ class ProductDetailSerializer(serializers.ModelSerializer):
     frontend_url = serializers.SerializerMethodField()
 
     def get_breadcrumbs(self, obj):
-        # MPTT метод get_ancestors возвращает всю цепочку от корня до текущей категории
-        ancestors = obj.product.category.get_ancestors(include_self=True)
-        return [{"name": cat.name, "slug": cat.slug} for cat in ancestors]
-
-    def get_frontend_url(self, obj):
-        category_path = obj.product.category.get_full_path()
-        return f"/catalog/{category_path}/{obj.slug}-{obj.id}/"
+        # Цепочка от корня до текущей категории из кэша дерева категорий
+        category = obj.product.category
+        ancestors = get_category_breadcrumbs(category.pk) or category.get_ancestors(
+            include_self=True
+        ).values("name", "slug")
+        return [{"name": cat["name"], "slug": cat["slug"]} for cat in ancestors]
 
     def get_naming(self, obj):
         product = obj.product
@@ -294,14 +319,12 @@ class ProductDetailSerializer(serializers.ModelSerializer):
         """
         # Берем все активные варианты базового товара
         #!!! Нужно ли проверять активность базового товара?
-        variants = obj.product.variants.filter(is_active=True).select_related("color")
-
         results = []
-        for v in variants:
+        for v in self.get_sibling_variants(obj):
             if v.color:
                 results.append(
                     {
-                        "color": ColorSerializer(v.color, context=self.context).data,
+                        "color": self.serialize_color(v.color),
                         "frontend_url": self.get_frontend_url(v),
                         "is_current": v.id
                         == obj.id,  # Флаг, для выделения текущего цвета
@@ -331,6 +354,7 @@ class ProductDetailSerializer(serializers.ModelSerializer):
             "color",
             "available_colors",
             "breadcrumbs",
+            "frontend_url",
             "description",
             "sizes",
             "images",
@@ -1,10 +1,37 @@
 # from django.db.models.signals import post_delete, m2m_changed
-from django.db.models.signals import post_delete, pre_save
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from django.db import transaction
-from django.core.exceptions import ObjectDoesNotExist
-from easy_thumbnails.files import get_thumbnailer
-from .models import ProductImage
+from mptt.signals import node_moved
+from .models import (
+    Category,
+    Brand,
+    Color,
+    Size,
+    Material,
+    Product,
+    ProductVariant,
+    ProductSize,
+    ProductImage,
+    ProductMaterial,
+    SliderBanner,
+    PriceCampaign,
+)
+from .cache import (
+    BANNERS_GROUP,
+    REFERENCES_GROUP,
+    category_chain_groups,
+    invalidate_groups,
+    invalidate_variant_responses,
+    variant_family_groups,
+)
+from .utils import (
+    schedule_facet_refresh,
+    schedule_variant_price_refresh,
+    invalidate_category_tree,
+    schedule_images_sync,
+    schedule_file_cleanup,
+    finish_campaign,
+)
 
 # from .models import ProductImage, ProductVariant
 
@@ -12,51 +39,160 @@ from .models import ProductImage
 @receiver(post_delete, sender=ProductImage)
 def signal_post_delete(sender, instance, **kwargs):
     """
-    1. Удаляет кэш миниатюр при удалении объекта.
+    1. Ставит файл и его миниатюры в очередь на удаление.
     2. Синхронизирует позиции оставшихся фото.
     """
-    # --- 1: Очистка миниатюр ---
-    if instance.image:
-        try:
-            # get_thumbnailer найдет все превью, связанные с этим файлом в папке thumbnails
-            get_thumbnailer(instance.image).delete_thumbnails()
-        except Exception:
-            # Ошибка удаления миниатюр не должна прерывать работу сигнала
-            pass
+    # --- 1: Очистка файлов ---
+    # Не сканируем хранилище в запросе: оригинал и миниатюры удалит
+    # collect_media_garbage (каскад удаления товара — одна запись на транзакцию)
+    schedule_file_cleanup([instance.image.name])
 
     # --- 2: Логика синхронизации ---
     # post_delete срабатывает, когда объекта уже нет в базе,
-    # поэтому мы просто пересчитываем оставшихся
-    try:
-        # Проверяем, существует ли еще товар.
-        # Если мы удаляем вариант целиком, доступ к instance.variant вызовет ошибку.
-        variant = instance.variant
-        if variant:
-            from .utils import sync_product_images
-
-            transaction.on_commit(lambda: sync_product_images(variant))
-    except ObjectDoesNotExist:
-        # Если товара уже нет в базе (каскадное удаление), просто ничего не делаем
-        pass
+    # поэтому пересчитываем оставшихся — один раз на вариант после коммита.
+    # Если удаляется вариант целиком, синхронизация для него пропускается.
+    schedule_images_sync([instance.variant_id])
+
+
+@receiver(post_delete, sender=SliderBanner)
+def signal_banner_post_delete(sender, instance, **kwargs):
+    schedule_file_cleanup([instance.image.name])
 
 
 @receiver(pre_save, sender=ProductImage)
+@receiver(pre_save, sender=SliderBanner)
 def signal_pre_save_image_cleanup(sender, instance, **kwargs):
     """
-    Удаляет миниатюры старого изображения, если файл был заменен на новый.
+    Ставит в очередь на удаление старое изображение (и его миниатюры),
+    если файл был заменен на новый.
     """
     if not instance.pk:
         return  # Это новый объект, чистить нечего
 
     try:
-        old_instance = sender.objects.get(pk=instance.pk)
+        old_instance = sender.objects.only("image").get(pk=instance.pk)
         # Если путь к файлу изменился (заменили картинку)
         if old_instance.image and old_instance.image != instance.image:
-            get_thumbnailer(old_instance.image).delete_thumbnails()
+            schedule_file_cleanup([old_instance.image.name])
     except sender.DoesNotExist:
         pass
 
 
+# --- Индекс фильтров каталога (CatalogFacet) ---
+
+
+@receiver(post_save, sender=ProductSize)
+@receiver(post_delete, sender=ProductSize)
+def signal_size_facets(sender, instance, **kwargs):
+    """
+    Изменение цены/активности размера -> пересборка индекса варианта
+    и пересчёт его денормализованных цен (min_final_price и др.)
+    """
+    schedule_facet_refresh([instance.variant_id])
+    schedule_variant_price_refresh([instance.variant_id])
+
+
+@receiver(post_save, sender=ProductVariant)
+def signal_variant_facets(sender, instance, **kwargs):
+    """
+    Активность/цвет варианта -> пересборка индекса варианта.
+    Полный save() варианта перезаписывает колонки цен значениями из памяти,
+    поэтому после коммита пересчитываем их заново.
+    """
+    schedule_facet_refresh([instance.pk])
+    schedule_variant_price_refresh([instance.pk])
+
+
+@receiver(post_save, sender=Product)
+def signal_product_facets(sender, instance, created, **kwargs):
+    """Активность/категория/бренд товара -> пересборка индекса всех его вариантов"""
+    if created:
+        return
+    schedule_facet_refresh(instance.variants.values_list("pk", flat=True))
+
+
+# --- Кэш путей и хлебных крошек категорий ---
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(node_moved, sender=Category)
+def signal_category_tree(sender, **kwargs):
+    """Переименование, перемещение или удаление категории -> новая версия дерева"""
+    invalidate_category_tree()
+
+
+# --- Кэш ответов каталога (xwear.cache.cache_response) ---
+# Регистрируются после обработчиков индекса и цен: сброс кэша выполняется
+# после их пересчёта в on_commit, и в кэш не попадут старые цены
+
+
+@receiver(post_save, sender=ProductSize)
+@receiver(post_delete, sender=ProductSize)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductMaterial)
+@receiver(post_delete, sender=ProductMaterial)
+def signal_variant_part_responses(sender, instance, **kwargs):
+    """Размеры, фото, состав -> листинги и карточки варианта"""
+    invalidate_variant_responses([instance.variant_id])
+
+
+@receiver(post_save, sender=ProductVariant)
+def signal_variant_responses(sender, instance, **kwargs):
+    invalidate_variant_responses([instance.pk])
+
+
+@receiver(pre_delete, sender=ProductVariant)
+def signal_variant_delete_responses(sender, instance, **kwargs):
+    """
+    После удаления соседей и категорию уже не найти по варианту,
+    поэтому группы собираются до удаления (сброс всё равно после коммита)
+    """
+    invalidate_groups(*variant_family_groups([instance.pk]))
+
+
+@receiver(pre_save, sender=Product)
+def signal_product_category_responses(sender, instance, **kwargs):
+    """Перенос товара в другую категорию -> сброс листингов старой категории"""
+    if not instance.pk:
+        return
+    old_category_id = (
+        sender.objects.filter(pk=instance.pk)
+        .values_list("category_id", flat=True)
+        .first()
+    )
+    if old_category_id is not None and old_category_id != instance.category_id:
+        invalidate_groups(*category_chain_groups([old_category_id]))
+
+
+@receiver(post_save, sender=Product)
+def signal_product_responses(sender, instance, created, **kwargs):
+    """Название/бренд/описание товара -> карточки всех его вариантов"""
+    if created:
+        return
+    invalidate_variant_responses(instance.variants.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=Color)
+@receiver(post_delete, sender=Color)
+@receiver(post_save, sender=Size)
+@receiver(post_delete, sender=Size)
+@receiver(post_save, sender=Material)
+@receiver(post_delete, sender=Material)
+def signal_reference_responses(sender, **kwargs):
+    """Справочники выводятся во всех листингах и карточках"""
+    invalidate_groups(REFERENCES_GROUP)
+
+
+@receiver(post_save, sender=SliderBanner)
+@receiver(post_delete, sender=SliderBanner)
+def signal_banner_responses(sender, **kwargs):
+    invalidate_groups(BANNERS_GROUP)
+
+
 # @receiver(m2m_changed, sender=ProductVariant.sizes.through)
 # def update_variant_status_on_size_change(sender, instance, action, **kwargs):
 #     """
@@ -69,3 +205,9 @@ def signal_pre_save_image_cleanup(sender, instance, **kwargs):
 #             instance.is_active = False
 #             instance.save(update_fields=["is_active"])
 #             # Здесь можно добавить логику уведомления (например, запись в лог)
+
+
+@receiver(pre_delete, sender=PriceCampaign)
+def signal_campaign_delete(sender, instance, **kwargs):
+    """Удаление идущей кампании -> размерам возвращаются собственные скидки"""
+    finish_campaign(instance)
@@ -1,3 +1,757 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.forms import modelform_factory
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from easy_thumbnails.models import Source, Thumbnail
+from rest_framework.test import APIClient
+from .forms import ProductSizeForm
+from .models import (
+    Brand,
+    Category,
+    Color,
+    Favorite,
+    ImageJob,
+    OrphanedFile,
+    PriceCampaign,
+    Product,
+    ProductImage,
+    ProductSize,
+    ProductVariant,
+    Size,
+)
+from .utils import (
+    CatalogImporter,
+    PriceOverflow,
+    claim_image_job,
+    enqueue_image_job,
+    export_catalog_rows,
+    generate_unique_article,
+    get_facet_counts,
+    get_filtered_products,
+    preview_repricing,
+    process_image_job,
+    read_catalog_rows,
+    reprice_sizes,
+    run_price_campaigns,
+    write_catalog_rows,
+)
+from .utils.catalog import parse_catalog_filters
+from .utils.image_jobs import MAX_ATTEMPTS, RETRY_DELAY, STALE_AFTER
 
-# Create your tests here.
+
+class CatalogTestCase(TestCase):
+    """Дерево категорий, справочники и покупатель для тестов каталога"""
+
+    @classmethod
+    def setUpTestData(cls):
+        root = Category.objects.create(name="Обувь")
+        cls.category = Category.objects.create(name="Кроссовки", parent=root)
+        cls.brand = Brand.objects.create(name="Nike", slug="nike")
+        cls.colors = [
+            Color.objects.create(name="Черный", slug="black"),
+            Color.objects.create(name="Белый", slug="white"),
+            Color.objects.create(name="Красный", slug="red"),
+        ]
+        cls.sizes = [Size.objects.create(name=str(n), order=n) for n in (40, 41)]
+        cls.user = get_user_model().objects.create_user(
+            email="buyer@example.com", password="pass"
+        )
+
+    def setUp(self):
+        # Кэш каталога переживает откат транзакции между тестами
+        caches["catalog"].clear()
+        # Версия дерева категорий из очищенного кэша читается сразу, а не по истечении
+        # TREE_VERSION_TTL посреди теста (лишний запрос на пересборку индекса)
+        patcher = mock.patch("xwear.utils.categories.TREE_VERSION_TTL", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.products_count = 0
+
+    def create_products(self, count):
+        """Товары с тремя цветами; каждый вариант сразу в избранном"""
+        # Индекс фильтров и цены вариантов обновляются в on_commit
+        with self.captureOnCommitCallbacks(execute=True):
+            return self._create_products(count)
+
+    def _create_products(self, count):
+        variants = []
+        for _ in range(count):
+            self.products_count += 1
+            product = Product.objects.create(
+                category=self.category,
+                brand=self.brand,
+                model_name=f"Model {self.products_count}",
+                gender="M",
+                season="SUMMER",
+            )
+            product.available_sizes.set(self.sizes)
+            product.is_active = True
+            product.save()
+            for color in self.colors:
+                variant = ProductVariant.objects.create(product=product, color=color)
+                for product_size in variant.sizes.all():
+                    product_size.price = Decimal("100.00")
+                    product_size.is_active = True
+                    product_size.save()
+                variant.is_active = True
+                variant.save()
+                Favorite.objects.create(user=self.user, variant=variant)
+                variants.append(variant)
+        return variants
+
+
+class CatalogQueryCountTests(CatalogTestCase):
+    """
+    Количество SQL-запросов листинга, избранного и рекомендаций
+    не должно зависеть от числа товаров на странице (нет N+1).
+    """
+
+    def count_queries(self, url):
+        # Первый запрос прогревает кэши процесса (дерево категорий)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertConstantQueries(self, url_factory, initial=1):
+        variants = self.create_products(initial)
+        small_page = self.count_queries(url_factory(variants[0]))
+        self.create_products(5)
+        large_page = self.count_queries(url_factory(variants[0]))
+        self.assertEqual(small_page, large_page)
+
+    def test_category_listing(self):
+        self.assertConstantQueries(
+            lambda variant: reverse("category_detail", args=[self.category.pk])
+        )
+
+    def test_category_listing_cursor(self):
+        self.assertConstantQueries(
+            lambda variant: reverse("category_detail", args=[self.category.pk])
+            + "?pagination=cursor"
+        )
+
+    def test_product_detail(self):
+        self.assertConstantQueries(
+            lambda variant: reverse("product_detail", args=[variant.pk])
+        )
+
+    def test_favorites(self):
+        self.assertConstantQueries(lambda variant: reverse("favorite-list"))
+
+    def test_recommendations(self):
+        # От 4 моделей в категории рекомендации не добирают товары вторым запросом
+        self.assertConstantQueries(
+            lambda variant: reverse("product_recommends", args=[variant.pk]), initial=5
+        )
+
+    def test_category_listing_invalid_price(self):
+        self.create_products(1)
+        url = reverse("category_detail", args=[self.category.pk])
+        for value in ("nan", "sNaN", "Infinity", "-1", "abc"):
+            with self.subTest(min_price=value):
+                response = self.client.get(url, {"min_price": value})
+                self.assertEqual(response.status_code, 200)
+
+
+class CatalogFiltersTests(SimpleTestCase):
+    def test_price_params(self):
+        filters = parse_catalog_filters(
+            QueryDict("min_price=nan&max_price=99.50&brands=nike,,adidas")
+        )
+        self.assertIsNone(filters["min_price"])
+        self.assertEqual(filters["max_price"], Decimal("99.50"))
+        self.assertEqual(filters["brands"], ["nike", "adidas"])
+
+    def test_rejects_non_finite_and_negative_prices(self):
+        for value in ("nan", "NaN", "sNaN", "Infinity", "-inf", "-0.01", "abc"):
+            with self.subTest(value=value):
+                filters = parse_catalog_filters(QueryDict(f"min_price={value}"))
+                self.assertIsNone(filters["min_price"])
+
+
+class FacetCountTests(CatalogTestCase):
+    """Дизъюнктивные счётчики сайдбара (utils/facets.py)"""
+
+    def create_variant(self, brand, color, prices):
+        """Активный вариант; prices — {название размера: цена} активных размеров"""
+        self.products_count += 1
+        product = Product.objects.create(
+            category=self.category,
+            brand=brand,
+            model_name=f"Model {self.products_count}",
+            gender="M",
+            season="SUMMER",
+            is_active=True,
+        )
+        product.available_sizes.set(self.sizes)
+        variant = ProductVariant.objects.create(product=product, color=color)
+        for product_size in variant.sizes.select_related("size"):
+            if product_size.size.name in prices:
+                product_size.price = Decimal(prices[product_size.size.name])
+                product_size.is_active = True
+                product_size.save()
+        variant.is_active = True
+        variant.save()
+
+    def test_each_facet_ignores_own_selection(self):
+        black, white, red = self.colors
+        adidas = Brand.objects.create(name="Adidas", slug="adidas")
+        with self.captureOnCommitCallbacks(execute=True):
+            # Минимальные цены вариантов: 100, 200, 300, 150, 50
+            self.create_variant(self.brand, black, {"40": "100.00", "41": "120.00"})
+            self.create_variant(self.brand, white, {"41": "200.00"})
+            self.create_variant(adidas, black, {"40": "300.00"})
+            self.create_variant(adidas, red, {"40": "150.00", "41": "150.00"})
+            self.create_variant(self.brand, red, {"40": "50.00"})
+
+        query = QueryDict(
+            "brands=nike&colors=black,red&sizes=40&min_price=60&max_price=250"
+        )
+        categories = self.category.get_descendants(include_self=True)
+        counts = get_facet_counts(categories, parse_catalog_filters(query))
+
+        self.assertEqual(counts["brands"], {"nike": 1, "adidas": 1})
+        self.assertEqual(counts["colors"], {"black": 1, "white": 0, "red": 0})
+        self.assertEqual(counts["sizes"], {"40": 1, "41": 1})
+        # Диапазон цен — по всем фильтрам, кроме самой цены (варианты за 100 и 50)
+        self.assertEqual(
+            counts["price_range"], {"min": Decimal("50.00"), "max": Decimal("100.00")}
+        )
+        self.assertEqual(counts["total"], 1)
+        self.assertEqual(get_filtered_products(categories, query).count(), 1)
+
+        # Без выбора счётчики — все товары категории
+        counts = get_facet_counts(categories, parse_catalog_filters(QueryDict()))
+        self.assertEqual(counts["brands"], {"nike": 3, "adidas": 2})
+        self.assertEqual(counts["total"], 5)
+
+
+class CatalogResponseCacheTests(CatalogTestCase):
+    """Закэшированные ответы для анонимов сбрасываются после изменений товаров"""
+
+    def setUp(self):
+        super().setUp()
+        # Кэшируются только ответы анонимам
+        self.client.force_authenticate(None)
+
+    def get_colors(self, variant):
+        response = self.client.get(reverse("product_detail", args=[variant.pk]))
+        self.assertEqual(response.status_code, 200)
+        return {color["color"]["slug"] for color in response.json()["available_colors"]}
+
+    def test_variant_delete_resets_sibling_cards(self):
+        first, second, third = self.create_products(1)
+        self.assertEqual(len(self.get_colors(first)), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            third.delete()
+        self.assertNotIn(third.color.slug, self.get_colors(first))
+
+    def test_variant_change_resets_only_its_category_listings(self):
+        other = Category.objects.create(name="Сандалии", parent=self.category.parent)
+        variant = self.create_products(1)[0]
+        listing = reverse("category_detail", args=[self.category.pk])
+        other_listing = reverse("category_detail", args=[other.pk])
+        root_listing = reverse("category_detail", args=[self.category.parent_id])
+        self.client.get(listing)
+        self.client.get(other_listing)
+        self.client.get(root_listing)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            variant.is_active = False
+            variant.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(other_listing)
+        self.assertEqual(len(queries), 0)
+        for url in (listing, root_listing):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            self.assertGreater(len(queries), 0)
+
+
+class UniqueRetryTests(CatalogTestCase):
+    """Повтор сохранения с новым слагом/артикулом — только при конфликте этого значения"""
+
+    def test_duplicate_color_is_not_retried(self):
+        variant = self.create_products(1)[0]
+        with mock.patch(
+            "xwear.utils.generate_unique_article", wraps=generate_unique_article
+        ) as generate:
+            with self.assertRaises(IntegrityError):
+                ProductVariant.objects.create(
+                    product=variant.product, color=variant.color
+                )
+        self.assertEqual(generate.call_count, 1)
+
+    def test_taken_slug_is_regenerated(self):
+        product = self.create_products(1)[0].product
+        clash = Product(
+            category=self.category,
+            brand=self.brand,
+            model_name="Other",
+            gender="M",
+            season="SUMMER",
+        )
+        # Параллельный процесс успел занять слаг между проверкой и вставкой
+        with mock.patch(
+            "xwear.models.generate_unique_slug", side_effect=[product.slug, "other-1"]
+        ):
+            clash.save()
+        self.assertEqual(clash.slug, "other-1")
+
+
+class CatalogImportTests(CatalogTestCase):
+    def import_file(self, content, fmt):
+        importer = CatalogImporter()
+        importer.import_rows(read_catalog_rows(io.StringIO(content), fmt))
+        return importer
+
+    def export_file(self, fmt):
+        stream = io.StringIO(newline="")
+        write_catalog_rows(export_catalog_rows(), stream, fmt)
+        return stream.getvalue()
+
+    def test_export_import_round_trip_is_noop(self):
+        self.create_products(2)
+        for fmt in ("csv", "jsonl"):
+            with self.subTest(fmt=fmt):
+                importer = self.import_file(self.export_file(fmt), fmt)
+                self.assertEqual(importer.errors, [])
+                self.assertEqual(importer.stats["rows"], 12)
+                for key in (
+                    "products_created",
+                    "variants_created",
+                    "sizes_created",
+                    "sizes_updated",
+                ):
+                    self.assertEqual(importer.stats[key], 0, key)
+
+    def test_bad_rows_are_reported(self):
+        self.create_products(1)
+        row = json.loads(self.export_file("jsonl").splitlines()[0])
+        lines = [
+            '{"category": ',
+            "[1, 2]",
+            json.dumps({**row, "price": "nan"}),
+            json.dumps({**row, "price": "-1"}),
+            json.dumps({**row, "color": "no-such-color"}),
+            json.dumps({**row, "price": "150.00"}),
+        ]
+        importer = self.import_file("\n".join(lines) + "\n", "jsonl")
+
+        self.assertEqual([line for line, _ in importer.errors], [1, 2, 3, 4, 5])
+        self.assertEqual(importer.stats["rows"], 6)
+        self.assertEqual(importer.stats["sizes_updated"], 1)
+
+    def test_invalid_fields_are_row_errors(self):
+        first, second = self.create_products(1)[:2]
+        row = json.loads(self.export_file("jsonl").splitlines()[0])
+        self.assertEqual(row["article"], first.article)
+        new_product = {**row, "model_name": "New", "article": "NEW-1"}
+        lines = [
+            {**row, "model_name": "x" * 51},
+            {**row, "name": "x" * 51},
+            # Кириллица при транслитерации длиннее: слаг не влезает в поле
+            {**new_product, "name": "щ" * 50, "model_name": "щ" * 50, "article": ""},
+            {**new_product, "article": "x" * 51},
+            # Артикул другого варианта: из БД и из строки выше
+            {**row, "article": second.article},
+            {**new_product, "article": second.article},
+            new_product,
+            {**new_product, "color": "white"},
+            {**row, "price": "150.00"},
+        ]
+        importer = self.import_file(
+            "".join(json.dumps(line) + "\n" for line in lines), "jsonl"
+        )
+
+        # Ошибочные строки не откатывают пачку
+        self.assertEqual([line for line, _ in importer.errors], [1, 2, 3, 4, 5, 6, 8])
+        self.assertEqual(importer.stats["variants_created"], 1)
+        self.assertEqual(importer.stats["sizes_updated"], 1)
+        self.assertTrue(ProductVariant.objects.filter(article="NEW-1").exists())
+
+
+class RepricingTests(CatalogTestCase):
+    def create_sizes(self, prices):
+        """Размеры одного варианта с заданными ценами"""
+        variant = self.create_products(1)[0]
+        sizes = [
+            Size.objects.create(name=f"R{n}", order=100 + n) for n in range(len(prices))
+        ]
+        ProductSize.objects.bulk_create(
+            ProductSize(variant=variant, size=size, price=price, is_active=True)
+            for size, price in zip(sizes, prices)
+        )
+        return ProductSize.objects.filter(size__in=sizes)
+
+    def test_sql_rounding_matches_calculate_final_price(self):
+        for discount in (5, 15, 33, 45, 95):
+            # Цены, у которых итоговая ровно на границе полкопейки (x.xx5)
+            cents = [c for c in range(1, 100000) if c * (100 - discount) % 100 == 50]
+            prices = [Decimal(c) / 100 for c in cents[:10] + cents[-10:]]
+            with self.subTest(discount=discount):
+                sizes = self.create_sizes(prices)
+                reprice_sizes(sizes, discount=discount)
+                for size in sizes:
+                    self.assertEqual(size.final_price, size.calculate_final_price())
+
+    def test_sql_rounding_of_price_change(self):
+        prices = [Decimal("0.05"), Decimal("0.15"), Decimal("10.10"), Decimal("4545.45")]
+        sizes = self.create_sizes(prices)
+        reprice_sizes(sizes, price_change=10)
+        # ROUND_HALF_UP: 0.055 -> 0.06, 0.165 -> 0.17, 11.11, 4999.995 -> 5000.00
+        self.assertEqual(
+            sorted(sizes.values_list("price", flat=True)),
+            [Decimal("0.06"), Decimal("0.17"), Decimal("11.11"), Decimal("5000.00")],
+        )
+        for size in sizes:
+            self.assertEqual(size.final_price, size.calculate_final_price())
+
+    def test_price_overflow_is_refused(self):
+        sizes = self.create_sizes([Decimal("100.00"), Decimal("5000.00")])
+        with self.assertRaises(PriceOverflow) as error:
+            preview_repricing(sizes, price_change=100)
+        self.assertEqual(error.exception.count, 1)
+        with self.assertRaises(PriceOverflow):
+            reprice_sizes(sizes, price_change=100)
+        self.assertEqual(
+            sorted(sizes.values_list("price", flat=True)),
+            [Decimal("100.00"), Decimal("5000.00")],
+        )
+        # Без размера за 5000.00 наценка проходит
+        self.assertEqual(reprice_sizes(sizes.filter(price__lt=5000), price_change=100), 1)
+
+    def test_variant_prices_refresh_in_batches(self):
+        variants = self.create_products(1)
+        sizes = ProductSize.objects.filter(variant__in=variants)
+        with (
+            mock.patch("xwear.utils.pricing.PRICES_BATCH_SIZE", 2),
+            CaptureQueriesContext(connection) as queries,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            reprice_sizes(sizes, discount=20)
+
+        # 3 варианта пачками по 2: по UPDATE цен на каждую пачку
+        updates = [
+            q["sql"]
+            for q in queries.captured_queries
+            if q["sql"].startswith('UPDATE "xwear_productvariant"')
+            and "min_final_price" in q["sql"]
+        ]
+        self.assertEqual(len(updates), 2)
+        for variant in ProductVariant.objects.filter(pk__in=[v.pk for v in variants]):
+            self.assertEqual(variant.min_final_price, Decimal("80.00"))
+            self.assertEqual(variant.max_discount_percent, 20)
+
+
+class PriceCampaignTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+        self.variant = self.create_products(1)[0]
+        self.variant_sizes = self.variant.sizes.all()
+        # Пакет пересчёта цен из setUp не должен остаться ждать коммита
+        with self.captureOnCommitCallbacks(execute=True):
+            reprice_sizes(self.variant_sizes, discount=10)
+
+    def create_campaign(self, discount, starts_in=-1, ends_in=1, **conditions):
+        return PriceCampaign.objects.create(
+            name=f"Скидка {discount}%",
+            discount_percent=discount,
+            starts_at=self.now + timedelta(hours=starts_in),
+            ends_at=self.now + timedelta(hours=ends_in),
+            **conditions,
+        )
+
+    def run_campaigns(self, hours=0):
+        return run_price_campaigns(now=self.now + timedelta(hours=hours))
+
+    def assertSizes(self, discount, final_price, regular=None, campaign=None):
+        for size in self.variant_sizes.all():
+            self.assertEqual(size.discount_percent, discount)
+            self.assertEqual(size.final_price, Decimal(final_price))
+            self.assertEqual(size.regular_discount_percent, regular)
+            self.assertEqual(size.campaign, campaign)
+
+    def test_activate_and_deactivate(self):
+        campaign = self.create_campaign(30, category=self.category)
+        self.assertEqual(self.run_campaigns(), ([campaign], []))
+        self.assertSizes(30, "70.00", regular=10, campaign=campaign)
+
+        self.assertEqual(self.run_campaigns(hours=2), ([], [campaign]))
+        self.assertSizes(10, "90.00")
+        campaign.refresh_from_db()
+        self.assertEqual(campaign.status, PriceCampaign.Status.FINISHED)
+
+    def test_active_campaign_picks_up_new_sizes(self):
+        campaign = self.create_campaign(30, category=self.category)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run_campaigns()
+
+        # Товар создан (или импортирован) уже во время кампании
+        variants = self.create_products(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.run_campaigns(hours=0.5), ([], []))
+
+        sizes = ProductSize.objects.filter(variant__in=variants)
+        self.assertEqual(set(sizes.values_list("campaign", flat=True)), {campaign.pk})
+        self.assertEqual(
+            set(sizes.values_list("discount_percent", "regular_discount_percent")),
+            {(30, 0)},
+        )
+        campaign.refresh_from_db()
+        self.assertEqual(
+            campaign.sizes_count, ProductSize.objects.filter(campaign=campaign).count()
+        )
+        for variant in ProductVariant.objects.filter(pk__in=[v.pk for v in variants]):
+            self.assertEqual(variant.min_final_price, Decimal("70.00"))
+
+    def test_overlapping_campaigns(self):
+        first = self.create_campaign(20, starts_in=-2, ends_in=1, category=self.category)
+        second = self.create_campaign(40, ends_in=3, brand=self.brand)
+        self.run_campaigns()
+        # Размеры остаются за кампанией, начавшейся раньше
+        self.assertSizes(20, "80.00", regular=10, campaign=first)
+
+        # Освобождённые размеры в том же запуске переходят к идущей кампании
+        self.run_campaigns(hours=2)
+        self.assertSizes(40, "60.00", regular=10, campaign=second)
+
+        self.run_campaigns(hours=4)
+        self.assertSizes(10, "90.00")
+
+    def test_manual_edits_during_campaign(self):
+        campaign = self.create_campaign(30)
+        self.run_campaigns()
+
+        # Массовая скидка меняет собственную скидку, действует скидка кампании
+        reprice_sizes(self.variant_sizes, discount=5)
+        self.assertSizes(30, "70.00", regular=5, campaign=campaign)
+
+        # Строка инлайна админки: в поле — собственная скидка
+        size = self.variant_sizes.first()
+        Form = modelform_factory(
+            ProductSize,
+            form=ProductSizeForm,
+            fields=["size", "price", "discount_percent", "stock", "is_active"],
+        )
+        form = Form(instance=size)
+        self.assertEqual(form["discount_percent"].value(), 5)
+        form = Form(
+            instance=size,
+            data={"price": "100.00", "discount_percent": "15", "is_active": "on"},
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        size.refresh_from_db()
+        self.assertEqual(
+            (size.discount_percent, size.regular_discount_percent, size.final_price),
+            (30, 15, Decimal("70.00")),
+        )
+        reprice_sizes(self.variant_sizes, discount=5)
+
+        # Выгрузка отдаёт собственную скидку: повторный импорт ничего не меняет
+        stream = io.StringIO()
+        write_catalog_rows(export_catalog_rows(), stream, "jsonl")
+        importer = CatalogImporter()
+        importer.import_rows(read_catalog_rows(io.StringIO(stream.getvalue()), "jsonl"))
+        self.assertEqual(importer.stats["sizes_updated"], 0)
+        rows = [
+            {**json.loads(line), "discount_percent": 25}
+            for line in stream.getvalue().splitlines()
+        ]
+        importer = CatalogImporter()
+        importer.import_rows(enumerate(rows, start=1))
+        self.assertSizes(30, "70.00", regular=25, campaign=campaign)
+
+        # После кампании действует последняя собственная скидка
+        self.run_campaigns(hours=2)
+        self.assertSizes(25, "75.00")
+
+
+@mock.patch("xwear.utils.image_jobs.generate_thumbnail_manifest")
+class ImageJobTests(CatalogTestCase):
+    """Очередь миниатюр (utils/image_jobs.py); генерация миниатюр подменена"""
+
+    def setUp(self):
+        super().setUp()
+        variant = self.create_products(1)[0]
+        # bulk_create: без save() и постановки задачи, файл на диске не нужен
+        self.image = ProductImage.objects.bulk_create(
+            [ProductImage(variant=variant, image="products/test.jpg")]
+        )[0]
+        enqueue_image_job(self.image)
+
+    def get_job(self):
+        return ImageJob.objects.get(object_id=self.image.pk)
+
+    def make_stale(self, attempts):
+        ImageJob.objects.update(
+            status=ImageJob.Status.PROCESSING,
+            attempts=attempts,
+            locked_at=timezone.now() - STALE_AFTER - timedelta(minutes=1),
+        )
+
+    def test_claim_and_complete(self, generate):
+        job = claim_image_job()
+        self.assertEqual((job.status, job.attempts), (ImageJob.Status.PROCESSING, 1))
+        # Задача в работе не выдаётся второму воркеру
+        self.assertIsNone(claim_image_job())
+
+        self.assertTrue(process_image_job(job))
+        generate.assert_called_once_with(self.image, "image")
+        self.assertFalse(ImageJob.objects.exists())
+
+    def test_retry_with_backoff(self, generate):
+        generate.side_effect = OSError("битый файл")
+        for attempt in (1, 2):
+            started = timezone.now()
+            with self.assertLogs("apps", "ERROR"):
+                self.assertFalse(process_image_job(claim_image_job()))
+            job = self.get_job()
+            self.assertEqual(
+                (job.status, job.attempts), (ImageJob.Status.PENDING, attempt)
+            )
+            self.assertEqual(job.last_error, "битый файл")
+            self.assertGreaterEqual(
+                job.run_after, started + RETRY_DELAY * 2 ** (attempt - 1)
+            )
+            # До run_after задача не выдаётся
+            self.assertIsNone(claim_image_job())
+            ImageJob.objects.update(run_after=timezone.now())
+
+    def test_failed_after_max_attempts(self, generate):
+        generate.side_effect = OSError("битый файл")
+        ImageJob.objects.update(attempts=MAX_ATTEMPTS - 1)
+        with self.assertLogs("apps", "ERROR"):
+            self.assertFalse(process_image_job(claim_image_job()))
+        self.assertEqual(self.get_job().status, ImageJob.Status.FAILED)
+        self.assertIsNone(claim_image_job())
+
+    def test_stale_job_is_taken_over(self, generate):
+        abandoned = claim_image_job()
+        self.make_stale(attempts=1)
+
+        job = claim_image_job()
+        self.assertEqual(job.attempts, 2)
+        # Запоздавший результат брошенного прогона не трогает перехваченную задачу
+        self.assertTrue(process_image_job(abandoned))
+        self.assertEqual(self.get_job().locked_at, job.locked_at)
+
+        self.assertTrue(process_image_job(job))
+        self.assertFalse(ImageJob.objects.exists())
+
+    def test_stale_job_after_max_attempts_fails(self, generate):
+        self.make_stale(attempts=MAX_ATTEMPTS)
+        with self.assertLogs("apps", "ERROR"):
+            self.assertIsNone(claim_image_job())
+        job = self.get_job()
+        self.assertEqual((job.status, job.locked_at), (ImageJob.Status.FAILED, None))
+        generate.assert_not_called()
+
+
+class MediaCleanupTests(CatalogTestCase):
+    """Команды collect_media_garbage и media_reconcile на временном MEDIA_ROOT"""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root))
+        self.variant = self.create_products(1)[0]
+
+    def create_file(self, name, age_hours=48):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"x" * 10)
+        mtime = time.time() - age_hours * 3600
+        os.utime(path, (mtime, mtime))
+
+    def create_image(self, name, referenced=True):
+        """Оригинал и миниатюра (с записями easy-thumbnails); возвращает имя миниатюры"""
+        thumbnail = f"thumbnails/{name}.100x120.webp"
+        self.create_file(name)
+        self.create_file(thumbnail)
+        source = Source.objects.create(name=name, storage_hash="test")
+        Thumbnail.objects.create(name=thumbnail, source=source, storage_hash="test")
+        if referenced:
+            ProductImage.objects.bulk_create(
+                [ProductImage(variant=self.variant, image=name)]
+            )
+        return thumbnail
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.media_root, name))
+
+    def call(self, *args):
+        out = io.StringIO()
+        call_command(*args, stdout=out)
+        return out.getvalue()
+
+    def test_collect_media_garbage(self):
+        kept_thumbnail = self.create_image("products/kept.jpg")
+        deleted_thumbnail = self.create_image("products/deleted.jpg", referenced=False)
+        # Файл, имя которого снова занято новой загрузкой, не удаляется
+        OrphanedFile.objects.bulk_create(
+            [
+                OrphanedFile(path="products/kept.jpg"),
+                OrphanedFile(path="products/deleted.jpg"),
+            ]
+        )
+
+        output = self.call("collect_media_garbage", "--dry-run")
+        self.assertIn("можно удалить файлов 2 (", output)
+        self.assertTrue(self.exists("products/deleted.jpg"))
+        self.assertTrue(self.exists(deleted_thumbnail))
+        self.assertEqual(OrphanedFile.objects.count(), 2)
+
+        with self.assertLogs("apps", "INFO"):
+            self.call("collect_media_garbage")
+        self.assertFalse(self.exists("products/deleted.jpg"))
+        self.assertFalse(self.exists(deleted_thumbnail))
+        self.assertFalse(Source.objects.filter(name="products/deleted.jpg").exists())
+        self.assertTrue(self.exists("products/kept.jpg"))
+        self.assertTrue(self.exists(kept_thumbnail))
+        self.assertFalse(OrphanedFile.objects.exists())
+
+    def test_media_reconcile(self):
+        kept_thumbnail = self.create_image("products/kept.jpg")
+        self.create_file("products/orphan.jpg")
+        self.create_file("thumbnails/products/orphan.jpg.100x120.webp")
+        # Моложе --min-age: может принадлежать незакоммиченной транзакции
+        self.create_file("products/fresh.jpg", age_hours=1)
+        orphans = ["products/orphan.jpg", "thumbnails/products/orphan.jpg.100x120.webp"]
+
+        output = self.call("media_reconcile", "--min-age", "24")
+        self.assertIn("Найдено лишних файлов: 2", output)
+        for name in orphans:
+            self.assertTrue(self.exists(name), name)
+
+        with self.assertLogs("apps", "INFO"):
+            self.call("media_reconcile", "--min-age", "24", "--delete")
+        for name in orphans:
+            self.assertFalse(self.exists(name), name)
+        for name in ("products/kept.jpg", kept_thumbnail, "products/fresh.jpg"):
+            self.assertTrue(self.exists(name), name)
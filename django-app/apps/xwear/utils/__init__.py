@@ -1,17 +1,94 @@
 from .images import (
     UploadToPath,
     convert_to_webp,
+    get_webp_options,
     clean_thumbnail_namer,
     get_thumbnail_data,
+    build_thumbnail_manifest,
+    generate_thumbnail_manifest,
+    get_thumbnail_manifest,
     get_admin_thumb,
     sync_product_images,
+    schedule_images_sync,
     prepare_image_for_save,
+    release_prepared_image,
     generate_banner_html,
 )
-from .models import generate_unique_slug, generate_unique_article, is_field_changed
+from .models import (
+    generate_unique_slug,
+    generate_unique_article,
+    next_free_slug,
+    get_article_prefix,
+    get_last_article_number,
+    format_article,
+    save_with_unique_retry,
+    is_field_changed,
+    on_commit_batched,
+)
 from .forms import add_validator_attrs_to_widget
 from .catalog import (
+    active_variants_prefetch,
     get_category_sidebar_filters,
     get_filtered_products,
     get_similar_products,
+    parse_catalog_filters,
+)
+from .facets import (
+    refresh_catalog_facets,
+    rebuild_catalog_facets,
+    schedule_facet_refresh,
+    get_facet_counts,
+)
+from .pricing import (
+    refresh_variant_prices,
+    rebuild_variant_prices,
+    schedule_variant_price_refresh,
+    sizes_bulk_changed,
+    final_price_expression,
+    get_repricing_expressions,
+    get_sizes_for_repricing,
+    check_price_overflow,
+    preview_repricing,
+    reprice_sizes,
+    PriceOverflow,
+)
+from .categories import (
+    get_category_index,
+    get_category_path,
+    get_category_breadcrumbs,
+    invalidate_category_tree,
+)
+from .image_jobs import (
+    schedule_thumbnails,
+    enqueue_image_job,
+    claim_image_job,
+    process_image_job,
+    retry_failed_image_jobs,
+)
+from .image_import import (
+    collect_import_files,
+    import_product_images,
+)
+from .media import (
+    schedule_file_cleanup,
+    collect_media_garbage,
+    get_media_roots,
+    find_orphaned_media,
+    delete_orphaned_media,
+)
+from .catalog_io import (
+    CATALOG_FIELDS,
+    CATALOG_FORMATS,
+    CatalogImporter,
+    detect_catalog_format,
+    read_catalog_rows,
+    write_catalog_rows,
+    export_catalog_rows,
+)
+from .campaigns import (
+    get_campaign_sizes,
+    activate_campaign,
+    deactivate_campaign,
+    finish_campaign,
+    run_price_campaigns,
 )
@@ -0,0 +1,132 @@
+# ЦЕНОВЫЕ КАМПАНИИ ПО РАСПИСАНИЮ (команда run_price_campaigns)
+
+import logging
+from django.db import transaction
+from django.db.models import F, Value
+from django.utils import timezone
+from .pricing import final_price_expression, get_sizes_for_repricing, sizes_bulk_changed
+
+logger = logging.getLogger("apps")
+
+
+def get_campaign_sizes(campaign):
+    """Размеры, подходящие под условия кампании (все условия одновременно)"""
+    variant_ids = list(campaign.variants.values_list("pk", flat=True))
+    return get_sizes_for_repricing(
+        category=campaign.category, brand=campaign.brand, variants=variant_ids
+    )
+
+
+def _affected_variants(sizes):
+    return set(sizes.values_list("variant_id", flat=True).distinct())
+
+
+def activate_campaign(campaign):
+    """
+    Одним UPDATE: собственная скидка размера -> regular_discount_percent,
+    скидка кампании -> discount_percent, final_price пересчитывается в БД.
+    Размеры, уже занятые другой идущей кампанией, не трогаются. Для идущей кампании
+    подхватывает подходящие размеры, появившиеся после старта.
+    Возвращает id затронутых вариантов.
+    """
+    sizes = get_campaign_sizes(campaign).filter(campaign__isnull=True)
+    variant_ids = _affected_variants(sizes)
+    if not variant_ids and campaign.status == campaign.Status.ACTIVE:
+        return variant_ids
+
+    discount = Value(campaign.discount_percent)
+    campaign.sizes_count += sizes.update(
+        campaign=campaign,
+        regular_discount_percent=F("discount_percent"),
+        discount_percent=discount,
+        final_price=final_price_expression(discount),
+    )
+    campaign.status = campaign.Status.ACTIVE
+    campaign.save(update_fields=["status", "sizes_count", "updated_at"])
+    return variant_ids
+
+
+def deactivate_campaign(campaign):
+    """Одним UPDATE возвращает размерам собственную скидку и цену"""
+    from ..models import ProductSize
+
+    sizes = ProductSize.objects.filter(campaign=campaign)
+    variant_ids = _affected_variants(sizes)
+    regular_discount = F("regular_discount_percent")
+    sizes.update(
+        campaign=None,
+        discount_percent=regular_discount,
+        final_price=final_price_expression(regular_discount),
+        regular_discount_percent=None,
+    )
+    campaign.status = campaign.Status.FINISHED
+    campaign.save(update_fields=["status", "updated_at"])
+    return variant_ids
+
+
+def finish_campaign(campaign):
+    """
+    Досрочное завершение (удаление кампании в админке). Статус экземпляра
+    может быть устаревшим, поэтому размеры кампании выбираются из БД.
+    """
+    with transaction.atomic():
+        variant_ids = deactivate_campaign(campaign)
+        if variant_ids:
+            sizes_bulk_changed(variant_ids)
+
+
+def run_price_campaigns(now=None):
+    """
+    Завершает истёкшие и запускает наступившие кампании в одной транзакции:
+    витрина переключается целиком, а кэш листингов, цены вариантов и индекс
+    фильтров обновляются одним пакетом после коммита. Идущие кампании на каждом
+    запуске получают подходящие размеры без кампании (новые варианты, импорт).
+    Возвращает (запущенные, завершённые).
+    """
+    from ..models import PriceCampaign
+
+    now = now or timezone.now()
+    Status = PriceCampaign.Status
+    variant_ids = set()
+    started = []
+    finished = []
+
+    with transaction.atomic():
+        # Сначала завершаем: освободившиеся размеры достанутся следующей кампании.
+        # skip_locked — второй экземпляр планировщика не обработает кампанию повторно
+        for campaign in PriceCampaign.objects.select_for_update(skip_locked=True).filter(
+            status=Status.ACTIVE, ends_at__lte=now
+        ):
+            variant_ids |= deactivate_campaign(campaign)
+            finished.append(campaign)
+
+        # Кампания целиком пришлась на простой планировщика — не запускаем
+        PriceCampaign.objects.filter(status=Status.SCHEDULED, ends_at__lte=now).update(
+            status=Status.FINISHED
+        )
+
+        # Освобождённые и новые размеры подхватывают идущие кампании (старшая — первой),
+        # затем запускаются наступившие
+        for campaign in (
+            PriceCampaign.objects.select_for_update(skip_locked=True)
+            .filter(
+                status__in=[Status.SCHEDULED, Status.ACTIVE],
+                starts_at__lte=now,
+                ends_at__gt=now,
+            )
+            .order_by("starts_at", "pk")
+        ):
+            if campaign.status == Status.SCHEDULED:
+                started.append(campaign)
+            variant_ids |= activate_campaign(campaign)
+
+        if variant_ids:
+            sizes_bulk_changed(variant_ids)
+
+    for campaign in finished:
+        logger.info("Ценовая кампания завершена: %s", campaign)
+    for campaign in started:
+        logger.info(
+            "Ценовая кампания запущена: %s, размеров %s", campaign, campaign.sizes_count
+        )
+    return started, finished
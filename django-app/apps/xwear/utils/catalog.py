@@ -1,63 +1,142 @@
 # ВЫБОРКА И ФИЛЬТРАЦИЯ ДАННЫХ ДЛЯ КАТАЛОГА, РЕКОМЕНДАЦИИ
 
 import random
-from django.db.models import Prefetch, Min, Max, Q
+from decimal import Decimal, InvalidOperation
+from django.db.models import Prefetch, Min, Max, F, Exists, OuterRef
 
+# Поля цены, которые ожидает ProductListSerializer.get_pricing
+PRICE_ANNOTATIONS = {
+    "annotated_min_final_price": F("min_final_price"),
+    "annotated_old_price": F("min_old_price"),
+    "annotated_discount": F("min_discount_percent"),
+}
 
-# Собирает данные для сайдбара (бренды, размеры, диапазон цен),
-# слайдер цены и список брендов в фильтре должны показывать все возможности категории
-def get_category_sidebar_filters(categories):
-    from ..models import ProductVariant, ProductSize, Brand, Color
+# Сортировки листинга (?ordering=...), id — для стабильного порядка
+DEFAULT_ORDERING = ("-created_at", "-id")
+CATALOG_ORDERING = {
+    "price": (F("min_final_price").asc(nulls_last=True), "-id"),
+    "-price": (F("min_final_price").desc(nulls_last=True), "-id"),
+    "discount": ("-max_discount_percent", "-created_at", "-id"),
+}
 
-    # Базовый кверисет — только активные варианты активных базовых товаров
-    sidebar_data_qs = ProductVariant.objects.filter(
-        product__category__in=categories, is_active=True, product__is_active=True
-    )
 
-    # 1. Цены, доступные в этой категории
-    price_stats = sidebar_data_qs.aggregate(
-        min_p=Min("sizes__final_price", filter=Q(sizes__is_active=True)),
-        max_p=Max("sizes__final_price", filter=Q(sizes__is_active=True)),
+def active_variants_prefetch(lookup="product__variants"):
+    """
+    Активные варианты базового товара с цветами одним запросом на всю выборку
+    (для кружочков цветов: VariantSiblingsMixin.get_sibling_variants)
+    """
+    from ..models import ProductVariant
+
+    return Prefetch(
+        lookup,
+        queryset=ProductVariant.objects.filter(is_active=True).select_related("color"),
+        to_attr="active_variants",
     )
 
-    # 2. Бренды, доступные в этой категории
-    brands = Brand.objects.filter(
-        products__variants__is_active=True,
-        products__category__in=categories,
-        products__is_active=True,
-    ).distinct()
-
-    # 3. Размеры, доступные в этой категории
-    sizes = (
-        ProductSize.objects.filter(
-            variant__product__category__in=categories,
-            variant__is_active=True,
-            variant__product__is_active=True,
-            is_active=True,
+
+# Собирает данные для сайдбара (бренды, размеры, цвета, диапазон цен),
+# слайдер цены и список брендов в фильтре должны показывать все возможности категории
+def get_category_sidebar_filters(categories):
+    """
+    Данные берутся из индекса CatalogFacet одним сгруппированным запросом
+    (вместо четырёх агрегатов по ProductVariant → Product → ProductSize).
+    """
+    from ..models import CatalogFacet, Brand, Color
+
+    facet_rows = (
+        CatalogFacet.objects.filter(category__in=categories)
+        .values(
+            "brand_id",
+            "brand__name",
+            "brand__slug",
+            "color_id",
+            "color__name",
+            "color__slug",
+            "color__hex_code",
+            "color__hex_code_2",
+            "color__texture",
+            "color__order",
+            "size__name",
+            "size__order",
         )
-        .values_list("size__name", flat=True)
-        .distinct()
-        # .order_by("size__name")
+        .annotate(min_p=Min("final_price"), max_p=Max("final_price"))
+        .order_by()
     )
 
-    # 4. Цвета, доступные в этой категории
-    colors = Color.objects.filter(
-        variants__product__category__in=categories,
-        variants__is_active=True,
-        variants__product__is_active=True,
-    ).distinct()
+    brands = {}
+    colors = {}
+    sizes = {}
+    min_prices = []
+    max_prices = []
+
+    for row in facet_rows:
+        # Справочники маленькие — собираем объекты прямо из строк индекса
+        brands.setdefault(
+            row["brand_id"],
+            Brand(id=row["brand_id"], name=row["brand__name"], slug=row["brand__slug"]),
+        )
+        colors.setdefault(
+            row["color_id"],
+            Color(
+                id=row["color_id"],
+                name=row["color__name"],
+                slug=row["color__slug"],
+                hex_code=row["color__hex_code"],
+                hex_code_2=row["color__hex_code_2"],
+                texture=row["color__texture"],
+                order=row["color__order"],
+            ),
+        )
+        sizes.setdefault(row["size__name"], row["size__order"])
+        if row["min_p"] is not None:
+            min_prices.append(row["min_p"])
+            max_prices.append(row["max_p"])
 
     return {
-        "brands": brands,
-        "sizes": list(sizes),
-        "colors": colors,
+        "brands": sorted(brands.values(), key=lambda b: b.name),
+        "sizes": sorted(sizes, key=lambda name: (sizes[name], name)),
+        "colors": sorted(colors.values(), key=lambda c: c.order),
         "price_range": {
-            "min": price_stats["min_p"] or 0,
-            "max": price_stats["max_p"] or 0,
+            "min": min(min_prices) if min_prices else 0,
+            "max": max(max_prices) if max_prices else 0,
         },
     }
 
 
+# Разбирает параметры фильтров сайдбара из URL
+def parse_catalog_filters(query_params):
+    """
+    Современный подход через запятую (в URL: ?brands=nike,adidas&sizes=41,42).
+    Некорректные значения цены (в т.ч. nan, Infinity и отрицательные) игнорируются.
+    """
+
+    def split_param(name):
+        # Убираем лишние пробелы и пустые элементы на всякий случай
+        value = query_params.get(name) or ""
+        return [s.strip() for s in value.split(",") if s.strip()]
+
+    def price_param(name):
+        value = query_params.get(name)
+        if not value:
+            return None
+        try:
+            price = Decimal(value)
+        except InvalidOperation:
+            return None
+        # nan/Infinity проходят Decimal(), но падают на сравнении с ценами
+        if not price.is_finite() or price < 0:
+            return None
+        return price
+
+    return {
+        "brands": split_param("brands"),
+        "colors": split_param("colors"),
+        "sizes": split_param("sizes"),
+        "min_price": price_param("min_price"),
+        "max_price": price_param("max_price"),
+    }
+
+
 # Возвращает отфильтрованный QuerySet товаров для фильтров сайдбара
 def get_filtered_products(categories, query_params):
     from ..models import ProductVariant, ProductSize
@@ -66,72 +145,48 @@ def get_filtered_products(categories, query_params):
         ProductVariant.objects.filter(
             product__category__in=categories, is_active=True, product__is_active=True
         )
-        .annotate(
-            # Находим минимальную цену среди размеров для этого товара
-            annotated_min_final_price=Min(
-                "sizes__final_price", filter=Q(sizes__is_active=True)
-            )
-        )
+        # Цены берём из денормализованных колонок варианта (без GROUP BY по размерам)
+        .annotate(**PRICE_ANNOTATIONS)
         .select_related("product__brand", "product__category", "color")
         .prefetch_related(
             "images",
-            "product__variants__color",  # Соседние цвета для кружочков
-            Prefetch(
-                "sizes",
-                queryset=ProductSize.objects.filter(is_active=True).select_related(
-                    "size"
-                ),
-            ),
+            active_variants_prefetch(),  # Соседние цвета для кружочков
         )
         # .order_by("-product__created_at", "-id") # сортируем по дате создания родителя
-        .order_by("-created_at", "-id")  # сортируем по дате создания варианта
+        # сортируем по дате создания варианта или по ?ordering=price|-price|discount
+        .order_by(*CATALOG_ORDERING.get(query_params.get("ordering"), DEFAULT_ORDERING))
     )
 
     # Применяем фильтры
-    # 1. Современный подход через запятую (в URL: ?brands=nike,adidas)
+    filters = parse_catalog_filters(query_params)
+
     # Фильтр по брендам
-    brands_param = query_params.get("brands")
-    if brands_param:
-        # brand_slugs = brands_param.split(",")
-        # Убираем лишние пробелы и пустые элементы на всякий случай
-        brand_slugs = [s.strip() for s in brands_param.split(",") if s.strip()]
-        queryset = queryset.filter(product__brand__slug__in=brand_slugs)
+    if filters["brands"]:
+        queryset = queryset.filter(product__brand__slug__in=filters["brands"])
 
     # Фильтр по цветам
-    colors_param = query_params.get("colors")
-    if colors_param:
-        color_slugs = [s.strip() for s in colors_param.split(",") if s.strip()]
-        queryset = queryset.filter(color__slug__in=color_slugs)
+    if filters["colors"]:
+        queryset = queryset.filter(color__slug__in=filters["colors"])
 
     # Фильтр по размерам
-    sizes_param = query_params.get("sizes")
-    if sizes_param:
-        # size_names = sizes_param.split(",")
-        size_names = [s.strip() for s in sizes_param.split(",") if s.strip()]
-        # Если фильтруем по размерам, нужен distinct, так как у товара много размеров
+    if filters["sizes"]:
+        # EXISTS вместо JOIN + distinct(): у товара много размеров, а дубли строк
+        # ломают keyset-пагинацию и заставляют БД сортировать весь результат
         queryset = queryset.filter(
-            sizes__size__name__in=size_names, sizes__is_active=True
-        ).distinct()
-
-    # 2. Стандартный подход (в URL: ?brands=nike&brands=adidas)
-    # brand_slugs = query_params.getlist("brands")
-    # if brand_slugs:
-    #     queryset = queryset.filter(brand__slug__in=brand_slugs)
-
-    # size_names = query_params.getlist("sizes")
-    # if size_names:
-    #     # Если фильтруем по размерам, нужен distinct, так как у товара много размеров
-    #     queryset = queryset.filter(
-    #         sizes__size__name__in=size_names, sizes__is_active=True
-    #     ).distinct()
-
-    # Фильтр по цене
-    min_p = query_params.get("min_price")
-    max_p = query_params.get("max_price")
-    if min_p:
-        queryset = queryset.filter(annotated_min_final_price__gte=min_p)
-    if max_p:
-        queryset = queryset.filter(annotated_min_final_price__lte=max_p)
+            Exists(
+                ProductSize.objects.filter(
+                    variant=OuterRef("pk"),
+                    is_active=True,
+                    size__name__in=filters["sizes"],
+                )
+            )
+        )
+
+    # Фильтр по цене (обычный WHERE по индексу вместо HAVING)
+    if filters["min_price"] is not None:
+        queryset = queryset.filter(min_final_price__gte=filters["min_price"])
+    if filters["max_price"] is not None:
+        queryset = queryset.filter(min_final_price__lte=filters["max_price"])
 
     return queryset
 
@@ -142,16 +197,10 @@ def get_similar_products(variant, limit=8):
     Возвращает товары из той же подкатегории в ценовом диапазоне +/- 20% рандомно.
     В блок рекомендаций всегда попадает только один цвет от одной базовой модели.
     """
-    from ..models import ProductVariant, ProductSize
+    from ..models import ProductVariant
 
-    # 1. Получаем минимальную финальную цену текущего варианта для расчета диапазона
-    # (Берем из аннотации, если она была во вьюхе, или считаем)
-    current_min_price = getattr(variant, "annotated_min_final_price", None)
-    if current_min_price is None:
-        price_data = variant.sizes.filter(is_active=True).aggregate(
-            min_p=Min("final_price")
-        )
-        current_min_price = price_data["min_p"]
+    # 1. Минимальная финальная цена текущего варианта для расчета диапазона
+    current_min_price = variant.min_final_price
 
     if current_min_price is None:
         return []
@@ -168,11 +217,7 @@ def get_similar_products(variant, limit=8):
             product__category=variant.product.category,
         )
         .exclude(product_id=variant.product_id)  # Исключаем всю текущую семью
-        .annotate(
-            # Аннотируем каждый товар в базе его минимальной ценой
-            annotated_min_p=Min("sizes__final_price", filter=Q(sizes__is_active=True))
-        )
-        .filter(annotated_min_p__range=(min_range, max_range))
+        .filter(min_final_price__range=(min_range, max_range))
     )
 
     # 4. Дедупликация: берем только один вариант от каждого базового товара
@@ -210,20 +255,7 @@ def get_similar_products(variant, limit=8):
     # 7. Финальный запрос с полной подгрузкой данных
     return (
         ProductVariant.objects.filter(id__in=random_ids)
-        .annotate(
-            annotated_min_final_price=Min(
-                "sizes__final_price", filter=Q(sizes__is_active=True)
-            )
-        )
+        .annotate(**PRICE_ANNOTATIONS)
         .select_related("product__brand", "product__category", "color")
-        .prefetch_related(
-            "images",
-            "product__variants__color",
-            Prefetch(
-                "sizes",
-                queryset=ProductSize.objects.filter(is_active=True).select_related(
-                    "size"
-                ),
-            ),
-        )
+        .prefetch_related("images", active_variants_prefetch())
     )
@@ -0,0 +1,491 @@
+# МАССОВЫЙ ИМПОРТ/ЭКСПОРТ КАТАЛОГА (команды catalog_import, catalog_export)
+# Одна строка файла — один размер: товар + цвет (вариант) + размер, цена и скидка
+
+import csv
+import json
+import logging
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.db import DatabaseError, transaction
+from django.db.models.functions import Coalesce
+from pytils.translit import slugify
+from .categories import get_category_index
+from .models import (
+    format_article,
+    get_article_prefix,
+    get_last_article_number,
+    next_free_slug,
+)
+from .pricing import sizes_bulk_changed
+
+logger = logging.getLogger("apps")
+
+CATALOG_FIELDS = [
+    "category",  # путь из слагов: obuv/krossovki
+    "brand",  # слаг бренда
+    "name",  # вид товара (пусто — из категории)
+    "model_name",
+    "gender",  # M / F / U
+    "season",  # WINTER / SUMMER / AUTUMN_SPRING / ALL_SEASON
+    "color",  # слаг цвета
+    "article",  # пусто — сгенерируется для нового варианта
+    "size",  # название размера
+    "price",
+    "discount_percent",
+    "is_active",  # наличие размера
+]
+CATALOG_FORMATS = ("csv", "jsonl")
+CATALOG_CHUNK_SIZE = 1000
+TRUE_VALUES = {"1", "true", "yes", "да", "+"}
+# Запас длины слага на суффикс -N при совпадении (до -999)
+SLUG_SUFFIX_RESERVE = 4
+
+
+def detect_catalog_format(path):
+    return "jsonl" if path.lower().endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def read_catalog_rows(stream, fmt):
+    """
+    Построчное чтение файла: (номер строки, dict).
+    Нечитаемая строка JSONL отдаётся как ValueError: CatalogImporter запишет её
+    в ошибки, как и остальные некорректные строки, и продолжит импорт.
+    """
+    if fmt == "jsonl":
+        for line_no, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, ValueError(f"Некорректный JSON: {e.msg}")
+    else:
+        # Строка 1 — заголовок
+        for line_no, row in enumerate(csv.DictReader(stream), start=2):
+            yield line_no, row
+
+
+def write_catalog_rows(rows, stream, fmt):
+    """Построчная запись; возвращает число строк"""
+    count = 0
+    if fmt == "jsonl":
+        for row in rows:
+            stream.write(json.dumps(row, ensure_ascii=False) + "\n")
+            count += 1
+    else:
+        writer = csv.DictWriter(stream, fieldnames=CATALOG_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def export_catalog_rows(chunk_size=CATALOG_CHUNK_SIZE):
+    """
+    Все размеры каталога в формате CATALOG_FIELDS: один запрос с JOIN,
+    читается потоком. Путь категории берётся из индекса дерева.
+    Скидка — собственная скидка размера (во время кампании — regular_discount_percent).
+    """
+    from ..models import ProductSize
+
+    categories = get_category_index()
+    rows = (
+        ProductSize.objects.annotate(
+            own_discount=Coalesce("regular_discount_percent", "discount_percent")
+        )
+        .values_list(
+            "variant__product__category_id",
+            "variant__product__brand__slug",
+            "variant__product__name",
+            "variant__product__model_name",
+            "variant__product__gender",
+            "variant__product__season",
+            "variant__color__slug",
+            "variant__article",
+            "size__name",
+            "price",
+            "own_discount",
+            "is_active",
+        )
+        .order_by("variant__product_id", "variant_id", "size__order", "size_id")
+        .iterator(chunk_size=chunk_size)
+    )
+    for category_id, *values, price, discount, is_active in rows:
+        crumbs = categories.get(category_id, {}).get("breadcrumbs", [])
+        yield dict(
+            zip(
+                CATALOG_FIELDS,
+                [
+                    "/".join(crumb["slug"] for crumb in crumbs),
+                    *values,
+                    "" if price is None else str(price),
+                    discount,
+                    int(is_active),
+                ],
+            )
+        )
+
+
+class CatalogImporter:
+    """
+    Импорт строк CATALOG_FIELDS пачками. Бренды, цвета, размеры и категории
+    резолвятся по словарям в памяти (загружаются один раз), товары и варианты
+    кэшируются между пачками. Новые записи — bulk_create, изменённые размеры —
+    bulk_update с final_price, посчитанной в Python (без ProductSize.save()).
+
+    Существующие товары и варианты не изменяются: обновляются цена, скидка
+    и наличие размеров. Новые варианты создаются неактивными, как в админке.
+    Скидка размера в идущей кампании пишется в regular_discount_percent.
+    Длины полей и чужие артикулы проверяются до записи: такая строка — ошибка строки,
+    а не откат всей пачки на INSERT.
+    """
+
+    def __init__(self):
+        from ..models import Brand, Category, Color, Product, ProductVariant, Size
+
+        self.categories = Category.objects.in_bulk()
+        self.category_paths = {
+            "/".join(crumb["slug"] for crumb in data["breadcrumbs"]): pk
+            for pk, data in get_category_index().items()
+        }
+        self.brands = {brand.slug: brand for brand in Brand.objects.all()}
+        self.brands_by_pk = {brand.pk: brand for brand in self.brands.values()}
+        self.colors = {color.slug: color for color in Color.objects.all()}
+        self.sizes = {}
+        # Название размера не уникально: берём первый по порядку сортировки
+        for size in Size.objects.order_by("-order", "-name"):
+            self.sizes[size.name] = size
+        self.genders = set(Product.GenderChoices.values)
+        self.seasons = set(Product.SeasonChoices.values)
+        self.max_lengths = {
+            "name": Product._meta.get_field("name").max_length,
+            "model_name": Product._meta.get_field("model_name").max_length,
+            "slug": Product._meta.get_field("slug").max_length,
+            "article": ProductVariant._meta.get_field("article").max_length,
+            "variant_slug": ProductVariant._meta.get_field("slug").max_length,
+        }
+
+        self.stats = Counter()
+        self.errors = []
+        self._reset_cache()
+
+    def _reset_cache(self):
+        # Ключ товара -> Product, (товар, цвет) -> ProductVariant
+        self.products = {}
+        self.variants = {}
+        self.product_slugs = {}  # category_id -> занятые слаги
+        self.article_numbers = {}  # серия артикула -> последний номер
+        self.article_owners = {}  # артикул -> (ключ товара, id цвета)
+
+    def import_rows(self, rows, chunk_size=CATALOG_CHUNK_SIZE):
+        """rows — итератор (номер строки, dict) из read_catalog_rows"""
+        rows = iter(rows)
+        while chunk := list(islice(rows, chunk_size)):
+            self.import_chunk(chunk)
+        return self.stats
+
+    def import_chunk(self, chunk):
+        self._load_article_owners(chunk)
+        parsed = []
+        for line_no, row in chunk:
+            self.stats["rows"] += 1
+            try:
+                parsed.append(self._parse_row(row))
+            except KeyError as e:
+                self.errors.append((line_no, f"Нет колонки {e}"))
+            except ValueError as e:
+                self.errors.append((line_no, str(e)))
+        if not parsed:
+            return
+
+        try:
+            with transaction.atomic():
+                self._resolve_products(parsed)
+                self._resolve_variants(parsed)
+                self._apply_sizes(parsed)
+        except DatabaseError as e:
+            # Пачка откатилась целиком (например, параллельная вставка того же слага):
+            # созданные в ней товары и варианты больше не существуют
+            self._reset_cache()
+            first, last = chunk[0][0], chunk[-1][0]
+            self.errors.append((f"{first}-{last}", f"пачка не загружена: {e}"))
+            logger.exception("Импорт каталога: ошибка в строках %s-%s", first, last)
+
+    def _load_article_owners(self, chunk):
+        """Владельцы артикулов из пачки, ещё не известные импорту, — один запрос"""
+        from ..models import ProductVariant
+
+        articles = {
+            str(row.get("article") or "").strip()
+            for _, row in chunk
+            if isinstance(row, dict)
+        } - {""}
+        articles -= set(self.article_owners)
+        if not articles:
+            return
+        owners = ProductVariant.objects.filter(article__in=articles).values_list(
+            "article",
+            "product__category_id",
+            "product__brand_id",
+            "product__name",
+            "product__model_name",
+            "color_id",
+        )
+        for article, category_id, brand_id, name, model_name, color_id in owners:
+            product_key = (category_id, brand_id, name, model_name)
+            self.article_owners[article] = (product_key, color_id)
+
+    def _check_length(self, value, field, label):
+        if len(value) > self.max_lengths[field]:
+            raise ValueError(
+                f"{label} длиннее {self.max_lengths[field]} символов: {value!r}"
+            )
+
+    def _lookup(self, mapping, value, label):
+        try:
+            return mapping[value]
+        except KeyError:
+            raise ValueError(f"{label}: нет значения {value!r}") from None
+
+    def _parse_row(self, row):
+        if isinstance(row, ValueError):
+            raise row
+        if not isinstance(row, dict):
+            raise ValueError("Строка должна быть объектом с колонками CATALOG_FIELDS")
+        row = {
+            key: "" if value is None else str(value).strip() for key, value in row.items()
+        }
+
+        gender = row["gender"] or "U"
+        if gender not in self.genders:
+            raise ValueError(f"Неизвестный пол: {gender!r}")
+        season = row["season"]
+        if season not in self.seasons:
+            raise ValueError(f"Неизвестный сезон: {season!r}")
+        if not row["model_name"]:
+            raise ValueError("Не указана модель")
+        self._check_length(row["model_name"], "model_name", "Модель")
+        self._check_length(row["name"], "name", "Вид товара")
+
+        try:
+            price = Decimal(row["price"]).quantize(Decimal("0.01"))
+        except InvalidOperation:
+            raise ValueError(f"Некорректная цена: {row['price']!r}") from None
+        # nan/Infinity проходят quantize, но не сравнение ниже (InvalidOperation)
+        if not price.is_finite():
+            raise ValueError(f"Некорректная цена: {row['price']!r}")
+        # Поле price: max_digits=6, decimal_places=2
+        if not Decimal("0") <= price < Decimal("10000"):
+            raise ValueError(f"Цена вне допустимого диапазона: {price}")
+        discount = int(row.get("discount_percent") or 0)
+        if not 0 <= discount <= 100:
+            raise ValueError(f"Скидка вне диапазона 0-100: {discount}")
+
+        category_id = self._lookup(
+            self.category_paths, row["category"].strip("/"), "Категория"
+        )
+        category = self.categories[category_id]
+        brand = self._lookup(self.brands, row["brand"], "Бренд")
+        color = self._lookup(self.colors, row["color"], "Цвет")
+        size = self._lookup(self.sizes, row["size"], "Размер")
+
+        # Слаг нового товара — slugify(full_name) и, при совпадении, суффикс -N
+        type_name = row["name"] or category.singular_name or category.name
+        slug_length = len(slugify(f"{type_name} {brand.name} {row['model_name']}"))
+        slug_length += SLUG_SUFFIX_RESERVE
+        if slug_length > self.max_lengths["slug"]:
+            raise ValueError("Слишком длинное название товара для слага")
+        if slug_length + 1 + len(color.slug) > self.max_lengths["variant_slug"]:
+            raise ValueError("Слишком длинное название товара и цвета для слага варианта")
+
+        product_key = (category_id, brand.pk, row["name"], row["model_name"])
+        article = row.get("article", "")
+        if article:
+            self._check_length(article, "article", "Артикул")
+            # Артикул принадлежит варианту (товар + цвет): из БД или из строк выше
+            owner = (product_key, color.pk)
+            if self.article_owners.setdefault(article, owner) != owner:
+                raise ValueError(f"Артикул {article!r} уже занят другим вариантом")
+
+        return {
+            "product_key": product_key,
+            "category": category,
+            "brand": brand,
+            "name": row["name"],
+            "model_name": row["model_name"],
+            "gender": gender,
+            "season": season,
+            "color": color,
+            "article": article,
+            "size": size,
+            "price": price,
+            "discount_percent": discount,
+            "is_active": row.get("is_active", "1").lower() in TRUE_VALUES,
+        }
+
+    def _resolve_products(self, parsed):
+        from ..models import Product
+
+        missing = {item["product_key"] for item in parsed} - set(self.products)
+        if not missing:
+            return
+
+        # Одним запросом все кандидаты, точное совпадение ключа — в Python
+        existing = Product.objects.filter(
+            category_id__in={key[0] for key in missing},
+            brand_id__in={key[1] for key in missing},
+            model_name__in={key[3] for key in missing},
+        )
+        for product in existing:
+            key = (
+                product.category_id,
+                product.brand_id,
+                product.name,
+                product.model_name,
+            )
+            if key in missing:
+                # Бренд и категория из словарей — без запросов при генерации артикулов
+                product.brand = self.brands_by_pk[product.brand_id]
+                product.category = self.categories[product.category_id]
+                self.products.setdefault(key, product)
+
+        new_products = []
+        for item in parsed:
+            key = item["product_key"]
+            if key in self.products:
+                continue
+            product = Product(
+                category=item["category"],
+                brand=item["brand"],
+                name=item["name"],
+                model_name=item["model_name"],
+                gender=item["gender"],
+                season=item["season"],
+            )
+            taken = self._taken_slugs(product.category_id)
+            product.slug = next_free_slug(slugify(product.full_name), taken)
+            taken.add(product.slug)
+            self.products[key] = product
+            new_products.append(product)
+
+        Product.objects.bulk_create(new_products)
+        self.stats["products_created"] += len(new_products)
+
+    def _taken_slugs(self, category_id):
+        from ..models import Product
+
+        # Слаги категории читаются один раз за импорт и пополняются в памяти
+        if category_id not in self.product_slugs:
+            self.product_slugs[category_id] = set(
+                Product.objects.filter(category_id=category_id).values_list(
+                    "slug", flat=True
+                )
+            )
+        return self.product_slugs[category_id]
+
+    def _resolve_variants(self, parsed):
+        from ..models import ProductVariant
+
+        keys = {
+            (self.products[item["product_key"]].pk, item["color"].pk) for item in parsed
+        }
+        missing = keys - set(self.variants)
+        if missing:
+            existing = ProductVariant.objects.filter(
+                product_id__in={product_id for product_id, _ in missing}
+            )
+            for variant in existing:
+                self.variants[(variant.product_id, variant.color_id)] = variant
+
+        new_variants = []
+        for item in parsed:
+            product = self.products[item["product_key"]]
+            key = (product.pk, item["color"].pk)
+            if key in self.variants:
+                continue
+            variant = ProductVariant(
+                product=product,
+                color=item["color"],
+                slug=f"{product.slug}-{item['color'].slug}",
+                article=item["article"] or self._next_article(product),
+            )
+            self.variants[key] = variant
+            self.article_owners[variant.article] = (item["product_key"], item["color"].pk)
+            new_variants.append(variant)
+
+        ProductVariant.objects.bulk_create(new_variants)
+        self.stats["variants_created"] += len(new_variants)
+
+    def _next_article(self, product):
+        from ..models import ProductVariant
+
+        prefix = get_article_prefix(product)
+        if prefix not in self.article_numbers:
+            self.article_numbers[prefix] = get_last_article_number(
+                ProductVariant.objects, prefix
+            )
+        self.article_numbers[prefix] += 1
+        return format_article(prefix, self.article_numbers[prefix])
+
+    def _apply_sizes(self, parsed):
+        from ..models import Product, ProductSize
+
+        rows = {}
+        for item in parsed:
+            product = self.products[item["product_key"]]
+            variant = self.variants[(product.pk, item["color"].pk)]
+            # Повтор размера в файле — побеждает последняя строка
+            rows[(variant.pk, item["size"].pk)] = item
+
+        existing = {}
+        for size in ProductSize.objects.filter(
+            variant_id__in={variant_id for variant_id, _ in rows}
+        ):
+            existing.setdefault((size.variant_id, size.size_id), size)
+
+        fields = ["price", "discount_percent", "is_active"]
+        to_create = []
+        to_update = []
+        for (variant_id, size_id), item in rows.items():
+            size = existing.get((variant_id, size_id))
+            values = {field: item[field] for field in fields}
+            if size is not None and size.campaign_id:
+                # Идёт кампания: скидка из файла вернётся после неё
+                values["regular_discount_percent"] = values.pop("discount_percent")
+            if size is None:
+                size = ProductSize(variant_id=variant_id, size_id=size_id)
+                to_create.append(size)
+            elif all(getattr(size, field) == value for field, value in values.items()):
+                continue
+            else:
+                to_update.append(size)
+            for field, value in values.items():
+                setattr(size, field, value)
+            # Та же формула и округление, что в ProductSize.save()
+            size.final_price = size.calculate_final_price()
+
+        ProductSize.objects.bulk_create(to_create)
+        ProductSize.objects.bulk_update(
+            to_update, fields + ["regular_discount_percent", "final_price"]
+        )
+        self.stats["sizes_created"] += len(to_create)
+        self.stats["sizes_updated"] += len(to_update)
+
+        # Размеры из файла попадают в размерную сетку товара (как available_sizes в админке)
+        Product.available_sizes.through.objects.bulk_create(
+            [
+                Product.available_sizes.through(
+                    product_id=self.products[item["product_key"]].pk,
+                    size_id=item["size"].pk,
+                )
+                for item in rows.values()
+            ],
+            ignore_conflicts=True,
+        )
+
+        # bulk-операции не шлют сигналы: цены вариантов, индекс фильтров и кэш
+        changed = {size.variant_id for size in to_create + to_update}
+        if changed:
+            sizes_bulk_changed(changed)
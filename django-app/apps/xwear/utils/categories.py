@@ -0,0 +1,84 @@
+# КЭШ ПУТЕЙ И ХЛЕБНЫХ КРОШЕК КАТЕГОРИЙ (MPTT)
+
+import threading
+import time
+from django.db import transaction
+from ..cache import CATEGORIES_GROUP, get_group_versions, invalidate_groups
+
+_index_lock = threading.Lock()
+_index = {"version": None, "checked_at": None, "categories": {}}
+
+# Как долго процесс не перечитывает версию дерева из кэша (сек.).
+# get_full_path зовётся на каждый узел дерева и каждый товар листинга:
+# без этого каждый вызов — обращение к кэшу (с файловым бэкендом — чтение файла).
+TREE_VERSION_TTL = 1.0
+
+
+def _tree_version():
+    # Смена версии группы заставляет все процессы пересобрать индекс
+    now = time.monotonic()
+    checked_at = _index["checked_at"]
+    if checked_at is not None and now - checked_at < TREE_VERSION_TTL:
+        return _index["version"]
+    version = get_group_versions([CATEGORIES_GROUP])[CATEGORIES_GROUP]
+    _index["checked_at"] = now
+    return version
+
+
+def _build_index():
+    """
+    Пути и хлебные крошки всех категорий одним запросом.
+    В порядке (tree_id, lft) родитель всегда идёт раньше своих потомков.
+    """
+    from ..models import Category
+
+    categories = {}
+    rows = Category.objects.values_list("id", "parent_id", "name", "slug").order_by(
+        "tree_id", "lft"
+    )
+    for pk, parent_id, name, slug in rows:
+        parent = categories.get(parent_id)
+        crumbs = (parent["breadcrumbs"] if parent else []) + [
+            {"name": name, "slug": slug, "id": pk}
+        ]
+        categories[pk] = {
+            # Для корня путь пустой (как в Category.get_full_path)
+            "path": "/".join(c["slug"] for c in crumbs) if parent else "",
+            "breadcrumbs": crumbs,
+        }
+    return categories
+
+
+def get_category_index():
+    """{id: {"path": "obuv/krossovki", "breadcrumbs": [...]}} текущей версии дерева"""
+    version = _tree_version()
+    if _index["version"] != version:
+        with _index_lock:
+            # Другой поток мог уже пересобрать индекс, пока мы ждали блокировку
+            if _index["version"] != version:
+                _index["categories"] = _build_index()
+                _index["version"] = version
+    return _index["categories"]
+
+
+def get_category_path(category_id):
+    """Полный путь из слагов или None, если категории ещё нет в индексе"""
+    data = get_category_index().get(category_id)
+    return data["path"] if data else None
+
+
+def get_category_breadcrumbs(category_id):
+    """Цепочка от корня до категории: [{"name", "slug", "id"}, ...] или None"""
+    data = get_category_index().get(category_id)
+    return data["breadcrumbs"] if data else None
+
+
+def invalidate_category_tree():
+    """Сбрасывает индекс (и закэшированные ответы каталога) во всех процессах"""
+    invalidate_groups(CATEGORIES_GROUP)
+
+    def recheck():
+        # Текущий процесс видит изменения сразу, остальные — не позже TREE_VERSION_TTL
+        _index["checked_at"] = None
+
+    transaction.on_commit(recheck)
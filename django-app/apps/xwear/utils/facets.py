@@ -0,0 +1,187 @@
+# ИНДЕКС ФИЛЬТРОВ КАТАЛОГА (САЙДБАР)
+
+from collections import defaultdict
+from django.db import transaction
+from .models import on_commit_batched
+
+# Размер пачки вставки при полной пересборке индекса
+FACET_BATCH_SIZE = 2000
+
+
+def _facet_rows(size_queryset):
+    """Строки индекса для активных размеров активных вариантов активных товаров"""
+    return (
+        size_queryset.filter(
+            is_active=True,
+            variant__is_active=True,
+            variant__product__is_active=True,
+        )
+        .values_list(
+            "id",
+            "variant_id",
+            "variant__product__category_id",
+            "variant__product__brand_id",
+            "variant__color_id",
+            "size_id",
+            "final_price",
+        )
+        .order_by()
+    )
+
+
+def _build_facets(rows):
+    from ..models import CatalogFacet
+
+    return [
+        CatalogFacet(
+            product_size_id=size_pk,
+            variant_id=variant_id,
+            category_id=category_id,
+            brand_id=brand_id,
+            color_id=color_id,
+            size_id=size_id,
+            final_price=final_price,
+        )
+        for size_pk, variant_id, category_id, brand_id, color_id, size_id, final_price in rows
+    ]
+
+
+@transaction.atomic
+def refresh_catalog_facets(variant_ids):
+    """
+    Пересобирает строки индекса для указанных вариантов:
+    удаляем старые и вставляем актуальные одним bulk_create.
+    """
+    from ..models import CatalogFacet, ProductSize
+
+    variant_ids = list(variant_ids)
+    if not variant_ids:
+        return
+
+    CatalogFacet.objects.filter(variant_id__in=variant_ids).delete()
+    rows = _facet_rows(ProductSize.objects.filter(variant_id__in=variant_ids))
+    CatalogFacet.objects.bulk_create(_build_facets(rows))
+
+
+@transaction.atomic
+def rebuild_catalog_facets():
+    """Полная пересборка индекса (management-команда rebuild_catalog_facets)"""
+    from ..models import CatalogFacet, ProductSize
+
+    CatalogFacet.objects.all().delete()
+
+    total = 0
+    batch = []
+    rows = _facet_rows(ProductSize.objects.all()).iterator(chunk_size=FACET_BATCH_SIZE)
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= FACET_BATCH_SIZE:
+            CatalogFacet.objects.bulk_create(_build_facets(batch))
+            total += len(batch)
+            batch = []
+    if batch:
+        CatalogFacet.objects.bulk_create(_build_facets(batch))
+        total += len(batch)
+    return total
+
+
+def schedule_facet_refresh(variant_ids):
+    """
+    Откладывает пересборку индекса до коммита транзакции.
+    Несколько сохранений в одной транзакции (инлайны админки) дают одну пересборку.
+    """
+    on_commit_batched("catalog_facets", variant_ids, refresh_catalog_facets)
+
+
+def get_facet_counts(categories, filters):
+    """
+    Количество товаров для каждого значения фильтра с учётом текущего выбора
+    ("дизъюнктивные фасеты": каждый фильтр считается со всеми фильтрами, кроме своего).
+
+    Один запрос к индексу, далее битовые маски в памяти:
+    каждому варианту назначается бит, каждому значению фильтра — маска вариантов.
+    """
+    from ..models import CatalogFacet
+
+    rows = (
+        CatalogFacet.objects.filter(category__in=categories)
+        .values_list(
+            "variant_id", "brand__slug", "color__slug", "size__name", "final_price"
+        )
+        .order_by()
+    )
+
+    positions = {}  # variant_id -> номер бита
+    brand_bits = defaultdict(set)
+    color_bits = defaultdict(set)
+    size_bits = defaultdict(set)
+    min_prices = {}  # номер бита -> минимальная цена варианта
+
+    for variant_id, brand_slug, color_slug, size_name, final_price in rows:
+        bit = positions.setdefault(variant_id, len(positions))
+        brand_bits[brand_slug].add(bit)
+        color_bits[color_slug].add(bit)
+        size_bits[size_name].add(bit)
+        if final_price is not None:
+            current = min_prices.get(bit)
+            if current is None or final_price < current:
+                min_prices[bit] = final_price
+
+    size_in_bytes = len(positions) // 8 + 1
+
+    def to_mask(bits):
+        # Собираем битовую маску за один проход через bytearray
+        buffer = bytearray(size_in_bytes)
+        for bit in bits:
+            buffer[bit >> 3] |= 1 << (bit & 7)
+        return int.from_bytes(buffer, "little")
+
+    brand_masks = {value: to_mask(bits) for value, bits in brand_bits.items()}
+    color_masks = {value: to_mask(bits) for value, bits in color_bits.items()}
+    size_masks = {value: to_mask(bits) for value, bits in size_bits.items()}
+    all_mask = (1 << len(positions)) - 1
+
+    def selected_mask(masks, values):
+        # Без выбора фильтр пропускает всё, внутри фильтра значения объединяются (ИЛИ)
+        if not values:
+            return all_mask
+        result = 0
+        for value in values:
+            result |= masks.get(value, 0)
+        return result
+
+    # Фильтр по цене работает по минимальной цене варианта (как в get_filtered_products)
+    min_price, max_price = filters["min_price"], filters["max_price"]
+    price_mask = all_mask
+    if min_price is not None or max_price is not None:
+        price_mask = to_mask(
+            bit
+            for bit, price in min_prices.items()
+            if (min_price is None or price >= min_price)
+            and (max_price is None or price <= max_price)
+        )
+
+    brand_mask = selected_mask(brand_masks, filters["brands"])
+    color_mask = selected_mask(color_masks, filters["colors"])
+    size_mask = selected_mask(size_masks, filters["sizes"])
+
+    def count(masks, others):
+        return {value: (mask & others).bit_count() for value, mask in masks.items()}
+
+    # Диапазон цен среди товаров, подходящих под все фильтры, кроме цены
+    without_price = brand_mask & color_mask & size_mask
+    selected = without_price.to_bytes(size_in_bytes, "little")
+    prices = [
+        price for bit, price in min_prices.items() if selected[bit >> 3] >> (bit & 7) & 1
+    ]
+
+    return {
+        "brands": count(brand_masks, color_mask & size_mask & price_mask),
+        "colors": count(color_masks, brand_mask & size_mask & price_mask),
+        "sizes": count(size_masks, brand_mask & color_mask & price_mask),
+        "price_range": {
+            "min": min(prices) if prices else 0,
+            "max": max(prices) if prices else 0,
+        },
+        "total": (without_price & price_mask).bit_count(),
+    }
@@ -0,0 +1,159 @@
+# МАССОВЫЙ ИМПОРТ ФОТО ТОВАРОВ (команда import_product_images)
+
+import csv
+import logging
+import multiprocessing
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+from django.db import connections, transaction
+from django.db.models import Max
+from ..cache import invalidate_variant_responses
+from .images import (
+    UploadToPath,
+    build_thumbnail_manifest,
+    convert_to_webp,
+    get_webp_options,
+    sync_product_images,
+)
+
+logger = logging.getLogger("apps")
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+IMPORT_BATCH_SIZE = 500
+
+
+def collect_import_files(source):
+    """
+    Файлы для импорта: {артикул варианта: [пути по порядку]}.
+    source — CSV-манифест (колонки article,file; пути относительно манифеста)
+    или папка: ARTICLE/1.jpg, ARTICLE/2.jpg... либо ARTICLE.jpg, ARTICLE_2.jpg...
+    """
+    files = defaultdict(list)
+
+    if os.path.isfile(source):
+        base_dir = os.path.dirname(os.path.abspath(source))
+        with open(source, newline="", encoding="utf-8") as manifest:
+            for row in csv.DictReader(manifest):
+                files[row["article"].strip()].append(
+                    os.path.join(base_dir, row["file"].strip())
+                )
+        return files
+
+    for root, _, names in os.walk(source):
+        for name in sorted(names):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() not in IMAGE_EXTENSIONS:
+                continue
+            if os.path.samefile(root, source):
+                article = stem.split("_")[0]
+            else:
+                # Подпапка первого уровня — артикул
+                article = os.path.relpath(root, source).split(os.sep)[0]
+            files[article].append(os.path.join(root, name))
+    return files
+
+
+def process_import_image(task):
+    """
+    Выполняется в процессе пула: проверка размеров, конвертация в WebP,
+    сохранение в хранилище и генерация всех алиасов миниатюр.
+    Возвращает имя файла и манифест миниатюр (или текст ошибки).
+    """
+    from ..models import ProductImage
+    from ..validators import ImageValidator
+
+    path, name, quality = task
+    field = ProductImage._meta.get_field("image")
+
+    try:
+        with Image.open(path) as img:
+            # Те же минимальные размеры, что и при загрузке через админку
+            for validator in field.validators:
+                if isinstance(validator, ImageValidator) and (
+                    img.width < (validator.min_width or 0)
+                    or img.height < (validator.min_height or 0)
+                ):
+                    raise ValueError(
+                        f"Изображение {img.width}x{img.height}px меньше "
+                        f"{validator.min_width}x{validator.min_height}px"
+                    )
+
+        with convert_to_webp(
+            path, quality=quality, **get_webp_options(ProductImage, "image")
+        ) as webp_content:
+            stored_name = field.storage.save(name, webp_content)
+        thumbnails = build_thumbnail_manifest(ProductImage(image=stored_name).image)
+    except Exception as e:
+        return {"path": path, "error": str(e)}
+
+    return {"path": path, "name": stored_name, "thumbnails": thumbnails}
+
+
+def import_product_images(files, workers=None, quality=85):
+    """
+    Импорт фото из collect_import_files: обработка в пуле процессов,
+    запись строк bulk_create и одна синхронизация (главное фото, alt) на вариант.
+    Возвращает (импортировано, ошибки [(путь, текст)], неизвестные артикулы).
+    """
+    from ..models import ProductImage, ProductVariant
+
+    variants = ProductVariant.objects.select_related(
+        "product__category", "product__brand"
+    ).in_bulk(list(files), field_name="article")
+    unknown = sorted(set(files) - set(variants))
+
+    upload_to = UploadToPath("products", use_category_subdir=True)
+    tasks = []
+    owners = []
+    for article, variant in variants.items():
+        for path in files[article]:
+            # Имя как у новой загрузки в админке (pk ещё нет — случайный суффикс)
+            name = upload_to(ProductImage(variant=variant), os.path.basename(path))
+            tasks.append((path, name, quality))
+            owners.append(variant)
+
+    # fork: процессы пула получают уже настроенный Django (при spawn/forkserver
+    # импорт xwear.utils до django.setup() невозможен), но не должны
+    # унаследовать открытые соединения с БД
+    connections.close_all()
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("fork")
+    ) as executor:
+        results = list(executor.map(process_import_image, tasks, chunksize=4))
+
+    errors = [(r["path"], r["error"]) for r in results if "error" in r]
+    done = [(owner, r) for owner, r in zip(owners, results) if "error" not in r]
+
+    variant_ids = {variant.pk for variant, _ in done}
+    positions = dict(
+        ProductImage.objects.filter(variant_id__in=variant_ids)
+        .values("variant_id")
+        .annotate(last=Max("position"))
+        .values_list("variant_id", "last")
+    )
+
+    images = []
+    for variant, result in done:
+        position = positions.get(variant.pk, -1) + 1
+        positions[variant.pk] = position
+        images.append(
+            ProductImage(
+                variant=variant,
+                image=result["name"],
+                thumbnails=result["thumbnails"],
+                position=position,
+            )
+        )
+
+    with transaction.atomic():
+        ProductImage.objects.bulk_create(images, batch_size=IMPORT_BATCH_SIZE)
+        for variant in {image.variant for image in images}:
+            sync_product_images(variant)
+        invalidate_variant_responses(variant_ids)
+
+    for path, error in errors:
+        logger.warning("Импорт фото %s: %s", path, error)
+
+    return len(images), errors, unknown
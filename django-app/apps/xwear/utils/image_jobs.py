@@ -0,0 +1,165 @@
+# ФОНОВАЯ ОБРАБОТКА ИЗОБРАЖЕНИЙ (очередь в БД + воркер run_image_worker)
+
+import logging
+from datetime import timedelta
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from ..cache import BANNERS_GROUP, invalidate_groups, invalidate_variant_responses
+from .images import generate_thumbnail_manifest
+
+logger = logging.getLogger("apps")
+
+# Попыток до статуса "Ошибка"
+MAX_ATTEMPTS = 5
+# Задержка перед повтором удваивается: 30 сек, 1 мин, 2 мин...
+RETRY_DELAY = timedelta(seconds=30)
+# Задача "в работе" дольше этого срока считается брошенной (воркер упал)
+STALE_AFTER = timedelta(minutes=10)
+
+
+def schedule_thumbnails(instance, field_name="image"):
+    """
+    Миниатюры и манифест для нового файла:
+    при IMAGE_JOBS_ASYNC — задача воркеру (в той же транзакции, что и сам файл),
+    иначе — генерация после коммита в текущем процессе.
+    """
+    if getattr(settings, "IMAGE_JOBS_ASYNC", False):
+        enqueue_image_job(instance, field_name)
+    else:
+        transaction.on_commit(lambda: generate_thumbnail_manifest(instance, field_name))
+
+
+def enqueue_image_job(instance, field_name="image"):
+    """
+    Ставит задачу для текущего файла поля. Одна строка на поле объекта:
+    повторная загрузка перезапускает задачу, а не добавляет новую.
+    """
+    from ..models import ImageJob
+
+    ImageJob.objects.update_or_create(
+        model_label=instance._meta.label_lower,
+        object_id=instance.pk,
+        field_name=field_name,
+        defaults={
+            "source": getattr(instance, field_name).name,
+            "status": ImageJob.Status.PENDING,
+            "attempts": 0,
+            "run_after": timezone.now(),
+            "locked_at": None,
+            "last_error": "",
+        },
+    )
+
+
+def claim_image_job():
+    """
+    Забирает очередную задачу (или брошенную упавшим воркером).
+    SKIP LOCKED: несколько воркеров не получают одну и ту же задачу.
+    Брошенная задача, исчерпавшая попытки, получает статус "Ошибка": файл,
+    на котором воркер падает целиком (OOM, segfault), не перезапускается бесконечно.
+    """
+    from ..models import ImageJob
+
+    now = timezone.now()
+    abandoned = ImageJob.objects.filter(
+        status=ImageJob.Status.PROCESSING,
+        locked_at__lt=now - STALE_AFTER,
+        attempts__gte=MAX_ATTEMPTS,
+    ).update(
+        status=ImageJob.Status.FAILED,
+        locked_at=None,
+        last_error="Воркер не завершил обработку (процесс упал или завис)",
+        updated_at=now,
+    )
+    if abandoned:
+        logger.error("Брошенные задачи изображений исчерпали попытки: %s", abandoned)
+
+    with transaction.atomic():
+        job = (
+            ImageJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=ImageJob.Status.PENDING, run_after__lte=now)
+                | Q(
+                    status=ImageJob.Status.PROCESSING,
+                    locked_at__lt=now - STALE_AFTER,
+                    attempts__lt=MAX_ATTEMPTS,
+                )
+            )
+            .order_by("run_after", "pk")
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = ImageJob.Status.PROCESSING
+        job.attempts += 1
+        job.locked_at = now
+        job.save(update_fields=["status", "attempts", "locked_at", "updated_at"])
+    return job
+
+
+def _invalidate_responses(instance):
+    # Закэшированные ответы могли уйти с оригиналом вместо миниатюр
+    variant_id = getattr(instance, "variant_id", None)
+    if variant_id:
+        invalidate_variant_responses([variant_id])
+    else:
+        invalidate_groups(BANNERS_GROUP)
+
+
+def process_image_job(job):
+    """
+    Выполняет взятую задачу. Возвращает True, если задача завершена.
+    Повторный запуск безопасен: easy-thumbnails не пересоздаёт актуальные миниатюры.
+    """
+    from ..models import ImageJob
+
+    # locked_at — метка захвата: если задачу перезапустили или перехватили,
+    # результат этого прогона её не трогает
+    claimed = ImageJob.objects.filter(pk=job.pk, locked_at=job.locked_at)
+
+    try:
+        model = apps.get_model(job.model_label)
+        instance = model.objects.filter(pk=job.object_id).first()
+        image_field = getattr(instance, job.field_name, None)
+
+        # Объект удалён или файл уже заменён — делать нечего
+        if image_field and image_field.name == job.source:
+            generate_thumbnail_manifest(instance, job.field_name)
+            _invalidate_responses(instance)
+    except Exception as e:
+        failed = job.attempts >= MAX_ATTEMPTS
+        claimed.update(
+            status=ImageJob.Status.FAILED if failed else ImageJob.Status.PENDING,
+            run_after=timezone.now() + RETRY_DELAY * 2 ** (job.attempts - 1),
+            locked_at=None,
+            last_error=str(e),
+            updated_at=timezone.now(),
+        )
+        logger.error(
+            "Обработка изображения %s #%s (попытка %s): %s",
+            job.model_label,
+            job.object_id,
+            job.attempts,
+            e,
+        )
+        return False
+
+    claimed.delete()
+    return True
+
+
+def retry_failed_image_jobs():
+    """Возвращает упавшие задачи в очередь. Возвращает их количество."""
+    from ..models import ImageJob
+
+    return ImageJob.objects.filter(status=ImageJob.Status.FAILED).update(
+        status=ImageJob.Status.PENDING,
+        attempts=0,
+        run_after=timezone.now(),
+        locked_at=None,
+        updated_at=timezone.now(),
+    )
@@ -2,17 +2,18 @@
 
 import os
 from uuid import uuid4
-from io import BytesIO
-from PIL import Image
+from tempfile import SpooledTemporaryFile
+from PIL import Image, features
+from django.conf import settings
 from django.db import transaction
-from django.core.files.base import ContentFile
+from django.core.files import File
 from django.core.files.uploadedfile import UploadedFile
 from django.utils.deconstruct import deconstructible
 from django.utils.html import format_html
 from django.templatetags.static import static
 from easy_thumbnails.files import get_thumbnailer
 from easy_thumbnails.alias import aliases as et_aliases
-from .models import is_field_changed
+from .models import is_field_changed, on_commit_batched
 
 
 # переименование изображения с указанием папки сохранения
@@ -101,23 +102,43 @@ class UploadToPath:
 #     return wrapper
 
 
+# Результат конвертации крупнее этого порога пишется во временный файл, а не в память
+WEBP_SPOOL_MAX_SIZE = 5 * 1024 * 1024
+
+
+# Настройки конвертации оригинала для поля (settings.IMAGE_WEBP_OPTIONS)
+def get_webp_options(instance, field_name):
+    target = f"{instance._meta.app_label}.{instance._meta.object_name}.{field_name}"
+    return getattr(settings, "IMAGE_WEBP_OPTIONS", {}).get(target, {})
+
+
 # Конвертирование изображений в WebP
-def convert_to_webp(image_field, quality=100):
+def convert_to_webp(image_field, quality=100, max_size=None, method=6):
+    """
+    Конвертирует изображение (файл или путь) в WebP.
+    max_size — (ширина, высота): крупные оригиналы уменьшаются ещё при декодировании
+    (JPEG draft + Image.reduce внутри thumbnail), полный растр в память не попадает.
+    method — усилие кодировщика WebP (0 — быстро, 6 — медленно и компактнее).
+    Возвращает File поверх SpooledTemporaryFile: отдаётся в хранилище без копий.
+    Закрывает его вызывающий код после сохранения (with convert_to_webp(...) as f
+    или release_prepared_image для поля модели).
+    """
     if not image_field:
         return
 
-    img = Image.open(image_field)
+    with Image.open(image_field) as img:
+        if max_size:
+            img.thumbnail(max_size, Image.Resampling.LANCZOS, reducing_gap=2.0)
 
-    # Конвертируем в RGB для сохранения в WebP (убирает проблемы с прозрачностью)
-    if img.mode in ("RGBA", "P"):
-        img = img.convert("RGB")
+        # Конвертируем в RGB для сохранения в WebP (убирает проблемы с прозрачностью)
+        if img.mode in ("RGBA", "P"):
+            img = img.convert("RGB")
 
-    output = BytesIO()
-    # Сохраняем с максимальным качеством для оригиналов
-    img.save(output, format="WEBP", quality=quality, method=6)
-    output.seek(0)
+        output = SpooledTemporaryFile(max_size=WEBP_SPOOL_MAX_SIZE)
+        img.save(output, format="WEBP", quality=quality, method=method)
 
-    return ContentFile(output.read())
+    output.seek(0)
+    return File(output)
 
 
 def clean_thumbnail_namer(
@@ -130,12 +151,93 @@ def clean_thumbnail_namer(
     base_name, _ = os.path.splitext(source_filename)
 
     # Собираем параметры миниатюры в строку через подчеркивание
-    options_string = "_".join(prepared_options)
+    # (двоеточия — из subsampling вида "4:2:0" у AVIF — в имени файла не нужны)
+    options_string = "_".join(prepared_options).replace(":", "")
 
     # Склеиваем всё вместе с новым расширением
     return f"{base_name}_{options_string}.{thumbnail_extension}"
 
 
+# Манифест миниатюр:
+# {"source": имя файла,
+#  "aliases": {алиас: [url, ширина, высота]},
+#  "sources": {алиас: [[mime, [[url, "1x"], [url, "2x"]]], ...]}}
+def _density_renditions(thumbnailer, options, base_width):
+    """Миниатюры алиаса для THUMBNAIL_DENSITIES: [[url, "2x"], ...]"""
+    width, height = options["size"]
+    renditions = []
+    last_width = 0
+    for density in getattr(settings, "THUMBNAIL_DENSITIES", (1,)):
+        thumb = thumbnailer.get_thumbnail(
+            {**options, "size": (width * density, height * density)}
+        )
+        # Исходник меньше нужного: плотность по факту, одинаковые не повторяем
+        if thumb.width <= last_width:
+            continue
+        last_width = thumb.width
+        renditions.append([thumb.url, f"{round(thumb.width / base_width, 2):g}x"])
+    return renditions
+
+
+def build_thumbnail_manifest(image_field):
+    """
+    Генерирует все алиасы поля (как generate_all_aliases) и возвращает манифест.
+    Для алиасов из THUMBNAIL_SRCSET_ALIASES — также плотности THUMBNAIL_DENSITIES
+    в WebP и, при THUMBNAIL_AVIF, в AVIF (для <picture>/srcset).
+    Сериализаторы читают из него URL и размеры без обращений к хранилищу
+    и таблицам easy-thumbnails.
+    """
+    all_options = et_aliases.all(image_field, include_global=True)
+    thumbnailer = get_thumbnailer(image_field)
+
+    formats = [("image/webp", thumbnailer, {})]
+    if getattr(settings, "THUMBNAIL_AVIF", False) and features.check("avif"):
+        avif_thumbnailer = get_thumbnailer(image_field)
+        avif_thumbnailer.thumbnail_extension = "avif"
+        # Браузер берёт первый поддерживаемый <source>: AVIF легче.
+        # Кодировщик AVIF принимает subsampling только строкой (easy-thumbnails передаёт 2)
+        formats.insert(0, ("image/avif", avif_thumbnailer, {"subsampling": "4:2:0"}))
+
+    srcset_aliases = getattr(settings, "THUMBNAIL_SRCSET_ALIASES", set())
+    manifest = {}
+    sources = {}
+    for alias_name, options in all_options.items():
+        options["ALIAS"] = alias_name
+        thumb = thumbnailer.get_thumbnail(options)
+        manifest[alias_name] = [thumb.url, thumb.width, thumb.height]
+        if alias_name not in srcset_aliases:
+            continue
+        sources[alias_name] = [
+            [
+                mime,
+                _density_renditions(
+                    format_thumbnailer, {**options, **format_options}, thumb.width
+                ),
+            ]
+            for mime, format_thumbnailer, format_options in formats
+        ]
+
+    return {"source": image_field.name, "aliases": manifest, "sources": sources}
+
+
+def generate_thumbnail_manifest(instance, field_name="image"):
+    """Генерация миниатюр и сохранение манифеста в поле thumbnails (без save и сигналов)"""
+    image_field = getattr(instance, field_name)
+    if not image_field:
+        return
+
+    instance.thumbnails = build_thumbnail_manifest(image_field)
+    type(instance).objects.filter(pk=instance.pk).update(thumbnails=instance.thumbnails)
+
+
+def get_thumbnail_manifest(image_field):
+    """Манифест объекта, если он построен для текущего файла (иначе {})"""
+    manifest = getattr(getattr(image_field, "instance", None), "thumbnails", None)
+    if manifest and manifest.get("source") == image_field.name:
+        return manifest
+    return {}
+
+
 # Универсальная функция для получения словаря миниатюр
 def get_thumbnail_data(image_field, aliases, request=None):
     if not image_field:
@@ -143,6 +245,43 @@ def get_thumbnail_data(image_field, aliases, request=None):
 
     data = {}
 
+    def absolute(url):
+        return request.build_absolute_uri(url) if request else url
+
+    # Всё, что есть в манифесте, отдаём без обращения к хранилищу
+    manifest = get_thumbnail_manifest(image_field)
+    manifest_aliases = manifest.get("aliases", {})
+    manifest_sources = manifest.get("sources", {})
+    missing = {}
+    for key, alias_name in aliases.items():
+        if alias_name not in manifest_aliases:
+            missing[key] = alias_name
+            continue
+        url, width, height = manifest_aliases[alias_name]
+        data[key] = {
+            "url": absolute(url),
+            "width": width,
+            "height": height,
+            # Готовые <source> для <picture>: [{"type": "image/avif", "srcset": "... 1x, ... 2x"}]
+            "sources": [
+                {
+                    "type": mime,
+                    "srcset": ", ".join(
+                        f"{absolute(src)} {density}" for src, density in renditions
+                    ),
+                }
+                for mime, renditions in manifest_sources.get(alias_name, [])
+                if renditions
+            ],
+        }
+
+    if not missing:
+        return data
+
+    # Манифеста нет (задача в очереди или фото до build_thumbnail_manifests) —
+    # спрашиваем easy-thumbnails
+    aliases = missing
+
     # Динамически определяем target (например: 'xwear.ProductImage.image')
     # Это нужно, чтобы et_aliases.get() знал, в каком блоке настроек искать алиас
     target_path = ""
@@ -152,6 +291,10 @@ def get_thumbnail_data(image_field, aliases, request=None):
         field_name = image_field.field.name
         target_path = f"{app_label}.{model_name}.{field_name}"
 
+    thumbnailer = get_thumbnailer(image_field)
+    # При IMAGE_JOBS_ASYNC миниатюры готовит воркер: в запросе только ищем готовые
+    generate = not getattr(settings, "IMAGE_JOBS_ASYNC", False)
+
     for key, alias_name in aliases.items():
         try:
             # 2. Правильно извлекаем словарь настроек по имени алиаса
@@ -162,7 +305,18 @@ def get_thumbnail_data(image_field, aliases, request=None):
                 continue
 
             # 3. Передаем словарь опций
-            thumb = image_field.get_thumbnail(options)
+            thumb = thumbnailer.get_thumbnail(options, generate=generate)
+
+            # Миниатюра ещё в очереди — временно отдаём оригинал
+            if thumb is None:
+                url = image_field.url
+                data[key] = {
+                    "url": request.build_absolute_uri(url) if request else url,
+                    "width": None,
+                    "height": None,
+                    "sources": [],
+                }
+                continue
 
             url = request.build_absolute_uri(thumb.url) if request else thumb.url
 
@@ -170,6 +324,7 @@ def get_thumbnail_data(image_field, aliases, request=None):
                 "url": url,
                 "width": thumb.width,
                 "height": thumb.height,
+                "sources": [],
             }
         except Exception as e:
             return f"Ошибка получения данных превью: {e}"
@@ -266,9 +421,12 @@ def sync_product_images(variant, manual_selected_id=None):
     """
     Синхронизация изображений варианта товара (главная, порядок)
     и генерация alt-текста в админке.
+    Все изменения — одним bulk_update; если ничего не поменялось, запросов на запись нет.
     """
+    from ..models import ProductImage
+
     # 1. Получаем все фото, отсортированные по позиции
-    images = list(variant.images.all().order_by("position", "id"))
+    images = list(ProductImage.objects.filter(variant=variant).order_by("position", "id"))
     if not images:
         return
 
@@ -285,29 +443,45 @@ def sync_product_images(variant, manual_selected_id=None):
         return current_alt
 
     # 4. Определяем главное фото.
-    if manual_selected_id:
-        # ПРИОРИТЕТ 1: Если пользователь явно кликнул на галочку (передано из admin.py)
-        target_main = variant.images.filter(pk=manual_selected_id).first()
-    else:
-        # ПРИОРИТЕТ 2: В остальных случаях (включая перетаскивание)
-        # главным становится тот, кто фактически первый в списке
-        target_main = images[0]
-
-    if not target_main:
-        target_main = images[0]
-
-    # 5. Синхронизируем флаги
-    # Сначала сбрасываем у всех
-    variant.images.all().update(is_main=False)
-    # Затем жестко ставим первому позицию 0 и флаг True
-    variant.images.filter(pk=target_main.pk).update(
-        is_main=True, position=0, alt=get_smart_alt(target_main, 1)
+    # ПРИОРИТЕТ 1: Если пользователь явно кликнул на галочку (передано из admin.py)
+    # ПРИОРИТЕТ 2: В остальных случаях (включая перетаскивание)
+    # главным становится тот, кто фактически первый в списке
+    target_main = next(
+        (image for image in images if image.pk == manual_selected_id), images[0]
     )
 
-    # 6. Выравниваем позиции остальных (чтобы не было двух нулевых позиций)
-    others = variant.images.exclude(pk=target_main.pk).order_by("position", "id")
-    for i, img in enumerate(others, start=2):
-        variant.images.filter(pk=img.pk).update(position=i - 1, alt=get_smart_alt(img, i))
+    # 5. Главное — позиция 0, остальные по порядку за ним (без двух нулевых позиций)
+    ordered = [target_main] + [image for image in images if image is not target_main]
+    changed = []
+    for position, image in enumerate(ordered):
+        is_main = position == 0
+        alt = get_smart_alt(image, position + 1)
+        if (image.position, image.is_main, image.alt) != (position, is_main, alt):
+            image.position, image.is_main, image.alt = position, is_main, alt
+            changed.append(image)
+
+    # 6. Одним UPDATE ... CASE на все изменившиеся фото
+    if changed:
+        ProductImage.objects.bulk_update(changed, ["position", "is_main", "alt"])
+
+
+def _sync_variants_images(variant_ids):
+    from ..models import ProductVariant
+
+    # Варианты, удалённые целиком (каскад), в выборку уже не попадут
+    variants = ProductVariant.objects.filter(pk__in=variant_ids).select_related(
+        "product__category", "product__brand", "color"
+    )
+    for variant in variants:
+        sync_product_images(variant)
+
+
+def schedule_images_sync(variant_ids):
+    """
+    Синхронизация фото вариантов после коммита: удаление пачки фото
+    в одной транзакции даёт одну синхронизацию на вариант.
+    """
+    on_commit_batched("images_sync", variant_ids, _sync_variants_images)
 
 
 # Полный цикл подготовки загружаемого изображения: конвертация в WebP и генерация пути.
@@ -323,8 +497,10 @@ def prepare_image_for_save(
     if not image_field or not is_field_changed(instance, field_name):
         return False
 
-    # 1. Конвертируем в WebP
-    webp_content = convert_to_webp(image_field, quality=quality)
+    # 1. Конвертируем в WebP (уменьшение и усилие кодировщика — из IMAGE_WEBP_OPTIONS)
+    webp_content = convert_to_webp(
+        image_field, quality=quality, **get_webp_options(instance, field_name)
+    )
 
     # 2. Формируем путь
     upload_processor = UploadToPath(
@@ -339,6 +515,16 @@ def prepare_image_for_save(
     return True
 
 
+def release_prepared_image(instance, field_name):
+    """
+    Закрывает временный файл WebP из prepare_image_for_save после save().
+    Дальнейшие чтения поля (миниатюры) открывают уже сохранённый файл из хранилища.
+    """
+    image_field = getattr(instance, field_name)
+    image_field.close()
+    del image_field.file
+
+
 def generate_banner_html(obj, image_url, max_width, is_list=False):
     """Генератор HTML для баннера с адаптивностью через cqw"""
 
@@ -0,0 +1,223 @@
+# ОТЛОЖЕННОЕ УДАЛЕНИЕ МЕДИАФАЙЛОВ (оригиналы + миниатюры)
+
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.apps import apps
+from django.conf import settings
+from django.db import models
+from .models import on_commit_batched
+
+logger = logging.getLogger("apps")
+
+GARBAGE_BATCH_SIZE = 500
+RECONCILE_CHUNK_SIZE = 2000
+
+
+def _record_orphaned_files(paths):
+    from ..models import OrphanedFile
+
+    OrphanedFile.objects.bulk_create(
+        [OrphanedFile(path=path) for path in paths], ignore_conflicts=True
+    )
+
+
+def schedule_file_cleanup(paths):
+    """
+    Ставит файлы в очередь на удаление после коммита (одной вставкой на транзакцию).
+    При откате транзакции файлы остаются на месте.
+    """
+    paths = [path for path in paths if path]
+    if paths:
+        on_commit_batched("orphaned_files", paths, _record_orphaned_files)
+
+
+def _referenced_paths(paths):
+    from ..models import ProductImage, SliderBanner
+
+    # Имя могло вернуться в использование (новая загрузка с тем же путём)
+    referenced = set()
+    for model in (ProductImage, SliderBanner):
+        referenced.update(
+            model.objects.filter(image__in=paths).values_list("image", flat=True)
+        )
+    return referenced
+
+
+def collect_media_garbage(dry_run=False):
+    """
+    Удаляет файлы из очереди OrphanedFile: оригинал и все его миниатюры
+    (список миниатюр — одним запросом к таблицам easy-thumbnails на пачку).
+    dry_run — только подсчёт. Возвращает (число файлов, байт).
+    """
+    from django.core.files.storage import default_storage
+    from easy_thumbnails.models import Source, Thumbnail
+    from easy_thumbnails.storage import thumbnail_default_storage
+    from ..models import OrphanedFile
+
+    files = 0
+    total_bytes = 0
+    last_pk = 0
+
+    while True:
+        entries = list(
+            OrphanedFile.objects.filter(pk__gt=last_pk).order_by("pk")[
+                :GARBAGE_BATCH_SIZE
+            ]
+        )
+        if not entries:
+            break
+        last_pk = entries[-1].pk
+
+        paths = {entry.path for entry in entries}
+        garbage = paths - _referenced_paths(paths)
+        thumbnails = Thumbnail.objects.filter(source__name__in=garbage).values_list(
+            "name", flat=True
+        )
+
+        for storage, names in (
+            (default_storage, garbage),
+            (thumbnail_default_storage, list(thumbnails)),
+        ):
+            for name in names:
+                try:
+                    size = storage.size(name)
+                except OSError:
+                    # Файла уже нет (удалён вручную или прошлым прогоном)
+                    continue
+                files += 1
+                total_bytes += size
+                if not dry_run:
+                    storage.delete(name)
+
+        if not dry_run:
+            # Каскадом уходят и записи миниатюр
+            Source.objects.filter(name__in=garbage).delete()
+            OrphanedFile.objects.filter(pk__in=[entry.pk for entry in entries]).delete()
+
+    if not dry_run and files:
+        logger.info("Удалено медиафайлов: %s (%s байт)", files, total_bytes)
+    return files, total_bytes
+
+
+# ==========================================
+# СВЕРКА ХРАНИЛИЩА С БД (команда media_reconcile)
+# ==========================================
+
+
+def _file_fields():
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField):
+                yield model, field
+
+
+def get_media_roots():
+    """Папки MEDIA_ROOT, которыми владеют файловые поля моделей, и папка миниатюр"""
+    roots = set()
+    basedir = getattr(settings, "THUMBNAIL_BASEDIR", "")
+    if basedir:
+        roots.add(basedir.strip("/"))
+    for _, field in _file_fields():
+        # UploadToPath хранит папку в .folder, у строкового upload_to она — префикс
+        folder = getattr(field.upload_to, "folder", field.upload_to)
+        if isinstance(folder, str) and folder.strip("/"):
+            roots.add(folder.strip("/").split("/")[0])
+    return roots
+
+
+def get_referenced_media():
+    """
+    Все пути файлов, на которые ссылается БД: значения файловых полей
+    и миниатюры easy-thumbnails этих файлов. Читается потоком (.iterator()).
+    """
+    from easy_thumbnails.models import Thumbnail
+
+    referenced = set()
+    for model, field in _file_fields():
+        names = (
+            model._base_manager.exclude(**{field.name: ""})
+            .values_list(field.name, flat=True)
+            .iterator(chunk_size=RECONCILE_CHUNK_SIZE)
+        )
+        referenced.update(name for name in names if name)
+
+    thumbnails = Thumbnail.objects.values_list("name", "source__name").iterator(
+        chunk_size=RECONCILE_CHUNK_SIZE
+    )
+    referenced.update(name for name, source in thumbnails if source in referenced)
+    return referenced
+
+
+def _scan_tree(path, media_root, max_mtime):
+    # Обход без рекурсии Python: os.scandir отдаёт тип и stat без лишних системных вызовов
+    found = []
+    stack = [path]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    if stat.st_mtime <= max_mtime:
+                        name = os.path.relpath(entry.path, media_root)
+                        found.append((name.replace(os.sep, "/"), stat.st_size))
+    return found
+
+
+def scan_media_files(media_root, roots, min_age=0, workers=8):
+    """
+    Файлы в папках roots внутри media_root: [(путь относительно MEDIA_ROOT, байт)].
+    Подпапки обходятся параллельно. Файлы моложе min_age секунд пропускаются:
+    они могут принадлежать ещё не закоммиченной транзакции.
+    """
+    max_mtime = time.time() - min_age
+    tasks = []
+    files = []
+    for root in sorted(roots):
+        root_path = os.path.join(media_root, root)
+        if not os.path.isdir(root_path):
+            continue
+        with os.scandir(root_path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    tasks.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    if stat.st_mtime <= max_mtime:
+                        name = os.path.relpath(entry.path, media_root)
+                        files.append((name.replace(os.sep, "/"), stat.st_size))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for found in executor.map(
+            lambda path: _scan_tree(path, media_root, max_mtime), tasks
+        ):
+            files.extend(found)
+    return files
+
+
+def find_orphaned_media(min_age=0, workers=8, roots=None):
+    """Файлы хранилища, на которые не ссылается ни одна запись: [(путь, байт)]"""
+    from django.core.files.storage import default_storage
+
+    files = scan_media_files(
+        default_storage.path(""), roots or get_media_roots(), min_age, workers
+    )
+    referenced = get_referenced_media()
+    return [(name, size) for name, size in files if name not in referenced]
+
+
+def delete_orphaned_media(names):
+    """Удаляет файлы-сироты и их записи в таблицах easy-thumbnails"""
+    from django.core.files.storage import default_storage
+    from easy_thumbnails.models import Source, Thumbnail
+
+    names = list(names)
+    for name in names:
+        default_storage.delete(name)
+    for start in range(0, len(names), RECONCILE_CHUNK_SIZE):
+        chunk = names[start : start + RECONCILE_CHUNK_SIZE]
+        Thumbnail.objects.filter(name__in=chunk).delete()
+        Source.objects.filter(name__in=chunk).delete()
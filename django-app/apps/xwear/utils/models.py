@@ -2,6 +2,9 @@
 
 import string
 import random
+import threading
+from django.db import IntegrityError, transaction, connections, DEFAULT_DB_ALIAS
+from django.db.models import Max, Q
 from pytils.translit import slugify
 
 
@@ -12,35 +15,46 @@ def generate_unique_slug(model_instance, base_field="name", scope_field=None):
         model_instance: Экземпляр модели (Category/Product)
         base_field: Поле для slugify ('name')
         scope_field: Поле для уникальности ('parent', 'category')
+
+    Занятые варианты slug / slug-N читаются одним запросом,
+    следующий номер — максимальный суффикс + 1.
     """
     # slug_base = slugify(getattr(model_instance, base_field), allow_unicode=False)
     slug_base = slugify(getattr(model_instance, base_field))
-    slug = slug_base
-
-    counter = 1
     Model = model_instance.__class__
 
-    while True:
-        qs = Model.objects.filter(slug=slug)
+    qs = Model.objects.filter(Q(slug=slug_base) | Q(slug__startswith=f"{slug_base}-"))
+
+    # Уникальность в scope (parent/category)
+    if scope_field:
+        scope_value = getattr(model_instance, scope_field)
+        qs = qs.filter(**{scope_field: scope_value})
 
-        # Уникальность в scope (parent/category)
-        if scope_field:
-            scope_value = getattr(model_instance, scope_field)
-            qs = qs.filter(**{scope_field: scope_value})
+    taken = set(qs.exclude(pk=model_instance.pk).values_list("slug", flat=True))
+    return next_free_slug(slug_base, taken)
 
-        qs = qs.exclude(pk=model_instance.pk)
 
-        if not qs.exists():
-            return slug
+def next_free_slug(slug_base, taken):
+    """slug_base, если он свободен, иначе slug_base-N с N = максимальный номер + 1"""
+    if slug_base not in taken:
+        return slug_base
 
-        slug = f"{slug_base}-{counter}"
-        counter += 1
+    # "krossovki-nike-air-max" для базы "krossovki-nike-air" — не номер, пропускаем
+    prefix = f"{slug_base}-"
+    suffixes = [
+        int(slug[len(prefix) :])
+        for slug in taken
+        if slug.startswith(prefix) and slug[len(prefix) :].isdigit()
+    ]
+    return f"{slug_base}-{max(suffixes, default=0) + 1}"
 
 
 # генерация артикула для варианта товара
 def generate_unique_article(variant):
     """
-    Генерирует артикул: [BRAND(2)][GENDER(1)][CAT(3)]-[VAR(5)][RAND(3)]
+    Генерирует артикул: [BRAND(2)][GENDER(1)][CAT(3)]-[NUM(5)][RAND(3)]
+    NUM — следующий номер в серии префикса (один запрос), поэтому артикул
+    известен до INSERT варианта.
     Пример: ADM025-00142X8Z
     """
     # 1. Проверяем наличие связи с базовым товаром и категорией.
@@ -50,32 +64,68 @@ def generate_unique_article(variant):
         return None
 
     try:
-        base_product = variant.product
+        prefix = get_article_prefix(variant.product)
+        queryset = variant.__class__.objects.exclude(pk=variant.pk)
+        return format_article(prefix, get_last_article_number(queryset, prefix) + 1)
 
-        # 2. Код бренда (2 символа)
-        brand_code = base_product.brand.slug[:2].upper() if base_product.brand else "NB"
+    except Exception as e:
+        print(f"Ошибка при генерации артикула: {e}")
+        return None
 
-        # 3. Код пола (1 символ)
-        # Берем значение из choices (M, F, U)
-        gender_code = base_product.gender if base_product.gender else "U"
 
-        # 4. ID категории с дополнением до 3 знаков
-        cat_id = str(base_product.category_id).zfill(3)
+def get_article_prefix(base_product):
+    """Серия артикула: [BRAND(2)][GENDER(1)][CAT(3)]-"""
+    # Код бренда (2 символа)
+    brand_code = base_product.brand.slug[:2].upper() if base_product.brand else "NB"
 
-        # 5. ID варианта товара с дополнением до 5 знаков
-        # Если вариант еще не сохранен (id=None), ставим нули
-        var_id = str(variant.id).zfill(5) if variant.id else "00000"
+    # Код пола (1 символ)
+    # Берем значение из choices (M, F, U)
+    gender_code = base_product.gender if base_product.gender else "U"
 
-        # 6. Случайный хвост (3 символа) для защиты от перебора и уникальности
-        random_suffix = "".join(
-            random.choices(string.ascii_uppercase + string.digits, k=3)
-        )
+    # ID категории с дополнением до 3 знаков
+    cat_id = str(base_product.category_id).zfill(3)
 
-        return f"{brand_code}{gender_code}{cat_id}-{var_id}{random_suffix}"
+    return f"{brand_code}{gender_code}{cat_id}-"
+
+
+def get_last_article_number(queryset, prefix):
+    """Последний номер серии (0, если серия пуста) — один запрос MAX()"""
+    # Номер фиксированной длины: максимум строки = максимум номера
+    last_article = queryset.filter(article__startswith=prefix).aggregate(
+        last=Max("article")
+    )["last"]
+    last_number = (last_article or "")[len(prefix) : len(prefix) + 5]
+    return int(last_number) if last_number.isdigit() else 0
 
-    except Exception as e:
-        print(f"Ошибка при генерации артикула: {e}")
-        return None
+
+def format_article(prefix, number):
+    # Номер с дополнением до 5 знаков и случайный хвост (3 символа)
+    # для защиты от перебора и уникальности
+    random_suffix = "".join(random.choices(string.ascii_uppercase + string.digits, k=3))
+    return f"{prefix}{str(number).zfill(5)}{random_suffix}"
+
+
+# Сохранение со сгенерированным уникальным значением (слаг, артикул)
+def save_with_unique_retry(save, regenerate=None, is_taken=None, attempts=5):
+    """
+    Вызывает save() в savepoint. При нарушении уникальности вызывает regenerate()
+    (новый слаг/артикул) и повторяет: предварительная проверка не спасает
+    от параллельного создания с тем же значением.
+    Повтор — только если is_taken() подтверждает, что занято именно сгенерированное
+    значение; другие нарушения (дубль цвета в товаре и т.п.) пробрасываются сразу.
+    Без regenerate (значение задано вручную) ошибка пробрасывается сразу.
+    """
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            if regenerate is None or attempt == attempts - 1:
+                raise
+            # Savepoint откатан: конкурирующая запись уже закоммичена и видна
+            if is_taken is not None and not is_taken():
+                raise
+            regenerate()
 
 
 # Универсальная проверка: изменился ли файл в поле модели
@@ -87,3 +137,39 @@ def is_field_changed(instance, field_name):
         return getattr(old_obj, field_name) != getattr(instance, field_name)
     except instance.__class__.DoesNotExist:
         return True
+
+
+# Пакетный отложенный вызов после коммита транзакции
+_batches = threading.local()
+
+
+def on_commit_batched(key, ids, func, using=None):
+    """
+    Копит id объектов в пределах текущей транзакции и вызывает func(ids)
+    один раз после её коммита (вместо вызова на каждое сохранение/удаление).
+    Вне транзакции func вызывается сразу.
+    """
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    batches = getattr(_batches, "pending", None)
+    if batches is None:
+        batches = _batches.pending = {}
+
+    batch = batches.get(key)
+    # Пачка актуальна, только если её колбэк ещё ждёт коммита
+    # (при откате транзакции Django очищает очередь on_commit)
+    if batch is not None and any(
+        entry[1] is batch["flush"] for entry in connection.run_on_commit
+    ):
+        batch["ids"].update(ids)
+        return
+
+    batch = {"ids": set(ids)}
+
+    def flush():
+        batches.pop(key, None)
+        if batch["ids"]:
+            func(batch["ids"])
+
+    batch["flush"] = flush
+    batches[key] = batch
+    transaction.on_commit(flush, using=using)
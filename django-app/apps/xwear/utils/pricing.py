@@ -0,0 +1,293 @@
+# ДЕНОРМАЛИЗОВАННЫЕ ЦЕНЫ ВАРИАНТОВ (min_final_price и др.)
+
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import (
+    Case,
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    PositiveIntegerField,
+    Q,
+    Value,
+    When,
+)
+from django.db.models.functions import Floor, Round
+from ..cache import invalidate_variant_responses
+from .models import on_commit_batched
+from .facets import schedule_facet_refresh
+
+# Размер пачки при полном пересчёте
+PRICES_BATCH_SIZE = 2000
+
+PRICE_FIELDS = [
+    "min_final_price",
+    "min_old_price",
+    "min_discount_percent",
+    "max_discount_percent",
+    "active_sizes_count",
+]
+
+
+def _calculate_prices(variant_ids):
+    """
+    Один запрос по активным размерам -> значения колонок для каждого варианта.
+    Варианты без активных размеров получают пустые значения.
+    """
+    from ..models import ProductSize
+
+    prices = {
+        pk: {
+            "min_final_price": None,
+            "min_old_price": None,
+            "min_discount_percent": 0,
+            "max_discount_percent": 0,
+            "active_sizes_count": 0,
+        }
+        for pk in variant_ids
+    }
+    rows = (
+        ProductSize.objects.filter(variant_id__in=variant_ids, is_active=True)
+        .values_list("variant_id", "price", "discount_percent", "final_price")
+        .order_by()
+    )
+    for variant_id, price, discount, final_price in rows:
+        data = prices[variant_id]
+        data["active_sizes_count"] += 1
+        data["max_discount_percent"] = max(data["max_discount_percent"], discount)
+        if final_price is None:
+            continue
+        # Самый дешёвый размер определяет цену и скидку в карточке листинга
+        if data["min_final_price"] is None or final_price < data["min_final_price"]:
+            data["min_final_price"] = final_price
+            data["min_old_price"] = price if discount > 0 else None
+            data["min_discount_percent"] = discount
+    return prices
+
+
+def refresh_variant_prices(variant_ids):
+    """
+    Пересчитывает колонки цен у указанных вариантов пачками по PRICES_BATCH_SIZE:
+    на пачку — один SELECT размеров и один bulk_update (без save() и сигналов варианта).
+    Массовая переоценка всего каталога не превращается в один UPDATE на все варианты.
+    """
+    from ..models import ProductVariant
+
+    variant_ids = list(variant_ids)
+    for start in range(0, len(variant_ids), PRICES_BATCH_SIZE):
+        batch = variant_ids[start : start + PRICES_BATCH_SIZE]
+        variants = [
+            ProductVariant(pk=pk, **data) for pk, data in _calculate_prices(batch).items()
+        ]
+        ProductVariant.objects.bulk_update(variants, PRICE_FIELDS)
+
+
+def rebuild_variant_prices():
+    """Полный пересчёт (management-команда rebuild_variant_prices)"""
+    from ..models import ProductVariant
+
+    total = 0
+    batch = []
+    ids = ProductVariant.objects.values_list("pk", flat=True).order_by("pk")
+    for pk in ids.iterator(chunk_size=PRICES_BATCH_SIZE):
+        batch.append(pk)
+        if len(batch) >= PRICES_BATCH_SIZE:
+            refresh_variant_prices(batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        refresh_variant_prices(batch)
+        total += len(batch)
+    return total
+
+
+def schedule_variant_price_refresh(variant_ids):
+    """Откладывает пересчёт цен до коммита (одна пачка на транзакцию)"""
+    on_commit_batched("variant_prices", variant_ids, refresh_variant_prices)
+
+
+def sizes_bulk_changed(variant_ids):
+    """
+    Вызывается после массовых изменений размеров в обход save()
+    (queryset.update(), bulk_update): сигналы не срабатывают,
+    поэтому цены вариантов, индекс фильтров и кэш ответов обновляем явно.
+    """
+    variant_ids = list(variant_ids)
+    schedule_variant_price_refresh(variant_ids)
+    schedule_facet_refresh(variant_ids)
+    invalidate_variant_responses(variant_ids)
+
+
+# ==========================================
+# МАССОВАЯ ПЕРЕОЦЕНКА РАЗМЕРОВ (одним UPDATE)
+# ==========================================
+
+REPRICE_PREVIEW_LIMIT = 20
+# Поле ProductSize.price: max_digits=6, decimal_places=2
+MAX_PRICE = Decimal("9999.99")
+
+
+class PriceOverflow(Exception):
+    """Наценка выводит цену части размеров за пределы поля price"""
+
+    def __init__(self, count, sample):
+        self.count = count
+        self.sample = sample
+        super().__init__(
+            f"Цена превысит {MAX_PRICE} у размеров: {count} "
+            f"(например, {', '.join(sample)}). Уменьшите наценку или сузьте выборку."
+        )
+
+
+def _apply_percent(amount, percent):
+    """
+    SQL-выражение ROUND_HALF_UP(amount * percent / 100, 2), как в
+    ProductSize.calculate_final_price. Считается в целых копейках:
+    ROUND() в БД для float (SQLite) округляет 0.005 непредсказуемо.
+    """
+    cents = Round(amount * 100)
+    return ExpressionWrapper(
+        Floor((cents * percent + 50) / 100) / 100,
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+
+def final_price_expression(discount, price=F("price")):
+    """SQL-выражение final_price для скидки discount (Value или F)"""
+    return _apply_percent(price, Value(100) - discount)
+
+
+def get_repricing_expressions(discount=None, price_change=None):
+    """
+    {поле: выражение} для UPDATE размеров: новая скидка и/или изменение цены
+    в процентах (+10 — наценка, -5 — снижение). final_price пересчитывается
+    от новых значений: в UPDATE правые части видят старые значения колонок.
+    У размеров идущей кампании скидка пишется в regular_discount_percent
+    и вернётся после кампании, а действует скидка кампании.
+    """
+    values = {}
+    price = F("price")
+    if price_change:
+        price = _apply_percent(price, Value(100 + price_change))
+        values["price"] = price
+    if discount is not None:
+        in_campaign = Q(campaign__isnull=False)
+        values["regular_discount_percent"] = Case(
+            When(in_campaign, then=Value(discount)),
+            default=F("regular_discount_percent"),
+            output_field=PositiveIntegerField(),
+        )
+        discount = Case(
+            When(in_campaign, then=F("discount_percent")),
+            default=Value(discount),
+            output_field=PositiveIntegerField(),
+        )
+        values["discount_percent"] = discount
+    else:
+        discount = F("discount_percent")
+    values["final_price"] = final_price_expression(discount, price)
+    return values
+
+
+def get_sizes_for_repricing(
+    category=None, brand=None, articles=None, variants=None, only_active=False
+):
+    """Размеры поддерева категории, бренда и/или списка вариантов (артикулы или id)"""
+    from ..models import ProductSize
+
+    sizes = ProductSize.objects.all()
+    if category is not None:
+        # Поддерево MPTT — диапазон lft/rght без выборки потомков
+        sizes = sizes.filter(
+            variant__product__category__tree_id=category.tree_id,
+            variant__product__category__lft__gte=category.lft,
+            variant__product__category__rght__lte=category.rght,
+        )
+    if brand is not None:
+        sizes = sizes.filter(variant__product__brand=brand)
+    if articles:
+        sizes = sizes.filter(variant__article__in=articles)
+    if variants:
+        sizes = sizes.filter(variant__in=variants)
+    if only_active:
+        sizes = sizes.filter(is_active=True)
+    return sizes
+
+
+def check_price_overflow(sizes, price_change=None):
+    """
+    PriceOverflow, если новая цена хоть одного размера не помещается в поле price
+    (иначе UPDATE в PostgreSQL целиком падает с DataError).
+    """
+    if not price_change or price_change <= 0:
+        return
+    expressions = get_repricing_expressions(price_change=price_change)
+    overflow = sizes.annotate(new_price=expressions["price"]).filter(
+        new_price__gt=MAX_PRICE
+    )
+    count = overflow.count()
+    if count:
+        sample = overflow.values_list("variant__article", "size__name").order_by(
+            "variant_id", "size_id"
+        )[:3]
+        raise PriceOverflow(count, [f"{article} / {size}" for article, size in sample])
+
+
+def preview_repricing(
+    sizes, discount=None, price_change=None, limit=REPRICE_PREVIEW_LIMIT
+):
+    """
+    Dry-run: новые значения считает та же БД теми же выражениями, что и UPDATE.
+    Возвращает (число изменяемых размеров, первые limit строк
+    [(артикул, размер, старая цена, новая, старая итоговая, новая)]).
+    Исключение — PriceOverflow, как и у reprice_sizes.
+    """
+    check_price_overflow(sizes, price_change)
+    expressions = get_repricing_expressions(discount, price_change)
+    fields = ["price", "final_price"]
+    fields += [field for field in expressions if field not in fields]
+    rows = (
+        sizes.annotate(**{f"new_{field}": expr for field, expr in expressions.items()})
+        .values(
+            "variant__article",
+            "size__name",
+            *fields,
+            *(f"new_{field}" for field in expressions),
+        )
+        .order_by("variant_id", "size_id")
+    )
+
+    changed = 0
+    sample = []
+    cents = Decimal("0.01")
+    for row in rows.iterator():
+        new = {field: row.get(f"new_{field}", row[field]) for field in fields}
+        if all(row[field] == new[field] for field in fields):
+            continue
+        changed += 1
+        if len(sample) < limit:
+            sample.append(
+                (
+                    row["variant__article"],
+                    row["size__name"],
+                    row["price"],
+                    new["price"] and new["price"].quantize(cents),
+                    row["final_price"],
+                    new["final_price"] and new["final_price"].quantize(cents),
+                )
+            )
+    return changed, sample
+
+
+def reprice_sizes(sizes, discount=None, price_change=None):
+    """
+    Переоценка выбранных размеров одним UPDATE (без save() на каждый размер).
+    Возвращает число обновлённых строк. Исключение — PriceOverflow (ничего не меняется).
+    """
+    with transaction.atomic():
+        check_price_overflow(sizes, price_change)
+        variant_ids = set(sizes.values_list("variant_id", flat=True).distinct())
+        updated = sizes.update(**get_repricing_expressions(discount, price_change))
+        # update() не шлёт сигналы: цены вариантов, индекс фильтров и кэш
+        sizes_bulk_changed(variant_ids)
+    return updated
@@ -5,10 +5,23 @@ from rest_framework.pagination import LimitOffsetPagination
 from rest_framework import status
 from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
+from .cache import (
+    cache_response,
+    category_group,
+    variant_group,
+    BANNERS_GROUP,
+    CATEGORIES_GROUP,
+    REFERENCES_GROUP,
+)
+from .pagination import KeysetPagination
 from .utils import (
+    active_variants_prefetch,
+    get_category_breadcrumbs,
     get_similar_products,
     get_category_sidebar_filters,
     get_filtered_products,
+    get_facet_counts,
+    parse_catalog_filters,
 )
 from .models import Category, ProductVariant, ProductSize, Favorite, SliderBanner
 from .serializers import (
@@ -28,6 +41,7 @@ from .serializers import (
 
 # дерево категорий
 @api_view(["GET"])
+@cache_response(CATEGORIES_GROUP)
 def category_tree_view(request):
     # Забираем ВСЕ активные категории одним запросом
     queryset = Category.objects.filter(is_active=True)
@@ -43,11 +57,14 @@ def category_tree_view(request):
 
 # товары категории
 @api_view(["GET"])
+@cache_response(
+    CATEGORIES_GROUP, REFERENCES_GROUP, lambda request, pk: category_group(pk)
+)
 def category_detail_view(request, pk):
     category = get_object_or_404(Category, pk=pk, is_active=True)
 
-    # MPTT breadcrumbs
-    breadcrumbs = [
+    # MPTT breadcrumbs (из кэша дерева категорий, без запроса предков)
+    breadcrumbs = get_category_breadcrumbs(category.pk) or [
         {"name": cat.name, "slug": cat.slug, "id": cat.id}
         for cat in category.get_ancestors(include_self=True)
     ]
@@ -59,11 +76,22 @@ def category_detail_view(request, pk):
     # 2. Получаем данные для сайдбара
     filters_data = get_category_sidebar_filters(categories)
 
-    # 3. Получаем отфильтрованные товары
+    # 3. Количество товаров по каждому значению фильтра с учётом текущего выбора
+    facet_counts = get_facet_counts(
+        categories, parse_catalog_filters(request.query_params)
+    )
+
+    # 4. Получаем отфильтрованные товары
     products_queryset = get_filtered_products(categories, request.query_params)
 
-    # 4. Пагинация (из settings.py) и сериализация
-    paginator = LimitOffsetPagination()
+    # 5. Пагинация и сериализация.
+    # По умолчанию limit/offset (из settings.py); для бесконечной прокрутки
+    # ?pagination=cursor — keyset по (created_at, id) без OFFSET и без COUNT(*):
+    # количество берём из индекса фильтров, уже посчитанного на шаге 3
+    if KeysetPagination.is_requested(request):
+        paginator = KeysetPagination(count=facet_counts["total"])
+    else:
+        paginator = LimitOffsetPagination()
     page = paginator.paginate_queryset(products_queryset, request)
     serializer = ProductListSerializer(page, many=True, context={"request": request})
 
@@ -82,12 +110,14 @@ def category_detail_view(request, pk):
         "colors": ColorSerializer(filters_data["colors"], many=True).data,
         "sizes": filters_data["sizes"],
         "price_range": filters_data["price_range"],
+        # {"brands": {"nike": 12, ...}, "colors": {...}, "sizes": {...}, "price_range": {...}}
+        "counts": facet_counts,
     }
 
     # В результате структура JSON-ответа будет:
     # {
     #   "count": 150,
-    #   "next": "http://api.../?limit=20&offset=20",
+    #   "next": "http://api.../?limit=20&offset=20",  (или ...?cursor=... в режиме курсора)
     #   "previous": null,
     #   "category": { ... },
     #   "filters": { ... },
@@ -104,6 +134,7 @@ def category_detail_view(request, pk):
 
 # Детали товара
 @api_view(["GET"])
+@cache_response(CATEGORIES_GROUP, REFERENCES_GROUP, lambda request, pk: variant_group(pk))
 def product_detail_view(request, pk):
     variant = get_object_or_404(
         ProductVariant.objects.filter(is_active=True, product__is_active=True, pk=pk)
@@ -117,7 +148,7 @@ def product_detail_view(request, pk):
         )
         .prefetch_related(
             "images",
-            "product__variants__color",  # Подгружаем соседние цвета (через родительский товар)
+            active_variants_prefetch(),  # Соседние цвета (через родительский товар)
             # Уже делаем сортировку в ProductImage, поэтому не используем здесь:
             # Prefetch("images", queryset=ProductImage.objects.order_by("-is_main", "id")),
             Prefetch("sizes", queryset=ProductSize.objects.select_related("size")),
@@ -154,8 +185,14 @@ def product_recommends_view(request, pk):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def favorite_list(request):
-    favorites = Favorite.objects.filter(user=request.user).select_related(
-        "variant__color", "variant__product__brand"
+    favorites = (
+        Favorite.objects.filter(user=request.user)
+        .select_related(
+            "variant__color", "variant__product__brand", "variant__product__category"
+        )
+        .prefetch_related(
+            "variant__images", active_variants_prefetch("variant__product__variants")
+        )
     )
     serializer = FavoriteSerializer(favorites, many=True, context={"request": request})
 
@@ -182,6 +219,7 @@ def favorite_toggle(request, pk):
 
 # Слайдер
 @api_view(["GET"])
+@cache_response(BANNERS_GROUP)
 def slider_banner_list_view(request):
     banners = SliderBanner.objects.filter(is_active=True)
     serializer = SliderBannerSerializer(banners, many=True, context={"request": request})
@@ -114,6 +114,71 @@ DATABASES = {
 }
 
 
+# Кэш
+# ---
+# CACHE_BACKEND:
+#   "file"   - файловый кэш, общий для всех воркеров одного хоста (по умолчанию, без Redis)
+#   "locmem" - память процесса (разработка, тесты)
+#   "redis"  - общий Redis для нескольких хостов (CACHE_URL=redis://host:6379/0)
+# Именованные алиасы: catalog (ответы и данные каталога), throttling (счётчики DRF),
+# sessions (сессии админки поверх БД)
+# THROTTLE_CACHE_BACKEND — бэкенд счётчиков DRF (по умолчанию как у CACHE_BACKEND).
+# Счётчики должны быть общими для всех воркеров: без Redis это файловый кэш
+# с небольшим MAX_ENTRIES (set() обходит каталог алиаса для вытеснения,
+# поэтому каталог держим маленьким). "locmem" — только осознанно:
+# лимиты тогда считаются по каждому воркеру отдельно (N воркеров — N× лимит).
+
+CACHE_BACKEND = config("CACHE_BACKEND", default="file")
+CACHE_DIR = config("CACHE_DIR", default=str(BASE_DIR / "cache"))
+CACHE_URL = config("CACHE_URL", default="redis://127.0.0.1:6379/0")
+THROTTLE_CACHE_BACKEND = config("THROTTLE_CACHE_BACKEND", default=CACHE_BACKEND)
+
+
+def cache_config(alias, timeout=300, max_entries=10000, backend=None, cull_frequency=3):
+    backend = backend or CACHE_BACKEND
+    if backend == "redis":
+        return {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+            "KEY_PREFIX": alias,
+            "TIMEOUT": timeout,
+        }
+    if backend == "locmem":
+        return {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": alias,
+            "TIMEOUT": timeout,
+            "OPTIONS": {"MAX_ENTRIES": max_entries, "CULL_FREQUENCY": cull_frequency},
+        }
+    return {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(CACHE_DIR, alias),
+        "TIMEOUT": timeout,
+        "OPTIONS": {"MAX_ENTRIES": max_entries, "CULL_FREQUENCY": cull_frequency},
+    }
+
+
+CACHES = {
+    "default": cache_config("default"),
+    "catalog": cache_config(
+        "catalog", timeout=config("CATALOG_CACHE_TIMEOUT", default=3600, cast=int)
+    ),
+    "throttling": cache_config(
+        "throttling",
+        timeout=86400,
+        max_entries=config("THROTTLE_CACHE_MAX_ENTRIES", default=5000, cast=int),
+        backend=THROTTLE_CACHE_BACKEND,
+        # При переполнении сбрасывается лишь десятая часть счётчиков
+        cull_frequency=10,
+    ),
+    "sessions": cache_config("sessions", timeout=1209600),
+}
+
+# Сессии: чтение из кэша, запись сквозная в БД (кэш можно безопасно сбросить)
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+SESSION_CACHE_ALIAS = "sessions"
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -176,6 +241,32 @@ THUMBNAIL_BASEDIR = "thumbnails"
 THUMBNAIL_EXTENSION = "webp"
 THUMBNAIL_CACHE_DIMENSIONS = True
 THUMBNAIL_NAMER = "xwear.utils.clean_thumbnail_namer"
+# Плотности миниатюр для srcset (1x — размер алиаса, 2x — для ретины)
+# и AVIF рядом с WebP (см. build_thumbnail_manifest). После изменения:
+# python manage.py build_thumbnail_manifests --force
+THUMBNAIL_DENSITIES = (1, 2)
+THUMBNAIL_AVIF = config("THUMBNAIL_AVIF", default=True, cast=bool)
+# Плотности и AVIF — только для алиасов, которые отдаёт API (сериализаторы);
+# превью админки и прочие алиасы получают одну миниатюру WebP
+THUMBNAIL_SRCSET_ALIASES = {
+    "product_small",
+    "product_medium",
+    "product_large",
+    "slider_large",
+}
+
+# Конвертация загружаемых оригиналов в WebP (utils/images.py, convert_to_webp):
+# max_size — крупнее уменьшается при декодировании (x2 от самого большого алиаса),
+# method — усилие кодировщика WebP 0..6 (6 — медленнее всего, выигрыш в размере мал)
+IMAGE_WEBP_OPTIONS = {
+    "xwear.ProductImage.image": {"max_size": (1500, 1800), "method": 4},
+    "xwear.SliderBanner.image": {"max_size": (3080, 1260), "method": 4},
+}
+
+# Миниатюры новых фото генерирует фоновый воркер (python manage.py run_image_worker),
+# а не запрос админки; до готовности API отдаёт оригинал.
+# False — генерация после коммита в процессе веб-сервера (без воркера)
+IMAGE_JOBS_ASYNC = config("IMAGE_JOBS_ASYNC", default=True, cast=bool)
 THUMBNAIL_ALIASES = {
     "xwear.ProductImage.image": {
         "admin_preview": {  # для превью в админке
@@ -362,10 +453,10 @@ REST_FRAMEWORK = {
     "DEFAULT_RENDERER_CLASSES": [
         "rest_framework.renderers.JSONRenderer",
     ],
-    # ограничение частоты запросов c одного IP
+    # ограничение частоты запросов c одного IP (счётчики в кэше "throttling")
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "accounts.throttles.AnonThrottle",
+        "accounts.throttles.UserThrottle",
     ],
     # правила ограничения частоты запросов
     "DEFAULT_THROTTLE_RATES": {